@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks for the formatting and inference functions of server.py.
+
+get_digital_source_type, format_provenance_for_web, format_photography_metadata,
+extract_social_links, format_datetime_full and convert_exif_value run on every
+request. Each is called on realistic inputs, from a typical camera manifest
+to large action lists, many assertions, long ingredient chains and inputs
+where the answer is only found at the very end. For every case this reports
+the time per call (best and median of several runs) and the memory one call
+allocates (peak) and keeps (retained), measured with tracemalloc.
+
+Usage:
+    uv run python bench_formatting.py                      # All cases
+    uv run python bench_formatting.py -k source_type       # Cases whose name contains 'source_type'
+    uv run python bench_formatting.py -o micro.json --compare old.json
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+from PIL.TiffImagePlugin import IFDRational
+
+os.environ.setdefault('C2PA_LOG_LEVEL', 'WARNING')
+import manifest_json  # noqa: E402
+import server  # noqa: E402
+from bench_server import git_commit  # noqa: E402
+from source_types import assertion_used  # noqa: E402
+
+
+def _action(i: int, generative: bool = False) -> dict:
+    action = {
+        'action': 'c2pa.edited' if i else 'c2pa.opened',
+        'when': f'2025-03-{1 + i % 28:02d}T10:{i % 60:02d}:00+05:30',
+        'softwareAgent': 'Adobe Lightroom Classic 14.2 (Windows)',
+        'parameters': {
+            'com.adobe.acr': 'Exposure2012', 'com.adobe.acr.value': f'{i / 10:+.2f}',
+            'description': 'Global adjustment',
+        },
+    }
+    if generative:
+        action['parameters']['com.adobe.type'] = 'text_to_image'
+    return action
+
+
+def make_c2pa_data(actions: int = 3, assertions: int = 0, ingredients: int = 1,
+                   raw_ingredient: bool = False, generative: bool = False,
+                   authors: int = 1) -> dict:
+    """C2PA data in the shape extract_c2pa_data returns.
+
+    assertions adds that many extra (non-actions, non-CreativeWork)
+    assertions; generative marks only the last action as AI; raw_ingredient
+    makes only the last ingredient a DNG.
+    """
+    action_list = [_action(i, generative and i == actions - 1) for i in range(actions)]
+    creative_work = {
+        '@context': 'https://schema.org',
+        '@type': 'CreativeWork',
+        'name': 'Street at night',
+        'description': 'Belgrade, Serbia',
+        'keywords': ['street', 'night', 'belgrade'],
+        'author': [
+            {'@type': 'Person', 'name': f'Author {n}', '@id': f'https://www.instagram.com/author{n}'}
+            for n in range(authors)
+        ],
+        'copyrightHolder': [{'name': 'Jane Doe'}],
+        'url': ['https://example.com/about', 'https://www.linkedin.com/in/janedoe'],
+    }
+    extra = [
+        {'label': label, 'data': {'alg': 'sha256', 'hash': 'q2V4YW1wbGU=' * 4, 'pad': ''}}
+        for label in (f'c2pa.hash.data.part{n}' if n % 3 else f'c2pa.ingredient.v3__{n}'
+                      for n in range(assertions))
+    ]
+    ingredient_list = [
+        {'title': f'IMG_{n:04d}.jpg', 'format': 'image/jpeg', 'relationship': 'componentOf',
+         'instance_id': f'xmp:iid:{n:08x}'}
+        for n in range(ingredients)
+    ]
+    if raw_ingredient and ingredient_list:
+        ingredient_list[-1].update(title='DSCF9243.dng', format='image/x-adobe-dng')
+        for ingredient in ingredient_list[:-1]:
+            ingredient['format'] = 'application/octet-stream'
+    return {
+        'basic_info': {
+            'title': 'DSCF9243.jpg', 'format': 'image/jpeg', 'instance_id': 'xmp:iid:0001',
+            'claim_generator': 'Adobe_Lightroom/14.2 adobe_c2pa/0.12.2 c2pa-rs/0.39.0',
+        },
+        'signature_info': {'issuer': 'Adobe Inc.', 'time': '2025-03-02T11:19:14+00:00'},
+        'assertions': [{'label': 'c2pa.actions.v2', 'data': {'actions': action_list}}]
+                      + extra
+                      + [{'label': 'stds.schema-org.CreativeWork', 'data': creative_work}],
+        'ingredients': ingredient_list,
+        'actions': [dict(action) for action in action_list],
+        'author_info': dict(creative_work, social_links={'instagram': 'https://www.instagram.com/author0'}),
+    }
+
+
+def make_manifest_store_json(manifests: int = 1, assertions: int = 4, ingredients: int = 1) -> str:
+    """A manifest store as c2pa.Reader.json() returns it (indented).
+
+    Each of manifests manifests has the CreativeWork and actions assertions
+    plus assertions - 2 others, and ingredients ingredients with their
+    validation results; the last one is the active manifest, with the
+    others as its history.
+    """
+    validation = {'activeManifest': {
+        'success': [{'code': 'assertion.hashedURI.match', 'url': f'self#jumbf=/c2pa/urn:c2pa:x/c2pa.assertions/a{n}',
+                     'explanation': 'hashed uri matched'} for n in range(12)],
+        'informational': [], 'failure': [],
+    }, 'specVersion': '2.4.0'}
+    data = make_c2pa_data(actions=10, assertions=max(0, assertions - 2), ingredients=0)
+
+    def manifest(n):
+        return {
+            'claim_generator': data['basic_info']['claim_generator'],
+            'title': f'IMG_{n:04d}.jpg',
+            'thumbnail': {'format': 'image/jpeg', 'identifier': f'self#jumbf=/c2pa/urn:c2pa:{n}/c2pa.thumbnail.claim'},
+            'ingredients': [
+                {'title': f'IMG_{n:04d}_{i}.jpg', 'format': 'image/jpeg', 'relationship': 'parentOf',
+                 'instance_id': f'xmp.iid:{n:04x}{i:04x}', 'active_manifest': f'urn:c2pa:{n - 1}',
+                 'validation_results': validation, 'label': 'c2pa.ingredient.v3'}
+                for i in range(ingredients)
+            ],
+            'assertions': data['assertions'],
+            'signature_info': data['signature_info'],
+            'label': f'urn:c2pa:{n}',
+        }
+
+    store = {'active_manifest': f'urn:c2pa:{manifests - 1}',
+             'manifests': {f'urn:c2pa:{n}': manifest(n) for n in range(manifests)},
+             'validation_results': validation}
+    return json.dumps(store, indent=2)
+
+
+def make_exif_data(rationals: bool = False) -> dict:
+    """exif_data as extract_exif_metadata returns it, with floats or raw (num, den) tuples."""
+    exif = {
+        'Make': 'FUJIFILM', 'Model': 'GFX 50S', 'LensModel': 'GF63mmF2.8 R WR',
+        'FNumber': (28, 10) if rationals else 2.8,
+        'ExposureTime': (1, 250) if rationals else 0.004,
+        'FocalLength': (63, 1) if rationals else 63.0,
+        'ISOSpeedRatings': (400,) if rationals else 400,
+        'ColorSpace': 1,
+        'DateTimeOriginal': '2017:11:30 14:15:00',
+        'DateTimeDigitized': '2017:11:30 14:15:00',
+        'Artist': 'Jane Doe',
+    }
+    return {'format': 'JPEG', 'width': 8256, 'height': 6192, 'exif': exif, 'color_profile': 'sRGB IEC61966-2.1'}
+
+
+def cases() -> dict:
+    """Benchmark cases by name: (function, args)."""
+    camera = make_c2pa_data()
+    large_actions = make_c2pa_data(actions=500)
+    many_assertions = make_c2pa_data(assertions=300)
+    long_chain = make_c2pa_data(ingredients=200, raw_ingredient=True, actions=0)
+    late_generative = make_c2pa_data(actions=200, generative=True)
+    gps = (IFDRational(44, 1), IFDRational(49, 1), IFDRational(1234, 100))
+    small_store = make_manifest_store_json()
+    large_store = make_manifest_store_json(manifests=20, assertions=60, ingredients=5)
+    return {
+        # What the mini path decodes: the whole store, or only the fields it uses
+        'manifest_json/full_camera': (json.loads, (small_store,)),
+        'manifest_json/mini_camera': (manifest_json.mini_manifest, (small_store, assertion_used)),
+        'manifest_json/full_large_history': (json.loads, (large_store,)),
+        'manifest_json/mini_large_history': (manifest_json.mini_manifest, (large_store, assertion_used)),
+        'source_type/camera': (server.get_digital_source_type, (camera,)),
+        'source_type/large_actions': (server.get_digital_source_type, (large_actions,)),
+        'source_type/many_assertions': (server.get_digital_source_type, (many_assertions,)),
+        'source_type/long_ingredient_chain': (server.get_digital_source_type, (long_chain,)),
+        'source_type/late_generative': (server.get_digital_source_type, (late_generative,)),
+        'provenance/camera': (server.format_provenance_for_web, (camera,)),
+        'provenance/large_actions': (server.format_provenance_for_web, (large_actions,)),
+        'photography/floats': (server.format_photography_metadata, (make_exif_data(),)),
+        'photography/rationals': (server.format_photography_metadata, (make_exif_data(rationals=True),)),
+        'social_links/one_author': (server.extract_social_links, (camera['author_info'],)),
+        'social_links/many_authors': (server.extract_social_links,
+                                      (make_c2pa_data(authors=100)['author_info'],)),
+        'datetime/iso_local': (server.format_datetime_full, ('2025-03-02T11:19:14+00:00', True)),
+        'datetime/iso': (server.format_datetime_full, ('2025-03-02T11:19:14Z',)),
+        'datetime/exif': (server.format_datetime_full, ('2021:10:08 21:17:42',)),
+        'datetime/invalid': (server.format_datetime_full, ('yesterday at noon',)),
+        'exif_value/rational': (server.convert_exif_value, (IFDRational(28, 10),)),
+        'exif_value/gps_tuple': (server.convert_exif_value, ((gps, gps),)),
+        'exif_value/maker_note': (server.convert_exif_value, (bytes(range(256)) * 256,)),
+        'exif_value/int_list': (server.convert_exif_value, (list(range(64)),)),
+    }
+
+
+def time_call(fn, args, min_time: float = 0.2, repeat: int = 5) -> dict:
+    """Nanoseconds per call: best and median of repeat runs of min_time each."""
+    loops = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(loops):
+            fn(*args)
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time / 10:
+            break
+        loops *= 10
+    loops = max(1, int(loops * min_time / elapsed))
+    per_call = []
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            started = time.perf_counter()
+            for _ in range(loops):
+                fn(*args)
+            per_call.append((time.perf_counter() - started) / loops * 1e9)
+    finally:
+        if gc_enabled:
+            gc.enable()
+    return {'best_ns': round(min(per_call)), 'median_ns': round(statistics.median(per_call)), 'loops': loops}
+
+
+def measure_allocations(fn, args, calls: int = 20) -> dict:
+    """Bytes one call allocates at its peak and still holds on return (its result)."""
+    fn(*args)  # warm caches (e.g. strptime's format cache)
+    peaks, retained = [], []
+    tracemalloc.start()
+    try:
+        for _ in range(calls):
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            result = fn(*args)
+            current, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - before)
+            retained.append(current - before)
+            del result
+    finally:
+        tracemalloc.stop()
+    return {'peak_bytes': int(statistics.median(peaks)), 'retained_bytes': int(statistics.median(retained))}
+
+
+def run_benchmarks(pattern: str = '', min_time: float = 0.2, repeat: int = 5, progress=None) -> dict:
+    """Time and measure every case whose name contains pattern; returns the JSON-ready report."""
+    results = []
+    for name, (fn, args) in cases().items():
+        if pattern not in name:
+            continue
+        result = {'case': name, **time_call(fn, args, min_time, repeat), **measure_allocations(fn, args)}
+        results.append(result)
+        if progress:
+            progress(result)
+    return {
+        'meta': {
+            'commit': git_commit(),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+        },
+        'results': results,
+    }
+
+
+HEADER = f"{'case':<36} {'best µs':>10} {'median µs':>10} {'peak B':>10} {'kept B':>10}"
+
+
+def format_row(result: dict) -> str:
+    return (f"{result['case']:<36} {result['best_ns'] / 1000:>10.2f} {result['median_ns'] / 1000:>10.2f} "
+            f"{result['peak_bytes']:>10} {result['retained_bytes']:>10}")
+
+
+def compare(baseline: dict, report: dict) -> list:
+    """Lines showing the change in best time and peak memory from baseline."""
+    before = {r['case']: r for r in baseline['results']}
+    lines = [f"{'case':<36} {'best':>9} {'peak':>9}"]
+    for result in report['results']:
+        old = before.get(result['case'])
+        if old is None:
+            continue
+
+        def change(key):
+            return f"{(result[key] - old[key]) / old[key] * 100:+.1f}%" if old[key] else 'n/a'
+
+        lines.append(f"{result['case']:<36} {change('best_ns'):>9} {change('peak_bytes'):>9}")
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Micro-benchmarks for the formatting functions')
+    parser.add_argument('-k', dest='pattern', default='', help='Only run cases whose name contains this')
+    parser.add_argument('--min-time', type=float, default=0.2, help='Seconds per timing run (default: 0.2)')
+    parser.add_argument('--repeat', type=int, default=5, help='Timing runs per case (default: 5)')
+    parser.add_argument('-o', '--output', help='Write the JSON report to this file')
+    parser.add_argument('--compare', help='JSON report of an earlier run to compare against')
+    args = parser.parse_args()
+
+    print(HEADER)
+    report = run_benchmarks(args.pattern, args.min_time, args.repeat,
+                            progress=lambda result: print(format_row(result), flush=True))
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2) + '\n')
+        print(f"\nReport written to {args.output}")
+    if args.compare:
+        print(f"\nChange from {args.compare}:")
+        print('\n'.join(compare(json.loads(Path(args.compare).read_text()), report)))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+"""
+Load benchmark for the API endpoints of server.py.
+
+Starts the app in-process (uvicorn on a loopback port) with a local stand-in
+origin serving a generated corpus of C2PA-signed, EXIF-heavy and plain JPEGs,
+then drives each endpoint with keep-alive clients at a fixed concurrency:
+
+- cold: caches cleared, every corpus image requested once
+- warm: the same images requested again, cycling until --requests are done
+
+Throughput and p50/p95/p99 latency per endpoint and phase are printed and
+written as JSON, so runs from different commits can be compared.
+
+Usage:
+    uv run python bench_server.py                              # All endpoints, concurrency 8
+    uv run python bench_server.py -c 32 --requests 1000 -o bench.json
+    uv run python bench_server.py --endpoints c2pa_mini upload
+    uv run python bench_server.py -o new.json --compare old.json
+"""
+
+import argparse
+import http.client
+import io
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from urllib.parse import urlencode
+
+ROOT = Path(__file__).resolve().parent
+# The corpus generators and the stand-in origin are shared with the tests
+sys.path.insert(0, str(ROOT / 'tests'))
+
+ENDPOINTS = ('exif_metadata', 'c2pa_metadata', 'c2pa_mini', 'metadata', 'upload')
+KINDS = ('c2pa', 'exif', 'plain')
+
+
+def build_corpus(count: int, width: int, height: int) -> dict:
+    """count distinct JPEGs of each kind, as {kind: [(name, bytes), ...]}."""
+    from PIL import Image
+
+    from images import make_exif_jpeg, make_signed_jpeg
+
+    def picture(i: int) -> Image.Image:
+        # Gradients rather than flat colour, so JPEGs have realistic sizes
+        size = (width, height)
+        return Image.merge('RGB', (
+            Image.linear_gradient('L').rotate(i * 23).resize(size),
+            Image.radial_gradient('L').resize(size),
+            Image.new('L', size, (i * 37) % 256),
+        ))
+
+    corpus = {kind: [] for kind in KINDS}
+    for i in range(count):
+        plain = picture(i)
+        buf = io.BytesIO()
+        plain.save(buf, 'JPEG', quality=90)
+        exif = make_exif_jpeg(source=picture(i), icc=True)
+        corpus['plain'].append((f'plain-{i}.jpg', buf.getvalue()))
+        corpus['exif'].append((f'exif-{i}.jpg', exif))
+        corpus['c2pa'].append((f'c2pa-{i}.jpg', make_signed_jpeg(source=exif, title=f'c2pa-{i}.jpg')))
+    return corpus
+
+
+class AppServer:
+    """server.app served by uvicorn on a background thread."""
+    def __init__(self):
+        import uvicorn
+
+        import server
+        self.module = server
+        # proto must be IPPROTO_TCP, or asyncio leaves Nagle's algorithm on and
+        # every keep-alive response waits ~40ms for a delayed ACK
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM, socket.IPPROTO_TCP)
+        self._socket.bind(('127.0.0.1', 0))
+        self.port = self._socket.getsockname()[1]
+        self._server = uvicorn.Server(uvicorn.Config(server.app, log_level='warning', access_log=False))
+        self._thread = threading.Thread(target=self._server.run, kwargs={'sockets': [self._socket]},
+                                        daemon=True)
+
+    def start(self):
+        self._thread.start()
+        deadline = time.monotonic() + 30
+        while not self._server.started:
+            if time.monotonic() > deadline or not self._thread.is_alive():
+                raise RuntimeError('server did not start')
+            time.sleep(0.05)
+        return self
+
+    def clear_caches(self):
+        self.module.content_cache.clear()
+        self.module._mini_cache.clear()
+        self.module.origin_validators.clear()
+
+    def stop(self):
+        self._server.should_exit = True
+        self._thread.join(timeout=30)
+
+
+def _multipart(name: str, body: bytes):
+    boundary = uuid.uuid4().hex
+    payload = (
+        f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{name}"\r\n'
+        f'Content-Type: image/jpeg\r\n\r\n'
+    ).encode() + body + f'\r\n--{boundary}--\r\n'.encode()
+    return payload, f'multipart/form-data; boundary={boundary}'
+
+
+def make_request(endpoint: str, name: str, body: bytes, url: str) -> tuple:
+    """(method, path, body, headers) of one request for a corpus image."""
+    if endpoint == 'upload':
+        payload, content_type = _multipart(name, body)
+        return 'POST', '/api/upload', payload, {'Content-Type': content_type}
+    return 'GET', f'/api/{endpoint}?{urlencode({"uri": url})}', None, {}
+
+
+def percentile(ordered: list, p: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not ordered:
+        return 0.0
+    rank = max(1, -(-len(ordered) * p // 100))
+    return ordered[int(rank) - 1]
+
+
+def run_phase(port: int, requests: list, concurrency: int) -> dict:
+    """Send requests with concurrency keep-alive clients; summarise the results."""
+    latencies, statuses = [], {}
+    lock = threading.Lock()
+    next_index = iter(range(len(requests)))
+
+    def client():
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=120)
+        try:
+            while True:
+                with lock:
+                    index = next(next_index, None)
+                if index is None:
+                    return
+                method, path, body, headers = requests[index]
+                started = time.perf_counter()
+                try:
+                    conn.request(method, path, body=body, headers=headers)
+                    response = conn.getresponse()
+                    response.read()
+                    status = str(response.status)
+                except (OSError, http.client.HTTPException) as e:
+                    conn.close()
+                    status = type(e).__name__
+                elapsed = (time.perf_counter() - started) * 1000
+                with lock:
+                    latencies.append(elapsed)
+                    statuses[status] = statuses.get(status, 0) + 1
+        finally:
+            conn.close()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as clients:
+        for future in [clients.submit(client) for _ in range(concurrency)]:
+            future.result()
+    seconds = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'errors': sum(n for status, n in statuses.items() if not status.startswith('2')),
+        'status': statuses,
+        'seconds': round(seconds, 3),
+        'throughput_rps': round(len(latencies) / seconds, 1) if seconds else 0.0,
+        'latency_ms': {
+            'p50': round(percentile(latencies, 50), 2),
+            'p95': round(percentile(latencies, 95), 2),
+            'p99': round(percentile(latencies, 99), 2),
+            'mean': round(sum(latencies) / len(latencies), 2) if latencies else 0.0,
+            'max': round(latencies[-1], 2) if latencies else 0.0,
+        },
+    }
+
+
+def git_commit() -> str:
+    """The checked-out commit, recorded in reports so runs can be matched to code."""
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmark(endpoints=ENDPOINTS, concurrency: int = 8, requests: int = 200,
+                  images: int = 10, width: int = 640, height: int = 480,
+                  progress=None) -> dict:
+    """Benchmark endpoints cold and warm; returns the JSON-ready report."""
+    from origin import OriginServer
+
+    corpus = build_corpus(images, width, height)
+    origin = OriginServer().start()
+    app = AppServer().start()
+    try:
+        targets = []
+        for kind in KINDS:
+            for name, body in corpus[kind]:
+                targets.append((name, body, origin.add(f'/{name}', body)))
+
+        results = []
+        for endpoint in endpoints:
+            batch = [make_request(endpoint, *target) for target in targets]
+            app.clear_caches()
+            cold = run_phase(app.port, batch, concurrency)
+            warm = run_phase(app.port, [batch[i % len(batch)] for i in range(requests)], concurrency)
+            for phase, stats in (('cold', cold), ('warm', warm)):
+                results.append({'endpoint': f'/api/{endpoint}', 'phase': phase, **stats})
+                if progress:
+                    progress(results[-1])
+    finally:
+        app.stop()
+        origin.stop()
+
+    return {
+        'meta': {
+            'commit': git_commit(),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'concurrency': concurrency,
+            'warm_requests': requests,
+            'corpus': {
+                kind: {'images': len(corpus[kind]), 'bytes': sum(len(body) for _, body in corpus[kind])}
+                for kind in KINDS
+            },
+            'image_size': f'{width}x{height}',
+        },
+        'results': results,
+    }
+
+
+def format_row(result: dict) -> str:
+    latency = result['latency_ms']
+    return (f"{result['endpoint']:<20} {result['phase']:<5} {result['requests']:>6} {result['errors']:>6} "
+            f"{result['throughput_rps']:>9.1f} {latency['p50']:>9.1f} {latency['p95']:>9.1f} {latency['p99']:>9.1f}")
+
+
+HEADER = (f"{'endpoint':<20} {'phase':<5} {'reqs':>6} {'errors':>6} "
+          f"{'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+
+
+def compare(baseline: dict, report: dict) -> list:
+    """Lines showing the change in throughput and latency from baseline."""
+    before = {(r['endpoint'], r['phase']): r for r in baseline['results']}
+    lines = [f"{'endpoint':<20} {'phase':<5} {'req/s':>9} {'p50':>9} {'p95':>9} {'p99':>9}"]
+    for result in report['results']:
+        old = before.get((result['endpoint'], result['phase']))
+        if old is None:
+            continue
+
+        def change(new_value, old_value):
+            return f"{(new_value - old_value) / old_value * 100:+.1f}%" if old_value else 'n/a'
+
+        lines.append(
+            f"{result['endpoint']:<20} {result['phase']:<5} "
+            f"{change(result['throughput_rps'], old['throughput_rps']):>9} "
+            + ' '.join(f"{change(result['latency_ms'][p], old['latency_ms'][p]):>9}"
+                       for p in ('p50', 'p95', 'p99'))
+        )
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load benchmark for the C2PA Metadata Viewer API')
+    parser.add_argument('-c', '--concurrency', type=int, default=8, help='Concurrent clients (default: 8)')
+    parser.add_argument('--requests', type=int, default=200, help='Requests per warm phase (default: 200)')
+    parser.add_argument('--images', type=int, default=10, help='Corpus images of each kind (default: 10)')
+    parser.add_argument('--size', default='640x480', help='Corpus image size (default: 640x480)')
+    parser.add_argument('--endpoints', nargs='+', choices=ENDPOINTS, default=list(ENDPOINTS))
+    parser.add_argument('-o', '--output', help='Write the JSON report to this file')
+    parser.add_argument('--compare', help='JSON report of an earlier run to compare against')
+    args = parser.parse_args()
+
+    # Measure the in-memory caches, quietly, and never turn load into 503s
+    os.environ.setdefault('C2PA_DISK_CACHE_PATH', '')
+    os.environ.setdefault('C2PA_LOG_LEVEL', 'WARNING')
+    os.environ.setdefault('C2PA_EXECUTOR_QUEUE_DEPTH', str(max(16, args.concurrency * 4)))
+
+    width, height = (int(n) for n in args.size.lower().split('x'))
+    print(HEADER)
+    report = run_benchmark(args.endpoints, args.concurrency, args.requests, args.images,
+                           width, height, progress=lambda result: print(format_row(result), flush=True))
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2) + '\n')
+        print(f"\nReport written to {args.output}")
+    else:
+        print('\n' + json.dumps(report, indent=2))
+    if args.compare:
+        print(f"\nChange from {args.compare}:")
+        print('\n'.join(compare(json.loads(Path(args.compare).read_text()), report)))
+    failed = sum(result['errors'] for result in report['results'])
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,478 @@
+"""
+Caches for extraction results.
+
+LRUCache is a bounded in-memory cache (entry count and byte budget, LRU
+eviction, per-entry TTL with a background sweeper, hit/miss counters). It backs
+both the /api/c2pa_mini response cache and ContentCache, which stores the output
+of each extraction stage (C2PA, EXIF, IPTC, thumbnails, ...) keyed by the
+SHA-256 of the image bytes, so the same image is only extracted once no matter
+which URL or upload it arrived through.
+
+DiskCache is an optional SQLite tier underneath the in-memory caches (joined by
+TieredCache), so results survive a machine restart. It is size-capped and safe
+to share between worker processes.
+"""
+
+import hashlib
+import logging
+import pickle
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+
+# Returned by get() when nothing is cached; None is a valid cached result
+# (e.g. "this image has no C2PA manifest").
+MISSING = object()
+
+logger = logging.getLogger('c2pa_viewer.cache')
+
+
+def hash_file(path: str, chunk_size: int = 64 * 1024) -> str:
+    """SHA-256 hex digest of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def estimate_size(value) -> int:
+    """Approximate memory cost of a cached value, in bytes.
+
+    The length of every str and bytes in it, plus a word for each container
+    and scalar: cheap enough to run on every insert, without serializing.
+    """
+    size = 0
+    pending = [value]
+    while pending:
+        item = pending.pop()
+        if isinstance(item, (str, bytes, bytearray)):
+            size += len(item)
+        elif isinstance(item, dict):
+            size += 8
+            pending.extend(item.keys())
+            pending.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset)):
+            size += 8
+            pending.extend(item)
+        elif item is None or isinstance(item, (bool, int, float)):
+            size += 8
+        else:
+            size += sys.getsizeof(item)
+    return size
+
+
+class LRUCache:
+    """Thread-safe LRU cache bounded by entry count and total size, with TTLs.
+
+    Expired entries are dropped when looked up and by sweep(), which a
+    background thread can run periodically (start_sweeper) so entries that are
+    never requested again don't linger until evicted.
+    """
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 16 * 1024 * 1024,
+                 ttl: float = 300, sizeof=estimate_size):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.sizeof = sizeof
+        # key -> (value, expires_at, size)
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._sweeper = None
+        self._stop_sweeper = threading.Event()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key, default=MISSING):
+        """Return the cached value, or default if absent or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            value, expires_at, _ = entry
+            if time.time() >= expires_at:
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl: float = None):
+        """Store a value, evicting least recently used entries to make room.
+
+        Values larger than the whole byte budget are not cached.
+        """
+        size = self.sizeof(value)
+        if size > self.max_bytes:
+            return
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, expires_at, size)
+            self._bytes += size
+            while (len(self._entries) > self.max_entries
+                   or self._bytes > self.max_bytes):
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def sweep(self) -> int:
+        """Drop every expired entry; returns how many were removed."""
+        now = time.time()
+        with self._lock:
+            expired = [k for k, (_, expires_at, _) in self._entries.items() if now >= expires_at]
+            for key in expired:
+                self._remove(key)
+            self.expirations += len(expired)
+        return len(expired)
+
+    def start_sweeper(self, interval: float = 60, on_sweep=None):
+        """Sweep expired entries every interval seconds on a daemon thread.
+
+        on_sweep, if given, is called after each sweep (e.g. to sweep a
+        backing tier on the same thread).
+        """
+        if self._sweeper is not None and self._sweeper.is_alive():
+            return
+        self._stop_sweeper.clear()
+
+        def run():
+            while not self._stop_sweeper.wait(interval):
+                self.sweep()
+                if on_sweep is not None:
+                    on_sweep()
+
+        self._sweeper = threading.Thread(target=run, name='cache-sweeper', daemon=True)
+        self._sweeper.start()
+
+    def stop_sweeper(self):
+        self._stop_sweeper.set()
+        if self._sweeper is not None:
+            self._sweeper.join(timeout=1)
+            self._sweeper = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+            }
+
+    def _remove(self, key):
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def __contains__(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and time.time() < entry[1]
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class DiskCache:
+    """Size-capped persistent cache in a SQLite file.
+
+    Uses WAL mode and a busy timeout so several worker processes can read and
+    write the same file concurrently; each thread gets its own connection.
+    Values are pickled. When the total stored size exceeds max_bytes, the least
+    recently accessed entries are deleted until it is back under 90% of it.
+    The total is kept in a one-row table that triggers update in the same
+    transaction as each write, so checking it doesn't scan the entries.
+    """
+    def __init__(self, path: str, max_bytes: int = 256 * 1024 * 1024):
+        self.path = str(path)
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        conn = self._conn()
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS entries ('
+            ' key TEXT PRIMARY KEY,'
+            ' value BLOB NOT NULL,'
+            ' size INTEGER NOT NULL,'
+            ' expires_at REAL NOT NULL,'
+            ' accessed_at REAL NOT NULL)'
+        )
+        conn.execute('CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed_at)')
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS totals ('
+                ' id INTEGER PRIMARY KEY CHECK (id = 0),'
+                ' size INTEGER NOT NULL)'
+            )
+            # Files written before the totals table existed start from a scan
+            conn.execute('INSERT OR IGNORE INTO totals (id, size)'
+                         ' SELECT 0, COALESCE(SUM(size), 0) FROM entries')
+            conn.execute('CREATE TRIGGER IF NOT EXISTS entries_insert AFTER INSERT ON entries'
+                         ' BEGIN UPDATE totals SET size = size + NEW.size; END')
+            conn.execute('CREATE TRIGGER IF NOT EXISTS entries_update AFTER UPDATE OF size ON entries'
+                         ' BEGIN UPDATE totals SET size = size - OLD.size + NEW.size; END')
+            conn.execute('CREATE TRIGGER IF NOT EXISTS entries_delete AFTER DELETE ON entries'
+                         ' BEGIN UPDATE totals SET size = size - OLD.size; END')
+            conn.execute('COMMIT')
+        except sqlite3.Error:
+            conn.execute('ROLLBACK')
+            raise
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def get_entry(self, key: str):
+        """Return (value, expires_at) for an unexpired entry, or None."""
+        now = time.time()
+        try:
+            conn = self._conn()
+            row = conn.execute(
+                'SELECT value, expires_at, accessed_at FROM entries WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, expires_at, accessed_at = row
+            if now >= expires_at:
+                conn.execute('DELETE FROM entries WHERE key = ? AND expires_at <= ?', (key, now))
+                return None
+            # Only touch the LRU timestamp occasionally to keep reads cheap
+            if now - accessed_at > 60:
+                conn.execute('UPDATE entries SET accessed_at = ? WHERE key = ?', (now, key))
+            return pickle.loads(value), expires_at
+        except (sqlite3.Error, pickle.PickleError, EOFError) as e:
+            logger.warning('Disk cache read failed: %s', e)
+            return None
+
+    def get(self, key: str, default=MISSING):
+        entry = self.get_entry(key)
+        return default if entry is None else entry[0]
+
+    def set(self, key: str, value, ttl: float):
+        try:
+            blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        except (pickle.PickleError, TypeError, AttributeError) as e:
+            logger.warning('Disk cache cannot store %s: %s', key, e)
+            return
+        if len(blob) > self.max_bytes:
+            return
+        now = time.time()
+        try:
+            conn = self._conn()
+            # An upsert rather than INSERT OR REPLACE, whose implicit delete
+            # would not fire the totals trigger
+            conn.execute(
+                'INSERT INTO entries (key, value, size, expires_at, accessed_at)'
+                ' VALUES (?, ?, ?, ?, ?)'
+                ' ON CONFLICT (key) DO UPDATE SET value = excluded.value, size = excluded.size,'
+                ' expires_at = excluded.expires_at, accessed_at = excluded.accessed_at',
+                (key, blob, len(blob), now + ttl, now),
+            )
+            self._evict(conn)
+        except sqlite3.Error as e:
+            logger.warning('Disk cache write failed: %s', e)
+
+    @staticmethod
+    def _total(conn) -> int:
+        return conn.execute('SELECT size FROM totals WHERE id = 0').fetchone()[0]
+
+    def _evict(self, conn):
+        if self._total(conn) <= self.max_bytes:
+            return
+        target = int(self.max_bytes * 0.9)
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute('DELETE FROM entries WHERE expires_at <= ?', (time.time(),))
+            total = self._total(conn)
+            rows = conn.execute('SELECT key, size FROM entries ORDER BY accessed_at').fetchall()
+            doomed = []
+            for key, size in rows:
+                if total <= target:
+                    break
+                doomed.append((key,))
+                total -= size
+            conn.executemany('DELETE FROM entries WHERE key = ?', doomed)
+            conn.execute('COMMIT')
+        except sqlite3.Error:
+            conn.execute('ROLLBACK')
+            raise
+
+    def delete(self, key: str):
+        try:
+            self._conn().execute('DELETE FROM entries WHERE key = ?', (key,))
+        except sqlite3.Error as e:
+            logger.warning('Disk cache delete failed: %s', e)
+
+    def delete_prefix(self, prefix: str):
+        """Delete every key starting with prefix."""
+        escaped = prefix.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        try:
+            self._conn().execute("DELETE FROM entries WHERE key LIKE ? ESCAPE '\\'",
+                                 (escaped + '%',))
+        except sqlite3.Error as e:
+            logger.warning('Disk cache delete failed: %s', e)
+
+    def sweep(self) -> int:
+        """Delete expired entries; returns how many were removed."""
+        try:
+            cursor = self._conn().execute('DELETE FROM entries WHERE expires_at <= ?', (time.time(),))
+            return cursor.rowcount
+        except sqlite3.Error as e:
+            logger.warning('Disk cache sweep failed: %s', e)
+            return 0
+
+    def stats(self) -> dict:
+        try:
+            conn = self._conn()
+            count = conn.execute('SELECT COUNT(*) FROM entries').fetchone()[0]
+            total = self._total(conn)
+        except sqlite3.Error:
+            count, total = 0, 0
+        return {'entries': count, 'bytes': total, 'max_bytes': self.max_bytes}
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+class TieredCache:
+    """An LRUCache in front of an optional shared DiskCache.
+
+    Reads check memory first, then disk (promoting hits into memory with their
+    remaining TTL); writes go to both. Keys are namespaced on disk so several
+    caches can share one file.
+    """
+    def __init__(self, memory: LRUCache, disk: DiskCache = None, namespace: str = ''):
+        self.memory = memory
+        self.disk = disk
+        self.namespace = namespace
+        self.disk_hits = 0
+
+    def _disk_key(self, key) -> str:
+        if isinstance(key, tuple):
+            key = ':'.join(str(part) for part in key)
+        return f"{self.namespace}:{key}"
+
+    def get(self, key, default=MISSING):
+        value = self.memory.get(key)
+        if value is not MISSING:
+            return value
+        if self.disk is not None:
+            entry = self.disk.get_entry(self._disk_key(key))
+            if entry is not None:
+                value, expires_at = entry
+                self.disk_hits += 1
+                self.memory.set(key, value, ttl=max(0.0, expires_at - time.time()))
+                return value
+        return default
+
+    def set(self, key, value, ttl: float = None):
+        self.memory.set(key, value, ttl=ttl)
+        if self.disk is not None:
+            self.disk.set(self._disk_key(key), value, self.memory.ttl if ttl is None else ttl)
+
+    def delete(self, key):
+        self.memory.delete(key)
+        if self.disk is not None:
+            self.disk.delete(self._disk_key(key))
+
+    def clear(self):
+        """Clear memory, and this cache's namespace on disk."""
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.delete_prefix(f"{self.namespace}:")
+
+    def sweep(self) -> int:
+        removed = self.memory.sweep()
+        if self.disk is not None:
+            removed += self.disk.sweep()
+        return removed
+
+    def start_sweeper(self, interval: float = 60):
+        self.memory.start_sweeper(interval, self.disk.sweep if self.disk is not None else None)
+
+    def stop_sweeper(self):
+        self.memory.stop_sweeper()
+
+    def stats(self) -> dict:
+        stats = self.memory.stats()
+        if self.disk is not None:
+            stats['disk'] = dict(self.disk.stats(), hits=self.disk_hits)
+        return stats
+
+    def __contains__(self, key):
+        return self.get(key) is not MISSING
+
+    def __len__(self):
+        return len(self.memory)
+
+
+class ContentCache:
+    """Per-stage extraction results keyed by image content hash."""
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 32 * 1024 * 1024,
+                 ttl: float = 3600, disk: DiskCache = None, namespace: str = 'content'):
+        self._cache = TieredCache(
+            LRUCache(max_entries=max_entries, max_bytes=max_bytes, ttl=ttl),
+            disk, namespace)
+
+    def get(self, content_hash: str, stage: str):
+        """Return the cached result for a stage, or MISSING."""
+        if not content_hash:
+            return MISSING
+        return self._cache.get((content_hash, stage))
+
+    def set(self, content_hash: str, stage: str, result):
+        """Store the result of a stage for an image."""
+        if not content_hash:
+            return
+        self._cache.set((content_hash, stage), result)
+
+    def start_sweeper(self, interval: float = 60):
+        self._cache.start_sweeper(interval)
+
+    def stop_sweeper(self):
+        self._cache.stop_sweeper()
+
+    def stats(self) -> dict:
+        return self._cache.stats()
+
+    def clear(self):
+        self._cache.clear()
+
+    def __len__(self):
+        return len(self._cache)
@@ -0,0 +1,144 @@
+"""
+Runtime settings for the C2PA Metadata Viewer server.
+All values can be overridden with environment variables (e.g. in fly.toml [env]).
+"""
+
+import logging
+import os
+import tempfile
+
+# Holds these warnings until logging is configured with the settings below
+import logs
+
+logger = logging.getLogger('c2pa_viewer.config')
+
+
+def _env_str(name: str, default: str) -> str:
+    """Read a string setting from the environment, falling back to default."""
+    return os.environ.get(name, default).strip()
+
+
+def _env_int(name: str, default: int) -> int:
+    """Read an integer setting from the environment, falling back to default."""
+    value = os.environ.get(name)
+    if value is None or value.strip() == '':
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        logger.warning('Ignoring invalid value for %s: %r', name, value, extra={'setting': name})
+        return default
+
+
+# Web server processes. `python serve.py` starts this many uvicorn workers
+# (0: one per CPU) and passes the resolved count on to them; each then takes
+# its share of the CPUs and in-memory cache budgets, and they share the disk
+# cache (see C2PA_DISK_CACHE_PATH) instead of each warming its own.
+WEB_WORKERS = _env_int('C2PA_WEB_WORKERS', 1)
+
+# CPUs available to each web worker
+_CPUS_PER_WORKER = max(1, (os.cpu_count() or 1) // max(1, WEB_WORKERS))
+
+# Extraction executor: threads that run downloads, c2pa.Reader and PIL work
+# off the event loop, and how many jobs may wait for a thread before new
+# requests are rejected with 503.
+EXECUTOR_WORKERS = _env_int('C2PA_EXECUTOR_WORKERS', max(4, _CPUS_PER_WORKER))
+EXECUTOR_QUEUE_DEPTH = _env_int('C2PA_EXECUTOR_QUEUE_DEPTH', 16)
+EXECUTOR_RETRY_AFTER = _env_int('C2PA_EXECUTOR_RETRY_AFTER', 2)
+
+# c2pa worker processes of each web worker: how many (default one per CPU;
+# 0 runs c2pa.Reader on the executor threads instead), the wall-clock limit in
+# seconds after which a job's worker is killed, the resident size above
+# which a worker is replaced once its job is done, and (on Linux) the hard
+# cap on a worker's heap, past which its job fails (0: no cap).
+PROCESS_WORKERS = _env_int('C2PA_PROCESS_WORKERS', _CPUS_PER_WORKER)
+PROCESS_JOB_TIMEOUT = _env_int('C2PA_PROCESS_JOB_TIMEOUT', 20)
+PROCESS_MAX_RSS_BYTES = _env_int('C2PA_PROCESS_MAX_RSS_BYTES', 64 * 1024 * 1024)
+PROCESS_MAX_MEMORY_BYTES = _env_int('C2PA_PROCESS_MAX_MEMORY_BYTES', 128 * 1024 * 1024)
+
+# Remote image downloads: overall deadline (seconds) for a full fetch, the
+# shorter deadline used by /api/c2pa_mini, the largest body accepted, the
+# streaming chunk size, and keep-alive pooling per origin.
+DOWNLOAD_DEADLINE = _env_int('C2PA_DOWNLOAD_DEADLINE', 30)
+MINI_DOWNLOAD_DEADLINE = _env_int('C2PA_MINI_DOWNLOAD_DEADLINE', 15)
+DOWNLOAD_MAX_BYTES = _env_int('C2PA_DOWNLOAD_MAX_BYTES', 100 * 1024 * 1024)
+DOWNLOAD_CHUNK_SIZE = _env_int('C2PA_DOWNLOAD_CHUNK_SIZE', 64 * 1024)
+DOWNLOAD_POOL_MAX_IDLE_PER_HOST = _env_int('C2PA_DOWNLOAD_POOL_MAX_IDLE_PER_HOST', 4)
+DOWNLOAD_POOL_IDLE_TIMEOUT = _env_int('C2PA_DOWNLOAD_POOL_IDLE_TIMEOUT', 60)
+
+# Header-only reads (/api/c2pa_mini, /api/exif_metadata) fetch just the
+# leading bytes of a JPEG/PNG image, where its metadata and manifest store
+# live, with HTTP Range requests: the first range size, and the most that is
+# fetched this way before falling back to a full download. Set
+# C2PA_HEADER_ONLY_FETCH=0 to always download whole images.
+HEADER_ONLY_FETCH = _env_int('C2PA_HEADER_ONLY_FETCH', 1)
+RANGE_INITIAL_BYTES = _env_int('C2PA_RANGE_INITIAL_BYTES', 64 * 1024)
+RANGE_MAX_BYTES = _env_int('C2PA_RANGE_MAX_BYTES', 4 * 1024 * 1024)
+
+# Content-addressed extraction result cache: how many stage results to keep
+# (one per image per stage), their total size budget, and how long (seconds)
+# they stay valid.
+RESULT_CACHE_MAX_ENTRIES = _env_int('C2PA_RESULT_CACHE_MAX_ENTRIES', 1024)
+RESULT_CACHE_MAX_BYTES = _env_int('C2PA_RESULT_CACHE_MAX_BYTES', 16 * 1024 * 1024)
+RESULT_CACHE_TTL = _env_int('C2PA_RESULT_CACHE_TTL', 3600)
+
+# ETag / Last-Modified validators remembered per remote image URI, so results
+# can be revalidated with a conditional request instead of a re-download.
+# They are kept as long as extraction results (C2PA_RESULT_CACHE_TTL).
+ORIGIN_VALIDATORS_MAX_ENTRIES = _env_int('C2PA_ORIGIN_VALIDATORS_MAX_ENTRIES', 10000)
+
+# /api/c2pa_mini response cache, keyed by URI.
+MINI_CACHE_TTL = _env_int('C2PA_MINI_CACHE_TTL', 300)
+MINI_CACHE_MAX_ENTRIES = _env_int('C2PA_MINI_CACHE_MAX_ENTRIES', 10000)
+MINI_CACHE_MAX_BYTES = _env_int('C2PA_MINI_CACHE_MAX_BYTES', 4 * 1024 * 1024)
+
+# POST /api/c2pa_mini/batch: most URIs accepted per batch, and how many of a
+# batch's images are fetched and verified at once.
+MINI_BATCH_MAX_URIS = _env_int('C2PA_MINI_BATCH_MAX_URIS', 200)
+MINI_BATCH_CONCURRENCY = _env_int('C2PA_MINI_BATCH_CONCURRENCY', 8)
+
+# Cache-Control sent with GET /api/c2pa_mini, /api/exif_metadata and
+# /api/c2pa_metadata results: how long (seconds) browsers and CDNs may reuse
+# a result, and for how long after that they may keep serving it while they
+# revalidate it (with the ETag) in the background.
+API_CACHE_MAX_AGE = _env_int('C2PA_API_CACHE_MAX_AGE', 300)
+API_CACHE_STALE_WHILE_REVALIDATE = _env_int('C2PA_API_CACHE_STALE_WHILE_REVALIDATE', 3600)
+
+# /api/upload: largest upload accepted, and how long (seconds) uploaded
+# originals stay available from /api/original/{content_hash}, in a directory
+# (default: c2pa-uploads under the system temp dir) capped at a total size.
+UPLOAD_MAX_BYTES = _env_int('C2PA_UPLOAD_MAX_BYTES', 50 * 1024 * 1024)
+UPLOAD_TTL = _env_int('C2PA_UPLOAD_TTL', 600)
+UPLOAD_DIR = _env_str('C2PA_UPLOAD_DIR', '')
+UPLOAD_STORE_MAX_BYTES = _env_int('C2PA_UPLOAD_STORE_MAX_BYTES', 256 * 1024 * 1024)
+
+# /metrics: how many distinct image origins get their own label on the
+# downloaded-bytes counter (any others are counted under 'other').
+METRICS_MAX_ORIGINS = _env_int('C2PA_METRICS_MAX_ORIGINS', 100)
+
+# Optional JSON file of extra digital source type rules and labels, checked
+# before the built-in ones (format: see source_types.load_rules).
+SOURCE_TYPE_RULES = _env_str('C2PA_SOURCE_TYPE_RULES', '')
+
+# Most ingredient links /api/provenance_graph follows from the active
+# manifest (also its default max_depth).
+PROVENANCE_MAX_DEPTH = _env_int('C2PA_PROVENANCE_MAX_DEPTH', 32)
+
+# Logging: JSON lines on stderr at this level and above. High-volume
+# messages (per-download and per-cache-hit lines) below WARNING are only
+# written this percentage of the time.
+LOG_LEVEL = _env_str('C2PA_LOG_LEVEL', 'INFO').upper()
+LOG_SAMPLE_PERCENT = _env_int('C2PA_LOG_SAMPLE_PERCENT', 10)
+
+# How often (seconds) expired cache entries are swept in the background.
+CACHE_SWEEP_INTERVAL = _env_int('C2PA_CACHE_SWEEP_INTERVAL', 60)
+
+# Optional persistent SQLite cache under the in-memory caches, so results
+# survive machine auto-stop. Point it at a mounted volume (e.g.
+# /data/cache.sqlite3). Shared safely between workers; with several web
+# workers it defaults to a file in the system temp dir, otherwise it is off.
+DISK_CACHE_PATH = _env_str(
+    'C2PA_DISK_CACHE_PATH',
+    os.path.join(tempfile.gettempdir(), 'c2pa-cache.sqlite3') if WEB_WORKERS > 1 else '',
+)
+DISK_CACHE_MAX_BYTES = _env_int('C2PA_DISK_CACHE_MAX_BYTES', 256 * 1024 * 1024)
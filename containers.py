@@ -0,0 +1,173 @@
+"""
+Minimal JPEG/PNG container walking over a (possibly truncated) file prefix.
+
+Used to find where an image's metadata segments end without downloading or
+decoding the pixel data: JPEG segments up to and including the first scan
+header (SOS), PNG chunks up to the first IDAT. C2PA manifest stores live in JPEG APP11 segments and PNG
+caBX chunks, both of which precede the pixel data.
+"""
+
+from typing import List, NamedTuple, Optional
+
+
+JPEG_SOI = b'\xff\xd8'
+JPEG_EOI = b'\xff\xd9'
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+PNG_IEND = b'\x00\x00\x00\x00IEND\xaeB`\x82'
+
+# JPEG APPn markers
+APP1 = 0xE1   # EXIF, XMP
+APP2 = 0xE2   # ICC profile
+APP11 = 0xEB  # JUMBF (C2PA manifest store)
+APP13 = 0xED  # Photoshop IRB (IPTC)
+_SOS = 0xDA
+# Markers without a length field
+_STANDALONE = {0x01, 0xD8} | set(range(0xD0, 0xD8))
+
+
+class Segment(NamedTuple):
+    """A JPEG marker segment or PNG chunk: its id and [start, end) byte range."""
+    kind: object
+    start: int
+    end: int
+
+
+class HeaderScan(NamedTuple):
+    """What a prefix reveals about the header region of an image."""
+    format: str
+    # True once every segment before the pixel data is inside the prefix
+    complete: bool
+    # Offset where the pixel data (JPEG entropy-coded data, PNG IDAT) starts,
+    # valid when complete
+    header_end: int
+    # When not complete, the shortest prefix that would allow progress
+    needed: int
+    segments: List[Segment]
+
+
+def sniff_format(prefix: bytes) -> Optional[str]:
+    """'jpeg', 'png' or None from the leading magic bytes."""
+    if prefix.startswith(JPEG_SOI):
+        return 'jpeg'
+    if prefix.startswith(PNG_SIGNATURE):
+        return 'png'
+    return None
+
+
+def scan_header(prefix: bytes) -> Optional[HeaderScan]:
+    """Walk the segments in prefix; None if it isn't a JPEG/PNG we can walk."""
+    fmt = sniff_format(prefix)
+    if fmt == 'jpeg':
+        return _scan_jpeg(prefix)
+    if fmt == 'png':
+        return _scan_png(prefix)
+    return None
+
+
+def _scan_jpeg(data: bytes) -> Optional[HeaderScan]:
+    segments = []
+    i = 2
+    while True:
+        if i + 2 > len(data):
+            return HeaderScan('jpeg', False, 0, i + 4, segments)
+        if data[i] != 0xFF:
+            # Not a marker where one must be: not a file we can walk safely
+            return None
+        marker = data[i + 1]
+        if marker == 0xFF:
+            # Fill byte before a marker
+            i += 1
+            continue
+        if marker in _STANDALONE:
+            i += 2
+            continue
+        if marker == JPEG_EOI[1]:
+            return HeaderScan('jpeg', True, i, i, segments)
+        if i + 4 > len(data):
+            return HeaderScan('jpeg', False, 0, i + 4, segments)
+        length = int.from_bytes(data[i + 2:i + 4], 'big')
+        if length < 2:
+            return None
+        end = i + 2 + length
+        segments.append(Segment(marker, i, end))
+        if marker == _SOS:
+            # Entropy-coded data follows the scan header; readers such as PIL
+            # want to see the scan header itself before they accept the file
+            if end > len(data):
+                return HeaderScan('jpeg', False, 0, end, segments)
+            return HeaderScan('jpeg', True, end, end, segments)
+        if end > len(data):
+            # Need this segment plus the next marker's header
+            return HeaderScan('jpeg', False, 0, end + 4, segments)
+        i = end
+
+
+def _scan_png(data: bytes) -> Optional[HeaderScan]:
+    segments = []
+    i = len(PNG_SIGNATURE)
+    while True:
+        if i + 8 > len(data):
+            return HeaderScan('png', False, 0, i + 8, segments)
+        length = int.from_bytes(data[i:i + 4], 'big')
+        chunk_type = bytes(data[i + 4:i + 8])
+        if chunk_type in (b'IDAT', b'IEND'):
+            return HeaderScan('png', True, i, i, segments)
+        end = i + 12 + length
+        segments.append(Segment(chunk_type, i, end))
+        if end > len(data):
+            return HeaderScan('png', False, 0, end + 8, segments)
+        i = end
+
+
+def has_c2pa_manifest(scan: HeaderScan) -> bool:
+    """Whether the scanned header region contains a C2PA manifest store."""
+    kind = APP11 if scan.format == 'jpeg' else b'caBX'
+    return any(segment.kind == kind for segment in scan.segments)
+
+
+def manifest_bytes_needed(prefix: bytes) -> Optional[int]:
+    """How much of the file a manifest-only read needs, given prefix.
+
+    Returns 0 once the prefix holds every segment before the pixel data (and
+    therefore any embedded manifest store), the shortest prefix length that
+    would allow progress otherwise, or None if the format can't be walked and
+    the whole file is needed.
+    """
+    scan = scan_header(prefix)
+    if scan is None:
+        return None
+    return 0 if scan.complete else scan.needed
+
+
+def header_only_image(prefix: bytes) -> Optional[bytes]:
+    """A well-formed file holding only the header segments from prefix.
+
+    The pixel data is replaced by an immediate end marker, so readers such as
+    c2pa.Reader can parse the metadata (the manifest's hash over the pixel
+    data will, naturally, not match). None if prefix is not complete.
+    """
+    scan = scan_header(prefix)
+    if scan is None or not scan.complete:
+        return None
+    trailer = JPEG_EOI if scan.format == 'jpeg' else PNG_IEND
+    return bytes(prefix[:scan.header_end]) + trailer
+
+
+def read_header(f, max_bytes: int, chunk_size: int = 64 * 1024) -> Optional[bytes]:
+    """Read from the binary file object f only as far as its header segments.
+
+    Returns the prefix holding every segment before the pixel data, or None if
+    the format can't be walked or the header is larger than max_bytes.
+    """
+    prefix = b''
+    while True:
+        needed = manifest_bytes_needed(prefix) if prefix else len(PNG_SIGNATURE)
+        if needed == 0:
+            return prefix
+        if needed is None or needed > max_bytes:
+            return None
+        chunk = f.read(max(needed - len(prefix), chunk_size))
+        if not chunk:
+            # Truncated file
+            return None
+        prefix += chunk
@@ -0,0 +1,327 @@
+"""
+Pooled, streaming HTTP downloader used by ImagePathContext.
+
+Keeps idle keep-alive connections per origin so repeated fetches from the same
+host skip the TCP/TLS handshake, and streams response bodies to disk in chunks
+so memory use stays flat regardless of image size. Every download is bounded by
+a maximum body size and an overall wall-clock deadline.
+
+This is deliberately built on http.client (no extra dependencies). It is
+blocking and thread-safe; callers run it on the extraction executor.
+"""
+
+import hashlib
+import http.client
+import io
+import socket
+import ssl
+import threading
+import time
+from urllib.parse import urljoin, urlparse
+
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Accept': 'image/jpeg,image/png,image/webp,image/*,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.9',
+}
+
+_REDIRECT_STATUSES = (301, 302, 303, 307, 308)
+_MAX_REDIRECTS = 5
+
+
+class DownloadError(Exception):
+    """The download failed (bad status, network error, deadline exceeded)."""
+
+
+class DownloadTooLarge(DownloadError):
+    """The response body exceeded the configured maximum size."""
+
+
+class DownloadResult:
+    """Outcome of a completed download."""
+    def __init__(self, url: str, status: int, headers, bytes_written: int,
+                 content_hash: str = None):
+        self.url = url
+        self.status = status
+        self.headers = headers
+        self.bytes_written = bytes_written
+        # SHA-256 hex digest of the body, computed while streaming
+        self.content_hash = content_hash
+
+    @property
+    def content_type(self) -> str:
+        return self.headers.get('Content-Type', '') if self.headers else ''
+
+    @property
+    def etag(self):
+        return self.headers.get('ETag') if self.headers else None
+
+    @property
+    def last_modified(self):
+        return self.headers.get('Last-Modified') if self.headers else None
+
+    @property
+    def not_modified(self) -> bool:
+        """True for a 304 answer to a conditional request (nothing was written)."""
+        return self.status == 304
+
+
+class ConnectionPool:
+    """Idle HTTP(S) connections kept per (scheme, host, port)."""
+    def __init__(self, max_idle_per_host: int = 4, idle_timeout: float = 60.0):
+        self.max_idle_per_host = max_idle_per_host
+        self.idle_timeout = idle_timeout
+        self._idle = {}
+        self._lock = threading.Lock()
+        self._ssl_context = ssl.create_default_context()
+        self.connections_opened = 0
+        self.connections_reused = 0
+
+    def acquire(self, scheme: str, host: str, port: int, timeout: float):
+        """Return (connection, reused) for the origin, reusing an idle one if possible."""
+        key = (scheme, host, port)
+        now = time.monotonic()
+        with self._lock:
+            idle = self._idle.get(key, [])
+            while idle:
+                conn, released_at = idle.pop()
+                if now - released_at < self.idle_timeout:
+                    self.connections_reused += 1
+                    conn.timeout = timeout
+                    if conn.sock is not None:
+                        conn.sock.settimeout(timeout)
+                    return conn, True
+                conn.close()
+            self.connections_opened += 1
+
+        if scheme == 'https':
+            conn = http.client.HTTPSConnection(host, port, timeout=timeout,
+                                               context=self._ssl_context)
+        else:
+            conn = http.client.HTTPConnection(host, port, timeout=timeout)
+        return conn, False
+
+    def release(self, scheme: str, host: str, port: int, conn):
+        """Return a connection whose response was fully read to the pool."""
+        key = (scheme, host, port)
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_idle_per_host:
+                idle.append((conn, time.monotonic()))
+                return
+        conn.close()
+
+    def close(self):
+        with self._lock:
+            for idle in self._idle.values():
+                for conn, _ in idle:
+                    conn.close()
+            self._idle.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            idle = sum(len(v) for v in self._idle.values())
+        return {
+            'opened': self.connections_opened,
+            'reused': self.connections_reused,
+            'idle': idle,
+        }
+
+
+class Downloader:
+    """Streams remote images to file objects over pooled connections."""
+    def __init__(self, pool: ConnectionPool = None, max_bytes: int = 100 * 1024 * 1024,
+                 deadline: float = 30.0, chunk_size: int = 64 * 1024):
+        self.pool = pool or ConnectionPool()
+        self.max_bytes = max_bytes
+        self.deadline = deadline
+        self.chunk_size = chunk_size
+
+    def download(self, url: str, dest, headers: dict = None, max_bytes: int = None,
+                 deadline: float = None) -> DownloadResult:
+        """Stream url into the writable binary file object dest.
+
+        Follows redirects. Raises DownloadTooLarge once more than max_bytes
+        would be written, and DownloadError on any other failure, including
+        the whole transfer taking longer than deadline seconds. A conditional
+        request (If-None-Match / If-Modified-Since in headers) may come back
+        as a 304 result, with nothing written.
+        """
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        deadline = self.deadline if deadline is None else deadline
+        expires_at = time.monotonic() + deadline
+
+        for _ in range(_MAX_REDIRECTS + 1):
+            result, location = self._request(url, dest, headers, max_bytes, expires_at)
+            if location is None:
+                return result
+            url = urljoin(url, location)
+        raise DownloadError(f"Too many redirects fetching {url}")
+
+    def download_prefix(self, url: str, dest, bytes_needed, initial_bytes: int = 64 * 1024,
+                        max_prefix_bytes: int = 4 * 1024 * 1024, headers: dict = None,
+                        deadline: float = None):
+        """Fetch only as much of the start of url as bytes_needed asks for.
+
+        Issues HTTP Range requests for the leading bytes, widening the range
+        (at least doubling it) until bytes_needed(prefix) returns 0. It returns
+        the minimum prefix length needed otherwise, or None if no prefix will
+        do. The whole body is streamed into dest instead when the origin
+        ignores Range, the body turns out to be shorter than the range, or
+        more than max_prefix_bytes would be needed.
+
+        Returns (result, prefix): prefix is the sufficient leading bytes (dest
+        untouched), or None when dest holds the complete body.
+        """
+        deadline = self.deadline if deadline is None else deadline
+        expires_at = time.monotonic() + deadline
+        headers = dict(headers or {})
+        prefix = bytearray()
+        want = initial_bytes
+
+        while True:
+            piece = io.BytesIO()
+            headers['Range'] = f"bytes={len(prefix)}-{want - 1}"
+            try:
+                result = self.download(url, piece, headers=headers,
+                                       max_bytes=want - len(prefix),
+                                       deadline=self._remaining(expires_at))
+            except DownloadTooLarge:
+                # The origin ignored Range and is sending a large body
+                break
+
+            if result.not_modified:
+                return result, None
+            if result.status != 206:
+                # Range ignored, but the whole body fit in what was asked for
+                dest.write(piece.getvalue())
+                return result, None
+
+            if not piece.getvalue():
+                break
+            prefix += piece.getvalue()
+            total = content_range_total(result.headers.get('Content-Range'))
+            # The range covered the entire resource. Without a total, a body
+            # shorter than the range means it ended; with one, a short body
+            # is just a short response, and the rest is asked for next
+            if len(prefix) >= total if total is not None else len(prefix) < want:
+                dest.write(prefix)
+                return DownloadResult(result.url, 200, result.headers, len(prefix),
+                                      hashlib.sha256(prefix).hexdigest()), None
+
+            needed = bytes_needed(bytes(prefix))
+            if needed == 0:
+                return DownloadResult(result.url, result.status, result.headers,
+                                      len(prefix)), bytes(prefix)
+            if needed is None or needed > max_prefix_bytes:
+                break
+            want = min(max(needed, 2 * len(prefix)), max_prefix_bytes)
+            if want <= len(prefix):
+                break
+
+        headers.pop('Range', None)
+        return self.download(url, dest, headers=headers,
+                             deadline=self._remaining(expires_at)), None
+
+    def _request(self, url, dest, headers, max_bytes, expires_at):
+        parsed = urlparse(url)
+        if parsed.scheme not in ('http', 'https'):
+            raise DownloadError(f"Unsupported URL scheme: {parsed.scheme}")
+        scheme = parsed.scheme
+        host = parsed.hostname
+        port = parsed.port or (443 if scheme == 'https' else 80)
+        path = parsed.path or '/'
+        if parsed.query:
+            path += '?' + parsed.query
+
+        request_headers = dict(DEFAULT_HEADERS)
+        request_headers['Referer'] = f"{scheme}://{parsed.netloc}/"
+        if headers:
+            request_headers.update(headers)
+
+        # A pooled connection may have been closed by the origin while idle;
+        # retry once on a fresh connection if sending on a reused one fails.
+        for attempt in range(2):
+            conn, reused = self.pool.acquire(scheme, host, port, self._remaining(expires_at))
+            try:
+                conn.request('GET', path, headers=request_headers)
+                # Keep the socket: http.client detaches it from conn when the
+                # response is 'Connection: close'
+                sock = conn.sock
+                response = conn.getresponse()
+                break
+            except (http.client.RemoteDisconnected, ConnectionResetError,
+                    BrokenPipeError, http.client.CannotSendRequest) as e:
+                conn.close()
+                if reused and attempt == 0:
+                    continue
+                raise DownloadError(str(e)) from e
+            except (OSError, http.client.HTTPException) as e:
+                conn.close()
+                raise DownloadError(str(e)) from e
+
+        try:
+            if response.status in _REDIRECT_STATUSES and response.getheader('Location'):
+                response.read()
+                self._finish(scheme, host, port, conn, response)
+                return None, response.getheader('Location')
+
+            if response.status >= 400:
+                conn.close()
+                raise DownloadError(f"HTTP Error {response.status}: {response.reason}")
+
+            content_length = response.getheader('Content-Length')
+            if content_length and content_length.isdigit() and int(content_length) > max_bytes:
+                conn.close()
+                raise DownloadTooLarge(
+                    f"Image is {int(content_length)} bytes, limit is {max_bytes} bytes")
+
+            written = 0
+            digest = hashlib.sha256()
+            while True:
+                sock.settimeout(self._remaining(expires_at))
+                chunk = response.read(self.chunk_size)
+                if not chunk:
+                    break
+                written += len(chunk)
+                if written > max_bytes:
+                    conn.close()
+                    raise DownloadTooLarge(f"Image exceeds limit of {max_bytes} bytes")
+                digest.update(chunk)
+                dest.write(chunk)
+
+            self._finish(scheme, host, port, conn, response)
+            return DownloadResult(url, response.status, response.headers, written,
+                                  digest.hexdigest()), None
+
+        except DownloadError:
+            conn.close()
+            raise
+        except (OSError, http.client.HTTPException) as e:
+            conn.close()
+            if isinstance(e, socket.timeout) or time.monotonic() >= expires_at:
+                raise DownloadError("Download deadline exceeded") from e
+            raise DownloadError(str(e)) from e
+
+    def _finish(self, scheme, host, port, conn, response):
+        """Pool the connection if the origin allows keep-alive, else close it."""
+        if response.will_close:
+            conn.close()
+        else:
+            self.pool.release(scheme, host, port, conn)
+
+    @staticmethod
+    def _remaining(expires_at: float) -> float:
+        remaining = expires_at - time.monotonic()
+        if remaining <= 0:
+            raise DownloadError("Download deadline exceeded")
+        return remaining
+
+
+def content_range_total(value: str):
+    """Total resource size from a 'bytes start-end/total' header, if known."""
+    if not value or '/' not in value:
+        return None
+    total = value.rsplit('/', 1)[1].strip()
+    return int(total) if total.isdigit() else None
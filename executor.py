@@ -0,0 +1,112 @@
+"""
+Bounded thread pool for running blocking extraction work off the event loop.
+
+Downloads, c2pa.Reader, PIL and ImageCms calls are all synchronous. Running them
+directly inside an async handler stalls every other request on the worker, so
+handlers hand them to a BoundedExecutor instead. Once all threads are busy and
+the wait queue is full, new jobs are rejected with 503 rather than piling up.
+"""
+
+import asyncio
+import contextvars
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import HTTPException
+
+
+class ExecutorSaturated(HTTPException):
+    """Raised when the executor has no free thread and no room in its queue."""
+    def __init__(self, retry_after: int = 2):
+        super().__init__(
+            status_code=503,
+            detail="Server is busy, please retry shortly",
+            headers={'Retry-After': str(retry_after)},
+        )
+
+
+class BoundedExecutor:
+    """Thread pool with a fixed number of workers and a bounded wait queue."""
+    def __init__(self, max_workers: int = 4, max_queue: int = 16,
+                 retry_after: int = 2, thread_name_prefix: str = 'extract'):
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max(0, max_queue)
+        self.retry_after = retry_after
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers,
+                                        thread_name_prefix=thread_name_prefix)
+        self._slots = threading.BoundedSemaphore(self.max_workers + self.max_queue)
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._running = 0
+        self._rejected = 0
+
+    def submit(self, fn, *args, **kwargs):
+        """Submit a job, returning a concurrent.futures.Future.
+
+        Raises ExecutorSaturated if every worker is busy and the queue is full.
+        """
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._rejected += 1
+            raise ExecutorSaturated(self.retry_after)
+
+        with self._lock:
+            self._pending += 1
+
+        def job():
+            with self._lock:
+                self._running += 1
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self._running -= 1
+
+        def release(_future):
+            # Released when the job finishes, not when the caller stops
+            # waiting, so a cancelled request can't free a slot early.
+            with self._lock:
+                self._pending -= 1
+            self._slots.release()
+
+        try:
+            future = self._pool.submit(job)
+        except Exception:
+            release(None)
+            raise
+        future.add_done_callback(release)
+        return future
+
+    async def run(self, fn, *args, **kwargs):
+        """Run fn(*args, **kwargs) on the pool and await its result.
+
+        fn sees the caller's context variables (e.g. the request ID it logs).
+        """
+        context = contextvars.copy_context()
+        future = self.submit(context.run, functools.partial(fn, *args, **kwargs))
+        return await asyncio.wrap_future(future)
+
+    @property
+    def in_flight(self) -> int:
+        """Jobs currently executing on a worker thread."""
+        return self._running
+
+    @property
+    def queue_depth(self) -> int:
+        """Jobs accepted but still waiting for a worker thread."""
+        return max(0, self._pending - self._running)
+
+    def stats(self) -> dict:
+        """Snapshot of pool utilisation."""
+        with self._lock:
+            return {
+                'max_workers': self.max_workers,
+                'max_queue': self.max_queue,
+                'running': self._running,
+                'queued': max(0, self._pending - self._running),
+                'rejected': self._rejected,
+            }
+
+    def shutdown(self, wait: bool = True):
+        self._pool.shutdown(wait=wait)
@@ -0,0 +1,371 @@
+"""
+Worker processes for c2pa's native manifest parsing and verification.
+
+c2pa.Reader runs native code that a pathological manifest can keep busy (or
+hang) indefinitely, and a thread can't be stopped from outside. ParsedImage
+therefore sends its c2pa work to a ProcessPool: each job runs in a separate
+worker process that is killed and replaced when the job exceeds its
+wall-clock limit, and recycled after any job that leaves it above the memory
+limit. On Linux each worker's heap is also capped, so a job that allocates
+past the cap fails (or crashes its worker) instead of exhausting the
+machine's memory before it can be recycled. Workers are started with
+'spawn', so they never inherit the server's threads or sockets. A spawned
+process re-imports the parent's main script, so the server is started from
+the small serve.py rather than from server.py.
+"""
+
+import io
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import threading
+from typing import Optional
+
+import c2pa
+
+import config
+import logs
+import manifest_json
+from source_types import assertion_used
+
+logger = logging.getLogger('c2pa_viewer.isolation')
+
+
+class IsolationError(Exception):
+    """A job could not be completed by a worker process."""
+
+
+class JobTimeout(IsolationError):
+    """The job ran past its wall-clock limit; its worker was killed."""
+
+
+class WorkerCrashed(IsolationError):
+    """The worker process died while running the job."""
+
+
+class JobFailed(IsolationError):
+    """The job raised an exception inside the worker."""
+
+
+# c2pa.Reader errors meaning the file has no manifest (rather than one that
+# could not be read)
+_NO_MANIFEST = (c2pa.C2paError.ManifestNotFound, c2pa.C2paError.NotSupported)
+
+
+def _open_reader(path: str):
+    """(reader, error) for the image at path.
+
+    Both are None when it has no manifest; error describes why a manifest
+    it does have could not be read.
+    """
+    try:
+        return c2pa.Reader(path), None
+    except _NO_MANIFEST as e:
+        logger.debug('No C2PA manifest read: %s', e, extra={'path': path})
+        return None, None
+    except MemoryError:
+        # Over the worker's memory cap: a failed job, not an unreadable manifest
+        raise
+    except Exception as e:
+        logger.warning('Error reading C2PA manifest: %s', e, extra={'path': path})
+        return None, f"{type(e).__name__}: {e}"
+
+
+def read_c2pa(path: str):
+    """Read the manifest store of the image at path, with its thumbnails.
+
+    Returns (manifest_store, resources, error): the decoded manifest store
+    JSON, or None if the file has no readable manifest, the bytes of the
+    active manifest's and its ingredients' thumbnails by resource
+    identifier, and why the manifest could not be read, if it has one that
+    couldn't. All come from one c2pa.Reader, so the manifest is parsed and
+    verified once.
+    """
+    reader, error = _open_reader(path)
+    if reader is None:
+        return None, {}, error
+    try:
+        manifest_json = reader.json()
+        manifest_store = json.loads(manifest_json) if manifest_json else None
+    except MemoryError:
+        reader.close()
+        raise
+    except Exception as e:
+        logger.warning('Error decoding C2PA manifest: %s', e)
+        manifest_store, error = None, f"{type(e).__name__}: {e}"
+    try:
+        resources = {}
+        for identifier in _thumbnail_identifiers(manifest_store):
+            try:
+                output_stream = io.BytesIO()
+                reader.resource_to_stream(identifier, output_stream)
+                resources[identifier] = output_stream.getvalue()
+            except Exception as e:
+                logger.warning('Error reading C2PA resource %s: %s', identifier, e)
+        return manifest_store, resources, error
+    finally:
+        try:
+            reader.close()
+        except Exception:
+            pass
+
+
+def read_c2pa_minimal(path: str) -> tuple:
+    """Read only the fields /api/c2pa_mini needs from the active manifest.
+
+    The manifest is parsed and verified as in read_c2pa, but its JSON is
+    decoded selectively (see manifest_json.mini_manifest) and no thumbnails
+    are read, so neither the whole store nor the thumbnails are built or
+    sent back to the server. Returns (manifest, error) as read_c2pa does
+    (manifest None if the file has no readable manifest).
+    """
+    reader, error = _open_reader(path)
+    if reader is None:
+        return None, error
+    try:
+        manifest_json_text = reader.json()
+        manifest = manifest_json.mini_manifest(manifest_json_text, assertion_used) if manifest_json_text else None
+        return manifest, None
+    except MemoryError:
+        raise
+    except Exception as e:
+        logger.warning('Error decoding C2PA manifest: %s', e)
+        return None, f"{type(e).__name__}: {e}"
+    finally:
+        try:
+            reader.close()
+        except Exception:
+            pass
+
+
+def _thumbnail_identifiers(manifest_store: Optional[dict]) -> list:
+    """Resource identifiers of the active manifest's and its ingredients' thumbnails."""
+    if not manifest_store:
+        return []
+    manifest = manifest_store.get('manifests', {}).get(manifest_store.get('active_manifest'))
+    if not manifest:
+        return []
+    identifiers = []
+    for item in [manifest] + manifest.get('ingredients', []):
+        identifier = (item.get('thumbnail') or {}).get('identifier')
+        if identifier and identifier not in identifiers:
+            identifiers.append(identifier)
+    return identifiers
+
+
+def _rss_bytes() -> int:
+    """Resident memory of this process in bytes (0 if it can't be measured)."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Peak rather than current usage: kilobytes on Linux, bytes on macOS
+        return peak if sys.platform == 'darwin' else peak * 1024
+    except (ImportError, OSError):
+        return 0
+
+
+def _limit_memory(max_bytes: int):
+    """Cap this process's heap (RLIMIT_DATA) at max_bytes, on Linux.
+
+    Allocations past the cap then fail: with MemoryError in Python, or by
+    aborting the process in native code. RLIMIT_AS would also count the
+    address space reserved for shared libraries and thread stacks, several
+    times what the worker actually uses.
+    """
+    if not max_bytes or not sys.platform.startswith('linux'):
+        return
+    import resource
+    try:
+        _, hard = resource.getrlimit(resource.RLIMIT_DATA)
+        if hard != resource.RLIM_INFINITY:
+            max_bytes = min(max_bytes, hard)
+        resource.setrlimit(resource.RLIMIT_DATA, (max_bytes, hard))
+    except (ValueError, OSError) as e:
+        logger.warning('Could not limit worker memory: %s', e)
+
+
+def _worker_main(conn, max_rss_bytes: int, max_memory_bytes: int = 0):
+    """Run (fn, args) jobs from conn until told to stop or over the memory limit."""
+    # Spawned workers start with no logging set up, and exit without atexit hooks
+    logs.configure(config.LOG_LEVEL, config.LOG_SAMPLE_PERCENT)
+    _limit_memory(max_memory_bytes)
+    try:
+        while True:
+            try:
+                job = conn.recv()
+            except (EOFError, OSError):
+                return
+            if job is None:
+                return
+            fn, args = job
+            out_of_memory = False
+            try:
+                reply = ('ok', fn(*args))
+            except MemoryError:
+                reply = ('error', 'MemoryError: job ran out of memory')
+                out_of_memory = True
+            except Exception as e:
+                reply = ('error', f"{type(e).__name__}: {e}")
+            # A worker that hit its cap may be left fragmented: replace it
+            retiring = out_of_memory or (bool(max_rss_bytes) and _rss_bytes() > max_rss_bytes)
+            conn.send(reply + (retiring,))
+            if retiring:
+                return
+    finally:
+        logs.shutdown()
+
+
+class _Worker:
+    """One worker process and the parent's end of its pipe."""
+    def __init__(self, context, max_rss_bytes: int, max_memory_bytes: int, name: str):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main,
+                                       args=(child_conn, max_rss_bytes, max_memory_bytes),
+                                       name=name, daemon=True)
+        self.process.start()
+        child_conn.close()
+
+    def call(self, fn, args, timeout: float):
+        """Run fn(*args) in the worker; returns (status, payload, retiring)."""
+        self.conn.send((fn, args))
+        if not self.conn.poll(timeout):
+            raise JobTimeout(f"Job exceeded {timeout:g}s limit")
+        try:
+            return self.conn.recv()
+        except (EOFError, OSError):
+            self.process.join(timeout=1)
+            raise WorkerCrashed(f"Worker exited with code {self.process.exitcode}")
+
+    def stop(self, kill: bool = False):
+        if not kill:
+            try:
+                self.conn.send(None)
+            except (OSError, ValueError):
+                kill = True
+            else:
+                self.process.join(timeout=1)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join(timeout=1)
+        self.conn.close()
+
+
+class ProcessPool:
+    """A fixed number of worker processes with per-job wall-clock limits.
+
+    run() blocks the calling thread (an extraction executor thread) until a
+    worker is free and has finished the job. Workers are started on first use,
+    or up front with start().
+    """
+    def __init__(self, max_workers: Optional[int] = None, timeout: float = 20,
+                 max_rss_bytes: int = 0, max_memory_bytes: int = 0, name: str = 'c2pa-worker'):
+        self.max_workers = max(1, max_workers or os.cpu_count() or 1)
+        self.timeout = timeout
+        # Workers above this resident size after a job are replaced (0: no limit)
+        self.max_rss_bytes = max_rss_bytes
+        # Hard cap on each worker's heap, on Linux (0: no cap)
+        self.max_memory_bytes = max_memory_bytes
+        self.name = name
+        self._context = multiprocessing.get_context('spawn')
+        self._slots = threading.BoundedSemaphore(self.max_workers)
+        self._lock = threading.Lock()
+        self._idle = []
+        self._busy = 0
+        self._closed = False
+        self._jobs = 0
+        self._timeouts = 0
+        self._crashes = 0
+        self._recycled = 0
+
+    def _spawn(self) -> _Worker:
+        return _Worker(self._context, self.max_rss_bytes, self.max_memory_bytes, self.name)
+
+    def start(self):
+        """Start every worker now rather than on first use."""
+        with self._lock:
+            missing = self.max_workers - len(self._idle) - self._busy
+        workers = [self._spawn() for _ in range(max(0, missing))]
+        with self._lock:
+            self._idle.extend(workers)
+
+    def _checkout(self) -> _Worker:
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Process pool is shut down")
+            self._busy += 1
+            while self._idle:
+                worker = self._idle.pop()
+                if worker.process.is_alive():
+                    return worker
+                worker.stop(kill=True)
+        try:
+            return self._spawn()
+        except BaseException:
+            with self._lock:
+                self._busy -= 1
+            raise
+
+    def _checkin(self, worker: _Worker, keep: bool):
+        with self._lock:
+            self._busy -= 1
+            if keep and not self._closed:
+                self._idle.append(worker)
+                return
+        worker.stop(kill=not keep)
+
+    def run(self, fn, *args, timeout: Optional[float] = None):
+        """Run fn(*args) in a worker process and return its result.
+
+        fn and args must be picklable (fn a module-level function). Raises
+        JobTimeout, WorkerCrashed or JobFailed.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        with self._slots:
+            worker = self._checkout()
+            try:
+                status, payload, retiring = worker.call(fn, args, timeout)
+            except BaseException as e:
+                with self._lock:
+                    if isinstance(e, JobTimeout):
+                        self._timeouts += 1
+                    elif isinstance(e, WorkerCrashed):
+                        self._crashes += 1
+                # The worker may still be running the job: replace it
+                self._checkin(worker, keep=False)
+                raise
+            with self._lock:
+                self._jobs += 1
+                if retiring:
+                    self._recycled += 1
+            self._checkin(worker, keep=not retiring)
+        if status == 'error':
+            raise JobFailed(payload)
+        return payload
+
+    def stats(self) -> dict:
+        """Snapshot of worker utilisation and restarts."""
+        with self._lock:
+            return {
+                'max_workers': self.max_workers,
+                'busy': self._busy,
+                'idle': len(self._idle),
+                'jobs': self._jobs,
+                'timeouts': self._timeouts,
+                'crashes': self._crashes,
+                'recycled': self._recycled,
+            }
+
+    def shutdown(self):
+        """Stop idle workers; busy ones are stopped when their job returns."""
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for worker in idle:
+            worker.stop()
@@ -0,0 +1,213 @@
+"""
+Structured JSON logging for the server and its c2pa worker processes.
+
+Each record becomes one JSON line with its level, logger, message, the ID of
+the request being served and any extra= fields. Records are formatted on the
+calling thread but written by a background listener thread, so logging never
+blocks a request on stdout/stderr; if the listener falls behind, records are
+dropped (and counted) rather than queued without bound. High-volume records,
+logged with extra={'sampled': True}, are kept only C2PA_LOG_SAMPLE_PERCENT
+of the time unless they are warnings or worse.
+"""
+
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import re
+import sys
+import time
+import uuid
+
+
+# ID of the request being served, set by RequestIdMiddleware
+request_id_var = contextvars.ContextVar('request_id', default=None)
+
+access_logger = logging.getLogger('c2pa_viewer.access')
+
+_REQUEST_ID_RE = re.compile(r'[A-Za-z0-9._-]{1,64}')
+
+# LogRecord attributes that are not extra= fields
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime'}
+_INTERNAL_ATTRS = {'sampled', 'request_id', 'sample_rate'}
+
+
+class JsonFormatter(logging.Formatter):
+    """Render a record as a single line of JSON."""
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(record.created))
+                    + f'.{int(record.msecs):03d}Z',
+            'level': record.levelname.lower(),
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        if getattr(record, 'request_id', None):
+            entry['request_id'] = record.request_id
+        if getattr(record, 'sample_rate', None) is not None:
+            entry['sample_rate'] = record.sample_rate
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and key not in _INTERNAL_ATTRS:
+                entry[key] = value
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class ContextFilter(logging.Filter):
+    """Attach the current request ID, and sample records marked sampled=True."""
+    def __init__(self, sample_percent: int = 100):
+        super().__init__()
+        self.sample_rate = max(0, min(100, sample_percent)) / 100
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if getattr(record, 'sampled', False) and record.levelno < logging.WARNING:
+            if random.random() >= self.sample_rate:
+                return False
+            record.sample_rate = self.sample_rate
+        record.request_id = request_id_var.get()
+        return True
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops records instead of blocking when the queue is full."""
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Format here, on the logging thread, so the listener only writes
+        record = logging.makeLogRecord(vars(record))
+        record.msg = self.format(record)
+        record.args = None
+        record.exc_info = None
+        record.exc_text = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class EarlyRecords(logging.Handler):
+    """Keeps records logged before configure(), which then writes them out.
+
+    Settings are read (and invalid ones warned about) before the log level
+    they include can be applied.
+    """
+    def __init__(self, capacity: int = 100):
+        super().__init__()
+        self.capacity = capacity
+        self.records = []
+
+    def emit(self, record: logging.LogRecord):
+        if len(self.records) < self.capacity:
+            self.records.append(record)
+
+
+_early = EarlyRecords()
+logging.getLogger().addHandler(_early)
+_handler = None
+_listener = None
+
+
+def configure(level: str = 'INFO', sample_percent: int = 100, stream=None,
+              max_queue: int = 10000) -> DroppingQueueHandler:
+    """Send all (root) logging through a JSON formatter and a listener thread.
+
+    Calling it again replaces the previous configuration.
+    """
+    global _handler, _listener
+    root = logging.getLogger()
+    if _handler is not None:
+        root.removeHandler(_handler)
+        _listener.stop()
+
+    log_queue = queue.Queue(maxsize=max_queue)
+    _handler = DroppingQueueHandler(log_queue)
+    _handler.setFormatter(JsonFormatter())
+    _handler.addFilter(ContextFilter(sample_percent))
+    output = logging.StreamHandler(stream or sys.stderr)
+    output.setFormatter(logging.Formatter('%(message)s'))
+    _listener = logging.handlers.QueueListener(log_queue, output)
+    _listener.start()
+
+    root.addHandler(_handler)
+    root.setLevel(level.upper())
+    if _early in root.handlers:
+        root.removeHandler(_early)
+        for record in _early.records:
+            if record.levelno >= root.level:
+                _handler.handle(record)
+        _early.records.clear()
+    return _handler
+
+
+def flush():
+    """Write out every queued record (the listener keeps running)."""
+    if _listener is not None:
+        _listener.stop()
+        _listener.start()
+
+
+@atexit.register
+def shutdown():
+    """Write out every queued record and stop the listener thread."""
+    global _handler, _listener
+    if _listener is not None:
+        logging.getLogger().removeHandler(_handler)
+        _listener.stop()
+        _handler = _listener = None
+    elif _early.records:
+        # Never configured: write out what was held back, as is
+        formatter = JsonFormatter()
+        for record in _early.records:
+            sys.stderr.write(formatter.format(record) + '\n')
+        _early.records.clear()
+
+
+class RequestIdMiddleware:
+    """Give every HTTP request an ID for its log records, and log it once done.
+
+    A well-formed incoming X-Request-ID header (e.g. from a proxy) is reused;
+    otherwise a new ID is generated. The ID is echoed in the response. The
+    access record is sampled unless the response is a server error.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+        incoming = dict(scope.get('headers') or ()).get(b'x-request-id', b'').decode('latin-1')
+        request_id = incoming if _REQUEST_ID_RE.fullmatch(incoming) else uuid.uuid4().hex[:16]
+        status = 500
+
+        async def send_with_id(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+                headers = list(message.get('headers') or ()) + [(b'x-request-id', request_id.encode())]
+                message = dict(message, headers=headers)
+            await send(message)
+
+        token = request_id_var.set(request_id)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            access_logger.log(
+                logging.WARNING if status >= 500 else logging.INFO,
+                '%s %s %d', scope['method'], scope['path'], status,
+                extra={
+                    'method': scope['method'], 'path': scope['path'], 'status': status,
+                    'duration_ms': round((time.perf_counter() - started) * 1000, 1),
+                    'sampled': True,
+                },
+            )
+            request_id_var.reset(token)
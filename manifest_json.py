@@ -0,0 +1,252 @@
+"""
+Selective decoding of c2pa manifest store JSON.
+
+c2pa.Reader only hands out the whole manifest store as one (pretty-printed)
+JSON string, covering every manifest in the image's history with all of its
+assertions, ingredients and validation results. Callers that need a few
+fields of the active manifest walk the text instead: walk_object and
+walk_array report each member's position to a visitor, which decodes the
+values it wants with json's C scanner and lets the rest be skipped without
+building any objects for them. In pretty-printed JSON (as c2pa writes it)
+a skipped object or array is found by the indentation of its closing
+bracket with one substring search; otherwise a regex matches it.
+
+mini_manifest uses this to pull what /api/c2pa_mini needs out of the store
+in one pass over the text.
+"""
+
+import json
+import re
+from typing import Callable, Optional
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+_STRING_PATTERN = r'"[^"\\]*+(?:\\.[^"\\]*+)*+"'
+_STRING = re.compile(_STRING_PATTERN)
+# A string, or a bracket outside of strings
+_TOKEN = re.compile(_STRING_PATTERN + r'|[\[\]{}]')
+
+
+def _container_pattern(depth: int) -> str:
+    """A regex matching an object or array nested at most depth levels deep.
+
+    Possessive quantifiers keep a failed match from backtracking.
+    """
+    pattern = ''
+    for _ in range(depth):
+        inner = rf'[^"{{}}\[\]]++|{_STRING_PATTERN}' + (f'|{pattern}' if pattern else '')
+        pattern = rf'[\[{{](?:{inner})*+[\]}}]'
+    return pattern
+
+
+# Skips a whole container in one match; deeper ones take the token loop
+_CONTAINER = re.compile(_container_pattern(16))
+_INDENT = re.compile(r' *')
+# An object key and its colon, with the whitespace around them
+_KEY = re.compile(r'[ \t\n\r]*"([^"\\]*+(?:\\.[^"\\]*+)*+)"[ \t\n\r]*:[ \t\n\r]*')
+# The separator after a member or item
+_NEXT = re.compile(r'[ \t\n\r]*([,\]}]?)')
+_CLOSING = {'{': '}', '[': ']'}
+# The rest of a number, true, false or null
+_SCALAR = re.compile(r'[^,\]}\s]+')
+
+
+def _space(text: str, pos: int) -> int:
+    return _WHITESPACE.match(text, pos).end()
+
+
+def _skip_indented(text: str, pos: int) -> int:
+    """The offset just past the container at pos in pretty-printed JSON, or -1.
+
+    Strings can't hold a raw newline, so when the container's opening
+    bracket ends its line, its closing bracket is the first one at the start
+    of a line with the same indentation as the opening one's.
+    """
+    if text[pos + 1:pos + 2] != '\n':
+        return -1
+    line = text.rfind('\n', 0, pos) + 1
+    indent = _INDENT.match(text, line).end() - line
+    end = text.find('\n' + ' ' * indent + _CLOSING[text[pos]], pos)
+    return -1 if end < 0 else end + indent + 2
+
+
+def skip_value(text: str, pos: int) -> int:
+    """The offset just past the JSON value starting at pos."""
+    char = text[pos:pos + 1]
+    if char == '"':
+        match = _STRING.match(text, pos)
+    elif char in ('{', '['):
+        end = _skip_indented(text, pos)
+        if end >= 0:
+            return end
+        match = _CONTAINER.match(text, pos)
+        if match is not None:
+            return match.end()
+        depth = 0
+        for match in _TOKEN.finditer(text, pos):
+            token = text[match.start()]
+            if token in '{[':
+                depth += 1
+            elif token in '}]':
+                depth -= 1
+                if not depth:
+                    return match.end()
+        match = None
+    else:
+        match = _SCALAR.match(text, pos)
+    if match is None:
+        raise ValueError(f"Malformed JSON value at offset {pos}")
+    return match.end()
+
+
+def decode_value(text: str, pos: int) -> tuple:
+    """(value, end) of the JSON value starting at pos."""
+    return _decoder.raw_decode(text, pos)
+
+
+def walk_object(text: str, pos: int, visit: Callable[[str, int], Optional[int]]) -> int:
+    """Call visit(key, value_start) for each member of the object at pos.
+
+    visit returns the offset just past the value if it consumed it, or None
+    to have it skipped. Returns the offset just past the object.
+    """
+    if text[pos:pos + 1] != '{':
+        raise ValueError(f"Expected an object at offset {pos}")
+    close = _NEXT.match(text, pos + 1)
+    if close.group(1) == '}':
+        return close.end()
+    while True:
+        member = _KEY.match(text, pos + 1)
+        if member is None:
+            raise ValueError(f"Expected a key at offset {pos + 1}")
+        key = member.group(1)
+        if '\\' in key:
+            key = json.decoder.scanstring(key + '"', 0)[0]
+        start = member.end()
+        end = visit(key, start)
+        separator = _NEXT.match(text, skip_value(text, start) if end is None else end)
+        char = separator.group(1)
+        if char == '}':
+            return separator.end()
+        if char != ',':
+            raise ValueError(f"Expected ',' or '}}' at offset {separator.end()}")
+        pos = separator.start(1)
+
+
+def walk_array(text: str, pos: int, visit: Callable[[int], Optional[int]]) -> int:
+    """Call visit(item_start) for each item of the array at pos (see walk_object)."""
+    if text[pos:pos + 1] != '[':
+        raise ValueError(f"Expected an array at offset {pos}")
+    pos = _space(text, pos + 1)
+    if text[pos:pos + 1] == ']':
+        return pos + 1
+    while True:
+        end = visit(pos)
+        separator = _NEXT.match(text, skip_value(text, pos) if end is None else end)
+        char = separator.group(1)
+        if char == ']':
+            return separator.end()
+        if char != ',':
+            raise ValueError(f"Expected ',' or ']' at offset {separator.end()}")
+        pos = _space(text, separator.end())
+
+
+# Members of the active manifest, and of each of its ingredients, that
+# mini_manifest decodes
+MINI_MANIFEST_KEYS = ('claim_generator', 'signature_info', 'actions')
+MINI_INGREDIENT_KEYS = ('title', 'format', 'relationship', 'instance_id')
+
+
+def mini_manifest(manifest_json: str, wanted_assertion: Callable[[str], bool]) -> Optional[dict]:
+    """The active manifest of a manifest store, with only the fields mini needs.
+
+    That is MINI_MANIFEST_KEYS, MINI_INGREDIENT_KEYS of each ingredient, and
+    the label and data of the assertions whose label wanted_assertion
+    accepts. Other manifests and members are skipped over, not decoded.
+    None if there is no active manifest; raises ValueError on malformed
+    JSON.
+    """
+    store = {'active_manifest': None, 'manifests': {}}
+
+    def store_member(key, start):
+        if key == 'active_manifest':
+            store['active_manifest'], end = decode_value(text, start)
+            return end
+        if key == 'manifests':
+            return walk_object(text, start, manifest_member)
+        return None
+
+    def manifest_member(label, start):
+        # Usually active_manifest comes first and every other manifest is
+        # skipped; otherwise note where each one starts
+        if store['active_manifest'] is None:
+            store['manifests'][label] = start
+        elif label == store['active_manifest'] and not manifest:
+            store['manifests'][label] = start
+            return read_manifest(start)
+        return None
+
+    manifest = {}
+
+    def read_manifest(start):
+        manifest.update(assertions=[], ingredients=[])
+        return walk_object(text, start, active_member)
+
+    def active_member(key, start):
+        if key in MINI_MANIFEST_KEYS:
+            manifest[key], end = decode_value(text, start)
+            return end
+        if key == 'assertions':
+            return walk_array(text, start, assertion)
+        if key == 'ingredients':
+            return walk_array(text, start, ingredient)
+        return None
+
+    def assertion(start):
+        item = {}
+        data_start = []
+
+        def member(key, value_start):
+            if key == 'label':
+                item['label'], end = decode_value(text, value_start)
+                return end
+            if key == 'data':
+                label = item.get('label')
+                if label is None:
+                    # Decided once the label is known
+                    data_start.append(value_start)
+                elif isinstance(label, str) and wanted_assertion(label):
+                    item['data'], end = decode_value(text, value_start)
+                    return end
+            return None
+
+        end = walk_object(text, start, member)
+        label = item.get('label')
+        if isinstance(label, str) and wanted_assertion(label):
+            if 'data' not in item:
+                item['data'] = decode_value(text, data_start[0])[0] if data_start else {}
+            manifest['assertions'].append(item)
+        return end
+
+    def ingredient(start):
+        item = {}
+
+        def member(key, value_start):
+            if key in MINI_INGREDIENT_KEYS:
+                item[key], end = decode_value(text, value_start)
+                return end
+            return None
+
+        end = walk_object(text, start, member)
+        manifest['ingredients'].append(item)
+        return end
+
+    text = manifest_json
+    walk_object(text, _space(text, 0), store_member)
+    active = store['active_manifest']
+    start = store['manifests'].get(active) if isinstance(active, str) else None
+    if start is None:
+        return None
+    if not manifest:
+        read_manifest(start)
+    return manifest
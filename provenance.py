@@ -0,0 +1,158 @@
+"""
+Provenance graph of a C2PA manifest store.
+
+A manifest's ingredients that carry credentials of their own point to them
+through their 'active_manifest' label, so the manifests in a store form the
+edit history of the image as a DAG rooted at the active manifest. A
+manifest shared by several ingredients (or several manifests) appears in
+the DAG once: each is summarised once, and the graph is built breadth-first
+from the active manifest, so the work is linear in the manifests and
+ingredients of the store however the chains overlap.
+"""
+
+from typing import Optional
+
+from source_types import has_actions
+
+
+def claim_generator(manifest: dict) -> Optional[str]:
+    """The claim generator, or 'name/version' of the first claim_generator_info (C2PA 2.x)."""
+    if manifest.get('claim_generator'):
+        return manifest['claim_generator']
+    info = manifest.get('claim_generator_info')
+    if isinstance(info, list) and info and isinstance(info[0], dict) and info[0].get('name'):
+        version = info[0].get('version')
+        return f"{info[0]['name']}/{version}" if version else info[0]['name']
+    return None
+
+
+def _thumbnail(item: dict) -> Optional[dict]:
+    """The format and resource identifier of a manifest's or ingredient's thumbnail."""
+    thumbnail = item.get('thumbnail')
+    if not isinstance(thumbnail, dict) or not thumbnail.get('identifier'):
+        return None
+    return {'format': thumbnail.get('format') or 'image/jpeg', 'identifier': thumbnail['identifier']}
+
+
+def _actions(manifest: dict) -> list:
+    """The actions of a manifest's actions assertions, as extract_c2pa_data lists them."""
+    actions = []
+    for assertion in manifest.get('assertions') or ():
+        data = assertion.get('data')
+        if not isinstance(data, dict) or not has_actions(assertion.get('label') or ''):
+            continue
+        for action in data.get('actions') or ():
+            if isinstance(action, dict):
+                actions.append({
+                    'action': action.get('action'),
+                    'when': action.get('when'),
+                    'softwareAgent': action.get('softwareAgent'),
+                    'parameters': action.get('parameters', {}),
+                })
+    return actions
+
+
+def manifest_node(label: str, manifest: dict) -> dict:
+    """A graph node: what a manifest says about one step of the history."""
+    signature = manifest.get('signature_info') or {}
+    return {
+        'label': label,
+        'title': manifest.get('title'),
+        'format': manifest.get('format'),
+        'claim_generator': claim_generator(manifest),
+        'signer': {
+            'issuer': signature.get('issuer'),
+            'common_name': signature.get('common_name'),
+            'time': signature.get('time'),
+        } if signature else None,
+        'actions': _actions(manifest),
+        'thumbnail': _thumbnail(manifest),
+    }
+
+
+def _ingredient_manifest(ingredient: dict, manifests: dict) -> Optional[str]:
+    """Label of the manifest an ingredient's credentials are in, if in the store."""
+    label = ingredient.get('active_manifest')
+    if label is None and isinstance(ingredient.get('manifest_data'), dict):
+        # Older stores only name it as the manifest_data resource
+        label = ingredient['manifest_data'].get('identifier')
+    return label if isinstance(label, str) and isinstance(manifests.get(label), dict) else None
+
+
+def build_graph(manifest_store: Optional[dict], max_depth: int) -> Optional[dict]:
+    """The provenance DAG of a manifest store, max_depth ingredient links deep.
+
+    Returns {'active_manifest', 'nodes', 'edges', 'max_depth', 'truncated'},
+    or None without an active manifest. Nodes are manifests in breadth-first
+    order, each with its 'depth' (fewest links from the active manifest).
+    Each ingredient of a node less than max_depth deep is an edge from it,
+    with the label of the ingredient's own manifest as 'manifest' (None if
+    it has none in the store). truncated is set when manifests lie beyond
+    max_depth.
+    """
+    if not manifest_store:
+        return None
+    manifests = manifest_store.get('manifests') or {}
+    active = manifest_store.get('active_manifest')
+    if not isinstance(active, str) or not isinstance(manifests.get(active), dict):
+        return None
+
+    depths = {active: 0}
+    nodes, edges = [], []
+    truncated = False
+    frontier = [active]
+    while frontier:
+        next_frontier = []
+        for label in frontier:
+            manifest = manifests[label]
+            depth = depths[label]
+            nodes.append(dict(manifest_node(label, manifest), depth=depth))
+            for ingredient in manifest.get('ingredients') or ():
+                if not isinstance(ingredient, dict):
+                    continue
+                target = _ingredient_manifest(ingredient, manifests)
+                if depth >= max_depth:
+                    truncated = truncated or target is not None
+                    continue
+                edges.append({
+                    'from': label,
+                    'manifest': target,
+                    'title': ingredient.get('title'),
+                    'format': ingredient.get('format'),
+                    'relationship': ingredient.get('relationship'),
+                    'thumbnail': _thumbnail(ingredient),
+                })
+                # Visited manifests are not expanded again: shared
+                # sub-histories (and malformed cycles) are walked once
+                if target is not None and target not in depths:
+                    depths[target] = depth + 1
+                    next_frontier.append(target)
+        frontier = next_frontier
+
+    return {
+        'active_manifest': active,
+        'nodes': nodes,
+        'edges': edges,
+        'max_depth': max_depth,
+        'truncated': truncated,
+    }
+
+
+def limit_depth(graph: Optional[dict], max_depth: int) -> Optional[dict]:
+    """graph as build_graph would have returned it for a smaller max_depth."""
+    if graph is None or max_depth >= graph['max_depth']:
+        return graph
+    depths = {node['label']: node['depth'] for node in graph['nodes']}
+    edges, truncated = [], False
+    for edge in graph['edges']:
+        if depths[edge['from']] < max_depth:
+            edges.append(edge)
+        elif edge['manifest'] is not None:
+            truncated = True
+    return {
+        'active_manifest': graph['active_manifest'],
+        'nodes': [node for node in graph['nodes'] if node['depth'] <= max_depth],
+        'edges': edges,
+        'max_depth': max_depth,
+        'truncated': truncated,
+    }
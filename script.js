@@ -97,25 +97,51 @@ const metadataMappings = {
 async function extractParamsFromUrl() {
     const urlParams = new URLSearchParams(window.location.search);
     return {
-        imageUri: urlParams.get('uri') || null
+        imageUri: urlParams.get('uri') || null,
+        // ?stream=true renders sections as they are extracted, but streamed
+        // responses can't be cached by the browser
+        stream: urlParams.get('stream') === 'true'
     };
 }
 
-async function loadExifMetadataFromApi(uri) {
-    try {
-        const response = await fetch(`/c2pa/api/exif_metadata?uri=${encodeURIComponent(uri)}`);
-        if (!response.ok) {
-            throw new Error(`HTTP error! status: ${response.status}`);
+// Loads /api/metadata: onPart is called with each part and the merged result
+// so far. Without stream the whole (HTTP-cacheable) result is one part; with
+// stream each section is a part as the server finishes it (EXIF first, C2PA
+// verification later)
+async function loadMetadataFromApi(uri, onPart, stream = false) {
+    const url = `/c2pa/api/metadata?uri=${encodeURIComponent(uri)}`;
+    const response = await fetch(stream ? `${url}&stream=true` : url);
+    if (!response.ok) {
+        throw new Error(`HTTP error! status: ${response.status}`);
+    }
+    if (!stream) {
+        const metadata = await response.json();
+        onPart(metadata, metadata);
+        return metadata;
+    }
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    const metadata = {};
+    let buffered = '';
+    while (true) {
+        const { done, value } = await reader.read();
+        buffered += decoder.decode(value || new Uint8Array(), { stream: !done });
+        const lines = buffered.split('\n');
+        buffered = done ? '' : lines.pop();
+        for (const line of lines) {
+            if (!line.trim()) continue;
+            const part = JSON.parse(line);
+            if (part.error) {
+                // One stage failed; the other sections still render
+                console.error(`Error extracting ${part.section} metadata:`, part.error);
+                continue;
+            }
+            Object.assign(metadata, part);
+            onPart(part, metadata);
         }
-        const data = await response.json();
-        
-        const imageKey = Object.keys(data)[0];
-        return data[imageKey];
-    } catch (error) {
-        console.error('Error loading EXIF metadata from API:', error);
-        displayError(`Failed to load metadata: ${error.message}`);
-        return null;
+        if (done) break;
     }
+    return metadata;
 }
 
 function displayError(message) {
@@ -366,25 +392,6 @@ function renderExifMetadata(metadata) {
         exif.WhiteBalance !== undefined ? metadataMappings.whiteBalance[exif.WhiteBalance] || 'Unknown' : 'Unknown');
 }
 
-async function loadC2PAMetadataFromApi(uri) {
-    try {
-        const response = await fetch(`/c2pa/api/c2pa_metadata?uri=${encodeURIComponent(uri)}`);
-        if (!response.ok) {
-            return null;
-        }
-        const data = await response.json();
-        return {
-            provenance: data.provenance,
-            thumbnails: data.thumbnails || {},
-            digital_source_type: data.digital_source_type || null,
-            author_info: data.author_info || null
-        };
-    } catch (error) {
-        console.error('Error loading C2PA metadata:', error);
-        return null;
-    }
-}
-
 function toggleProvenanceExpansion() {
     const collapsedItems = document.querySelectorAll('.collapsed-item');
     const toggleBtn = document.getElementById('provenanceToggle');
@@ -821,12 +828,17 @@ function formatDate(dateString) {
     return dateString.replace(':', '-').replace(':', '-').replace(' ', ' at ');
 }
 
+// Thumbnails are /api/thumbnail URLs, or base64 JPEG data from older servers
+function thumbnailSrc(thumbnail) {
+    return thumbnail.startsWith('/') ? thumbnail : `data:image/jpeg;base64,${thumbnail}`;
+}
+
 function renderSourceThumbnail(thumbnails) {
     const sourceImage = document.getElementById('sourceImage');
     const placeholder = document.getElementById('thumbnailPlaceholder');
     
     if (thumbnails?.ingredient_thumbnail) {
-        sourceImage.src = `data:image/jpeg;base64,${thumbnails.ingredient_thumbnail}`;
+        sourceImage.src = thumbnailSrc(thumbnails.ingredient_thumbnail);
         sourceImage.style.display = 'block';
         
         if (placeholder) {
@@ -959,7 +971,7 @@ async function uploadImageFile(file) {
         
         // Display the image
         const mainImage = document.getElementById('mainImage');
-        mainImage.src = metadata.image_data;
+        mainImage.src = metadata.image_url || metadata.image_data;
         mainImage.style.display = 'block';
         
         // Hide drag and drop zone completely to reveal main image
@@ -1009,7 +1021,7 @@ async function uploadImageFile(file) {
         // Load and display C2PA metadata
         if (metadata.thumbnails && metadata.thumbnails.ingredient_thumbnail) {
             const sourceImage = document.getElementById('sourceImage');
-            sourceImage.src = `data:image/jpeg;base64,${metadata.thumbnails.ingredient_thumbnail}`;
+            sourceImage.src = thumbnailSrc(metadata.thumbnails.ingredient_thumbnail);
             sourceImage.style.display = 'block';
             
             const placeholder = document.getElementById('thumbnailPlaceholder');
@@ -1109,65 +1121,70 @@ async function init() {
     showLoading();
     
     try {
-        // Load EXIF/IPTC/GPS metadata (fast, no cryptographic verification)
-        const metadata = await loadExifMetadataFromApi(params.imageUri);
-        
-        if (metadata) {
-            const mainImage = document.getElementById('mainImage');
-            if (metadata.image_data) {
-                mainImage.src = metadata.image_data;
-            } else {
+        // One request for all metadata (when streamed, EXIF/IPTC/GPS sections
+        // arrive first and C2PA sections once cryptographic verification is done)
+        await loadMetadataFromApi(params.imageUri, (part, metadata) => {
+            if ('filename' in part) {
+                const mainImage = document.getElementById('mainImage');
                 mainImage.src = params.imageUri;
+                mainImage.style.display = 'block';
+                
+                // Hide the welcome zone completely when image loads
+                const dragDropZone = document.getElementById('dragDropZone');
+                if (dragDropZone) {
+                    dragDropZone.classList.add('hidden');
+                }
+                
+                hideLoading();
+                
+                // Check if C2PA verification container exists before accessing style
+                const c2paVerificationContainer = document.querySelector('.c2pa-verification-container');
+                if (c2paVerificationContainer) {
+                    c2paVerificationContainer.style.display = 'block';
+                }
+                
+                // Show filename under source thumbnail and update title header
+                const filenameElement = document.getElementById('filename');
+                if (filenameElement) {
+                    filenameElement.textContent = metadata.filename;
+                    filenameElement.style.display = 'block';
+                }
+                updateImageTitle(metadata.filename);
             }
-            mainImage.style.display = 'block';
             
-            // Hide the welcome zone completely when image loads
-            const dragDropZone = document.getElementById('dragDropZone');
-            if (dragDropZone) {
-                dragDropZone.classList.add('hidden');
+            if ('exif' in part) {
+                renderPhotographyMetadata(metadata);
+                renderExifMetadata(metadata);
+                renderGPSMetadata(metadata);
             }
             
-            hideLoading();
-            
-            // Check if C2PA verification container exists before accessing style
-            const c2paVerificationContainer = document.querySelector('.c2pa-verification-container');
-            if (c2paVerificationContainer) {
-                c2paVerificationContainer.style.display = 'block';
+            if ('iptc' in part) {
+                renderIPTCMetadata(metadata);
             }
             
-            // Show filename under source thumbnail and update title header
-            const filenameElement = document.getElementById('filename');
-            if (filenameElement) {
-                filenameElement.textContent = metadata.filename;
-                filenameElement.style.display = 'block';
-            }
-            updateImageTitle(metadata.filename);
-            renderPhotographyMetadata(metadata);
-            renderExifMetadata(metadata);
-            renderGPSMetadata(metadata);
-            renderIPTCMetadata(metadata);
-            
-            // Load C2PA metadata (slower, involves cryptographic verification)
-            const c2paData = await loadC2PAMetadataFromApi(params.imageUri);
-            if (c2paData && c2paData.provenance && c2paData.provenance.length > 0) {
-                updateC2PAStatus(true, c2paData.provenance.length);
-                renderC2PAMetadata(c2paData.provenance, true);
-            } else {
-                updateC2PAStatus(false, 0);
-                renderC2PAMetadata(null, false);
+            if ('provenance' in part) {
+                if (part.provenance && part.provenance.length > 0) {
+                    updateC2PAStatus(true, part.provenance.length);
+                    renderC2PAMetadata(part.provenance, true);
+                } else {
+                    updateC2PAStatus(false, 0);
+                    renderC2PAMetadata(null, false);
+                }
+                
+                // Render author info from C2PA data if available
+                if (part.author_info) {
+                    renderAuthorInfo(part.author_info);
+                }
+                
+                // Update digital source type badge
+                updateDigitalSourceType(part.digital_source_type);
             }
             
-            // Render author info from C2PA data if available
-            if (c2paData && c2paData.author_info) {
-                renderAuthorInfo(c2paData.author_info);
+            if ('thumbnails' in part) {
+                // Render thumbnails from C2PA data
+                renderSourceThumbnail(part.thumbnails);
             }
-            
-            // Update digital source type badge
-            updateDigitalSourceType(c2paData?.digital_source_type);
-            
-            // Render thumbnails from C2PA data
-            renderSourceThumbnail(c2paData?.thumbnails);
-        }
+        }, params.stream);
     } catch (error) {
         console.error('Error initializing:', error);
         hideLoading();
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Production entry point: serves server:app with uvicorn.
+
+    C2PA_WEB_WORKERS=0 python serve.py
+
+Processes started with 'spawn' (uvicorn's web workers and the c2pa worker
+processes, see isolation.py) re-import the main script before running, so
+this module only imports config at the top: server.py, with FastAPI, PIL and
+the caches it builds, is imported by the web workers that serve requests,
+not by every c2pa worker.
+"""
+
+import logging
+import os
+import socket
+
+import config
+import logs
+
+logger = logging.getLogger('c2pa_viewer')
+
+
+def main():
+    import uvicorn
+    logs.configure(config.LOG_LEVEL, config.LOG_SAMPLE_PERCENT)
+    workers = config.WEB_WORKERS if config.WEB_WORKERS > 0 else (os.cpu_count() or 1)
+    # Workers import config afresh: tell them how many of them share the machine
+    os.environ['C2PA_WEB_WORKERS'] = str(workers)
+    logger.info(f"Starting C2PA Metadata Viewer server with {workers} worker(s)...")
+    logger.info("Server running at: http://localhost:8080")
+    logger.info("Open in browser: http://localhost:8080/?uri=IMG_20211008_211742.jpg")
+    if workers == 1:
+        # Serve the app in this process; uvicorn only needs an import string
+        # to start several workers
+        import server
+        app = server.app
+    else:
+        app = "server:app"
+    # Bind the listening socket here so accepted connections inherit
+    # TCP_NODELAY: sockets uvicorn binds for several workers lack it, and
+    # every keep-alive response then waits ~40ms for a delayed ACK
+    listener = socket.create_server(("0.0.0.0", 8080))
+    listener.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    # Requests are logged (sampled, as JSON) by RequestIdMiddleware instead
+    uvicorn.run(app, fd=listener.fileno(), workers=workers, access_log=False)
+
+
+if __name__ == "__main__":
+    main()
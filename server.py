@@ -1,28 +1,71 @@
-#!/usr/bin/env python3
 """
 FastAPI backend server for C2PA Image Metadata Viewer.
 Provides REST API endpoints for metadata extraction and thumbnail retrieval.
 """
 
-from fastapi import FastAPI, HTTPException, Query, File, UploadFile
+from fastapi import FastAPI, HTTPException, Query, File, UploadFile, Body, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.encoders import jsonable_encoder
+from starlette.routing import Match
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
 from pathlib import Path
 import json
 import base64
-import c2pa
 from PIL import Image
 import io
 import tempfile
-import urllib.request
-from typing import Optional
-from urllib.parse import urlparse
+import os
+from typing import List, Optional
+from urllib.parse import urlencode, urlparse
 import hashlib
 import time
+import asyncio
 from functools import lru_cache
+from contextlib import asynccontextmanager, contextmanager
+import contextvars
+import threading
+import logging
 
-app = FastAPI(title="C2PA Metadata Viewer API", root_path="/c2pa")
+import config
+import containers
+import logs
+from executor import BoundedExecutor
+from metrics import Counter, Gauge, Registry
+import isolation
+import provenance
+from isolation import IsolationError, ProcessPool
+from downloader import ConnectionPool, Downloader, DownloadTooLarge, content_range_total
+from cache import MISSING, ContentCache, DiskCache, LRUCache, TieredCache, hash_file
+from singleflight import SingleFlight
+from source_types import SourceTypeClassifier
+from uploads import IMAGE_MEDIA_TYPES, UploadStore, UploadTooLarge, safe_suffix, save_stream
+
+# JSON lines on stderr, written off the request path (see logs.py)
+logs.configure(config.LOG_LEVEL, config.LOG_SAMPLE_PERCENT)
+logger = logging.getLogger('c2pa_viewer')
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Expire stale cache entries in the background instead of only on lookup
+    _mini_cache.start_sweeper(config.CACHE_SWEEP_INTERVAL)
+    content_cache.start_sweeper(config.CACHE_SWEEP_INTERVAL)
+    origin_validators.start_sweeper(config.CACHE_SWEEP_INTERVAL)
+    upload_store.start_sweeper(config.CACHE_SWEEP_INTERVAL)
+    if c2pa_pool is not None:
+        # Spawn the c2pa worker processes before the first request needs them
+        await asyncio.get_running_loop().run_in_executor(None, c2pa_pool.start)
+    yield
+    _mini_cache.stop_sweeper()
+    content_cache.stop_sweeper()
+    origin_validators.stop_sweeper()
+    upload_store.stop_sweeper()
+    if c2pa_pool is not None:
+        c2pa_pool.shutdown()
+
+
+app = FastAPI(title="C2PA Metadata Viewer API", root_path="/c2pa", lifespan=lifespan)
 
 # Enable CORS for local development
 app.add_middleware(
@@ -33,93 +76,574 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Blocking work (downloads, c2pa.Reader, PIL) runs here instead of on the event loop
+extraction_executor = BoundedExecutor(
+    max_workers=config.EXECUTOR_WORKERS,
+    max_queue=config.EXECUTOR_QUEUE_DEPTH,
+    retry_after=config.EXECUTOR_RETRY_AFTER,
+)
+
+# c2pa.Reader's native parsing and verification runs in worker processes with a
+# hard per-job time limit, so a pathological manifest can't stall the server
+c2pa_pool = ProcessPool(
+    max_workers=config.PROCESS_WORKERS,
+    timeout=config.PROCESS_JOB_TIMEOUT,
+    max_rss_bytes=config.PROCESS_MAX_RSS_BYTES,
+    max_memory_bytes=config.PROCESS_MAX_MEMORY_BYTES,
+) if config.PROCESS_WORKERS > 0 else None
+
+# Remote images are streamed to disk over pooled keep-alive connections
+http_downloader = Downloader(
+    pool=ConnectionPool(
+        max_idle_per_host=config.DOWNLOAD_POOL_MAX_IDLE_PER_HOST,
+        idle_timeout=config.DOWNLOAD_POOL_IDLE_TIMEOUT,
+    ),
+    max_bytes=config.DOWNLOAD_MAX_BYTES,
+    deadline=config.DOWNLOAD_DEADLINE,
+    chunk_size=config.DOWNLOAD_CHUNK_SIZE,
+)
+
+# Bump when extraction output changes so persisted cache entries are not reused
+EXTRACTION_VERSION = '2'
+
+def _worker_share(budget: int) -> int:
+    """This web worker's share of an in-memory cache budget (see config.WEB_WORKERS)."""
+    return max(1, budget // max(1, config.WEB_WORKERS))
+
+
+# Optional persistent cache tier (e.g. on a mounted volume) shared by all caches,
+# and by all web workers
+disk_cache = (
+    DiskCache(config.DISK_CACHE_PATH, max_bytes=config.DISK_CACHE_MAX_BYTES)
+    if config.DISK_CACHE_PATH else None
+)
+
+# Extraction results shared by all endpoints, keyed by the hash of the image bytes
+content_cache = ContentCache(
+    max_entries=_worker_share(config.RESULT_CACHE_MAX_ENTRIES),
+    max_bytes=_worker_share(config.RESULT_CACHE_MAX_BYTES),
+    ttl=config.RESULT_CACHE_TTL,
+    disk=disk_cache,
+    namespace=f'content:v{EXTRACTION_VERSION}',
+)
+
+# ETag / Last-Modified last seen for each remote image URI, with the content
+# hash its extraction results are cached under in content_cache
+origin_validators = TieredCache(
+    LRUCache(
+        max_entries=_worker_share(config.ORIGIN_VALIDATORS_MAX_ENTRIES),
+        ttl=config.RESULT_CACHE_TTL,
+    ),
+    disk_cache,
+    namespace='origin',
+)
+
+# Uploaded originals, served back briefly from /api/original/{content_hash}
+upload_store = UploadStore(
+    config.UPLOAD_DIR or os.path.join(tempfile.gettempdir(), 'c2pa-uploads'),
+    ttl=config.UPLOAD_TTL,
+    max_bytes=config.UPLOAD_STORE_MAX_BYTES,
+)
+
+# Prometheus-style metrics, served by /metrics
+metrics_registry = Registry()
+REQUESTS = metrics_registry.counter(
+    'c2pa_http_requests_total', 'HTTP requests served, by route, method and status.',
+    ('endpoint', 'method', 'status'))
+REQUEST_SECONDS = metrics_registry.histogram(
+    'c2pa_http_request_duration_seconds', 'Time to serve a request (to its last byte), by route.',
+    ('endpoint',))
+REQUESTS_IN_FLIGHT = metrics_registry.gauge(
+    'c2pa_http_requests_in_flight', 'Requests being served, by route.', ('endpoint',))
+STAGE_SECONDS = metrics_registry.histogram(
+    'c2pa_stage_duration_seconds',
+    'Time spent in each internal stage (download, c2pa_read, c2pa, c2pa_minimal, provenance, '
+    'exif, iptc, thumbnails, format).',
+    ('stage',))
+DOWNLOAD_BYTES = metrics_registry.counter(
+    'c2pa_download_bytes_total', 'Image bytes downloaded, by origin.', ('origin',))
+
+# Origins given their own download_bytes label; the rest are counted as 'other'
+_origin_labels = set()
+
+
+def _origin_label(uri: str) -> str:
+    """scheme://host[:port] of a URL, for metric labels (never its credentials)."""
+    parsed = urlparse(uri)
+    origin = f"{parsed.scheme}://{parsed.hostname}" + (f":{parsed.port}" if parsed.port else '')
+    if origin not in _origin_labels:
+        if len(_origin_labels) >= config.METRICS_MAX_ORIGINS:
+            return 'other'
+        _origin_labels.add(origin)
+    return origin
+
+
+def _record_download(uri: str, result, started: float):
+    STAGE_SECONDS.observe(time.perf_counter() - started, stage='download')
+    DOWNLOAD_BYTES.inc(result.bytes_written, origin=_origin_label(uri))
+
 
 class ImagePathContext:
     """Context manager for handling both local files and remote URLs."""
-    def __init__(self, uri: str, timeout: int = 30):
+    def __init__(self, uri: str, timeout: Optional[float] = None, header_only: bool = False,
+                 stages: tuple = ()):
         self.uri = uri
-        self.temp_file = None
+        self.temp_path = None
         self.local_path = None
-        self.timeout = timeout
+        # SHA-256 of the image bytes, set on enter
+        self.content_hash = None
+        # Overall download deadline in seconds
+        self.timeout = timeout if timeout is not None else config.DOWNLOAD_DEADLINE
+        # Read only the header segments of JPEG/PNG images (metadata and the
+        # C2PA manifest store), using HTTP Range requests for remote ones
+        self.header_only = header_only
+        # True when only the image's header segments were read; for remote
+        # images local_path then holds just those
+        self.partial = False
+        # Size of the original image in bytes, if known
+        self.file_size = None
+        # content_cache stages the caller will run. If all of them are cached
+        # for the image last seen at this URI, the origin is asked whether it
+        # changed (If-None-Match / If-Modified-Since) instead of re-sending it
+        self.stages = stages
+        # True when the origin answered 304: nothing was downloaded and
+        # local_path is None, but content_hash has cached results for stages
+        self.not_modified = False
         
     def __enter__(self):
         # Check if it's a URL
         parsed = urlparse(self.uri)
         if parsed.scheme in ('http', 'https'):
-            # Download to temporary file
+            # Stream to a temporary file over a pooled connection
+            temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.part')
             try:
-                print(f"Downloading image from: {self.uri}")
-                
-                # Create request with proper headers to avoid 403 errors
-                req = urllib.request.Request(
-                    self.uri,
-                    headers={
-                        'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-                        'Accept': 'image/jpeg,image/png,image/webp,image/*,*/*;q=0.8',
-                        'Accept-Language': 'en-US,en;q=0.9',
-                        'Referer': parsed.scheme + '://' + parsed.netloc + '/'
-                    }
-                )
-                
-                response = urllib.request.urlopen(req, timeout=self.timeout)
+                logger.debug('Downloading image', extra={'uri': self.uri})
+                started = time.perf_counter()
+                validators_key = (self.uri, 'header' if self.header_only else 'full')
+                record, results = self._revalidation(validators_key)
+                headers = _conditional_headers(record)
+                with temp_file:
+                    if self.header_only:
+                        result, prefix = http_downloader.download_prefix(
+                            self.uri, temp_file, containers.manifest_bytes_needed,
+                            initial_bytes=config.RANGE_INITIAL_BYTES,
+                            max_prefix_bytes=config.RANGE_MAX_BYTES,
+                            headers=headers, deadline=self.timeout)
+                    else:
+                        result = http_downloader.download(self.uri, temp_file, headers=headers,
+                                                          deadline=self.timeout)
+                        prefix = None
+                    _record_download(self.uri, result, started)
+                    if result.not_modified:
+                        Path(temp_file.name).unlink(missing_ok=True)
+                        self._keep(validators_key, record, results)
+                        logger.info('Not modified since last download', extra={'uri': self.uri, 'sampled': True})
+                        return None
+                    if prefix is not None:
+                        # Keep only the header segments, as a well-formed file
+                        header = containers.header_only_image(prefix)
+                        temp_file.write(header)
+                        self.partial = True
+                        self.file_size = content_range_total(result.headers.get('Content-Range'))
+                        self.content_hash = _header_hash(header, self.file_size)
+                    else:
+                        self.file_size = result.bytes_written
+                        self.content_hash = result.content_hash
                 
                 # Determine file extension from URL or content-type
-                content_type = response.headers.get('Content-Type', '')
+                content_type = result.content_type
                 ext = '.jpg'  # default
-                if 'jpeg' in content_type or 'jpg' in content_type:
+                if prefix is not None:
+                    ext = '.png' if containers.sniff_format(prefix) == 'png' else '.jpg'
+                elif 'jpeg' in content_type or 'jpg' in content_type:
                     ext = '.jpg'
                 elif 'png' in content_type:
                     ext = '.png'
                 elif self.uri.lower().endswith('.png'):
                     ext = '.png'
                 
-                # Create temporary file
-                self.temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=ext)
-                self.temp_file.write(response.read())
-                self.temp_file.close()
+                # c2pa.Reader detects the format from the file extension
+                self.temp_path = str(Path(temp_file.name).with_suffix(ext))
+                os.replace(temp_file.name, self.temp_path)
                 
-                self.local_path = self.temp_file.name
-                print(f"Downloaded to temporary file: {self.local_path}")
+                self.local_path = self.temp_path
+                if result.etag or result.last_modified:
+                    origin_validators.set(validators_key, {
+                        'etag': result.etag,
+                        'last_modified': result.last_modified,
+                        'content_hash': self.content_hash,
+                        'file_size': self.file_size,
+                        'partial': self.partial,
+                    })
+                logger.info('Downloaded image', extra={
+                    'uri': self.uri, 'bytes': result.bytes_written, 'partial': self.partial, 'sampled': True,
+                })
                 return self.local_path
+            except DownloadTooLarge as e:
+                Path(temp_file.name).unlink(missing_ok=True)
+                logger.warning('Error downloading image: %s', e, extra={'uri': self.uri})
+                raise HTTPException(status_code=413, detail=f"Failed to download image: {str(e)}")
             except Exception as e:
-                print(f"Error downloading image: {e}")
+                Path(temp_file.name).unlink(missing_ok=True)
+                logger.warning('Error downloading image: %s', e, extra={'uri': self.uri})
                 raise HTTPException(status_code=400, detail=f"Failed to download image: {str(e)}")
         else:
             # Local file path
             if not Path(self.uri).exists():
                 raise HTTPException(status_code=404, detail="Image file not found")
             self.local_path = self.uri
+            self.file_size = Path(self.uri).stat().st_size
+            header = None
+            if self.header_only:
+                # Hash just the header segments instead of reading the whole file
+                with open(self.uri, 'rb') as f:
+                    header = containers.read_header(f, config.RANGE_MAX_BYTES)
+            if header is not None:
+                self.partial = True
+                self.content_hash = _header_hash(header, self.file_size)
+            else:
+                self.content_hash = hash_file(self.local_path)
             return self.local_path
     
+    def _revalidation(self, validators_key):
+        """The validators last seen for this URI and their cached stage results.
+        
+        Returns (None, None) unless every stage in self.stages is still cached
+        for the image the validators belong to.
+        """
+        if not self.stages:
+            return None, None
+        record = origin_validators.get(validators_key, None)
+        if not record:
+            return None, None
+        results = {stage: content_cache.get(record['content_hash'], stage) for stage in self.stages}
+        if any(result is MISSING for result in results.values()):
+            return None, None
+        return record, results
+    
+    def _keep(self, validators_key, record, results):
+        """Adopt the previously downloaded image after a 304, refreshing its cache entries."""
+        self.not_modified = True
+        self.content_hash = record['content_hash']
+        self.file_size = record['file_size']
+        self.partial = record['partial']
+        for stage, result in results.items():
+            content_cache.set(self.content_hash, stage, result)
+        origin_validators.set(validators_key, record)
+    
     def __exit__(self, exc_type, exc_val, exc_tb):
         # Clean up temporary file if it was created
-        if self.temp_file:
+        if self.temp_path:
             try:
-                Path(self.temp_file.name).unlink(missing_ok=True)
-                print(f"Cleaned up temporary file: {self.temp_file.name}")
+                Path(self.temp_path).unlink(missing_ok=True)
+                logger.debug('Cleaned up temporary file', extra={'path': self.temp_path})
             except Exception as e:
-                print(f"Error cleaning up temporary file: {e}")
-
-
-# Digital Source Type mappings for human-friendly labels
-DIGITAL_SOURCE_TYPE_LABELS = {
-    'digitalCapture': 'Digital Camera',
-    'negativeFilm': 'Negative Film Scan',
-    'positiveFilm': 'Slide Film Scan',
-    'print': 'Print Scan',
-    'screenCapture': 'Screen Capture',
-    'trainedAlgorithmicMedia': 'Generative AI',
-    'algorithmicallyEnhanced': 'AI Enhanced',
-    'minorHumanEdits': 'Lightly Edited',
-    'compositeCapture': 'Composite (Camera)',
-    'compositeDigital': 'Composite (Digital)',
-    'compositeSynthetic': 'Composite (Synthetic)',
-    'compositeWithTrainedAlgorithmicMedia': 'Composite (AI + Camera)',
-    'multiFrameComputationalCapture': 'Computational Photography',
-    'virtualRecording': 'Virtual Recording',
-    'digitalArt': 'Digital Art',
-    'dataDrivenMedia': 'Data-Driven Media',
-}
+                logger.warning('Error cleaning up temporary file: %s', e)
+
+    async def __aenter__(self):
+        # Download (or check the local path) on the extraction executor
+        return await extraction_executor.run(self.__enter__)
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        # Unlinking is cheap, and must not be refused when the executor is saturated
+        self.__exit__(exc_type, exc_val, exc_tb)
+
+
+def _conditional_headers(record: Optional[dict]) -> Optional[dict]:
+    """If-None-Match / If-Modified-Since headers from stored origin validators."""
+    if not record:
+        return None
+    headers = {}
+    if record.get('etag'):
+        headers['If-None-Match'] = record['etag']
+    if record.get('last_modified'):
+        headers['If-Modified-Since'] = record['last_modified']
+    return headers
+
+
+def _header_hash(header: bytes, file_size: Optional[int]) -> str:
+    """Content hash for an image of which only the header segments were read."""
+    digest = hashlib.sha256(header)
+    digest.update(f"\0header-only:{file_size}".encode())
+    return digest.hexdigest()
+
+
+class ManifestUnreadable(Exception):
+    """The image has a C2PA manifest, but it could not be read or verified."""
+
+
+class ParsedImage:
+    """An image file parsed at most once per request.
+    
+    Holds the decoded manifest store, its thumbnail resources and the PIL image
+    header so that every extractor working on the same file shares them
+    instead of re-opening the container and re-parsing the manifest. The
+    manifest is read by one c2pa job (see run_isolated). Each piece is loaded
+    lazily on first access; the manifest and the PIL image have separate
+    locks, so stages that only need the image header don't wait for the
+    manifest to be verified.
+    """
+    def __init__(self, image_path: str, content_hash: Optional[str] = None,
+                 file_size: Optional[int] = None):
+        self.path = image_path
+        # Key into content_cache; None disables caching for this image
+        self.content_hash = content_hash
+        # Size of the original image, when image_path holds only its header
+        self._file_size = file_size
+        self._c2pa_lock = threading.RLock()
+        self._image_lock = threading.Lock()
+        self._manifest_store = None
+        self._resources = {}
+        self._c2pa_loaded = False
+        self._c2pa_error = None
+        # Why the manifest could not be read (see isolation.read_c2pa)
+        self._manifest_error = None
+        self._minimal_manifest = None
+        self._minimal_loaded = False
+        self._image = None
+        self._image_loaded = False
+        self._image_error = None
+        # Errors of stages whose results stand in for ones that could not be
+        # extracted, by stage (see run_stage): responses built from them are
+        # not cached
+        self.failed_stages = {}
+    
+    def _load_c2pa(self):
+        """Read the manifest store and thumbnails, once (call with _c2pa_lock held)."""
+        if self._c2pa_error is not None:
+            raise self._c2pa_error
+        if not self._c2pa_loaded:
+            try:
+                with STAGE_SECONDS.time(stage='c2pa_read'):
+                    self._manifest_store, self._resources, self._manifest_error = run_isolated(
+                        isolation.read_c2pa, self.path)
+            except HTTPException as e:
+                # A job that timed out or crashed would only do so again
+                self._c2pa_error = e
+                raise
+            self._c2pa_loaded = True
+        if self._manifest_error is not None:
+            raise ManifestUnreadable(self._manifest_error)
+    
+    @property
+    def manifest_store(self) -> Optional[dict]:
+        """The decoded manifest store JSON, or None."""
+        with self._c2pa_lock:
+            self._load_c2pa()
+            return self._manifest_store
+    
+    @property
+    def active_manifest(self) -> Optional[dict]:
+        """The active manifest from the store, or None."""
+        data = self.manifest_store
+        if not data:
+            return None
+        active_label = data.get('active_manifest')
+        if not active_label or active_label not in data.get('manifests', {}):
+            return None
+        return data['manifests'][active_label]
+    
+    @property
+    def minimal_manifest(self) -> Optional[dict]:
+        """The active manifest with only the fields extract_c2pa_minimal reads, or None.
+        
+        Decoded selectively in the c2pa job (isolation.read_c2pa_minimal),
+        unless the whole manifest store has been read already.
+        """
+        with self._c2pa_lock:
+            if self._c2pa_loaded or self._c2pa_error is not None:
+                return self.active_manifest
+            if not self._minimal_loaded:
+                try:
+                    with STAGE_SECONDS.time(stage='c2pa_read'):
+                        self._minimal_manifest, self._manifest_error = run_isolated(
+                            isolation.read_c2pa_minimal, self.path)
+                except HTTPException as e:
+                    self._c2pa_error = e
+                    raise
+                self._minimal_loaded = True
+            if self._manifest_error is not None:
+                raise ManifestUnreadable(self._manifest_error)
+            return self._minimal_manifest
+    
+    def resource(self, identifier: str) -> bytes:
+        """Bytes of a thumbnail of the active manifest or its ingredients."""
+        with self._c2pa_lock:
+            self._load_c2pa()
+            return self._resources[identifier]
+    
+    @property
+    def file_size(self) -> Optional[int]:
+        """Size in bytes of the original image."""
+        if self._file_size is not None:
+            return self._file_size
+        return Path(self.path).stat().st_size
+
+    @property
+    def image(self):
+        """The PIL image (header only; pixel data is never decoded), or None."""
+        with self._image_lock:
+            if not self._image_loaded:
+                self._image_loaded = True
+                try:
+                    self._image = Image.open(self.path)
+                except Exception as e:
+                    logger.warning('Error opening image: %s', e)
+                    self._image_error = e
+            if self._image_error is not None:
+                stage_failed(self._image_error)
+            return self._image
+    
+    def close(self):
+        with self._image_lock:
+            if self._image is not None:
+                self._image.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def run_isolated(fn, *args):
+    """Run a c2pa job on c2pa_pool, or on this thread when process isolation is off.
+    
+    A job that runs out of time or crashes its worker raises a 422, which the
+    extractors pass on rather than report the image as having no manifest.
+    """
+    if c2pa_pool is None:
+        return fn(*args)
+    try:
+        return c2pa_pool.run(fn, *args)
+    except IsolationError as e:
+        logger.error('C2PA worker job failed: %s', e, extra={'job': args[0] if args else fn.__name__})
+        raise HTTPException(status_code=422, detail=f"C2PA manifest could not be processed: {e}")
+
+
+@contextmanager
+def _parsed(image):
+    """Yield a ParsedImage for a path or pass one through unchanged.
+    
+    Extractors accept either, so they can still be called with a bare path;
+    a ParsedImage created here is closed again on exit.
+    """
+    if isinstance(image, ParsedImage):
+        yield image
+    else:
+        with ParsedImage(image) as parsed:
+            yield parsed
+
+
+# Concurrent requests for the same URI (or the same stage of the same image
+# bytes) share one in-flight download/extraction
+inflight = SingleFlight()
+
+
+# Errors the running extractor recovered from, when run_stage runs it
+_stage_errors = contextvars.ContextVar('stage_errors', default=None)
+
+
+def stage_failed(error: Exception):
+    """Note that the running extractor hit error and is returning a stand-in.
+    
+    Extractors still return their empty result (e.g. None: no C2PA data),
+    but run_stage neither caches it nor lets it count as the image's real
+    result (see ParsedImage.failed_stages).
+    """
+    errors = _stage_errors.get()
+    if errors is not None:
+        errors.append(error)
+
+
+def _extract(extractor, image: ParsedImage, errors: list):
+    # Runs in a copy of the caller's context on an executor thread
+    _stage_errors.set(errors)
+    return extractor(image)
+
+
+async def run_stage(stage: str, extractor, image: ParsedImage):
+    """Run an extractor on the executor, served from content_cache when possible.
+    
+    A result the extractor could not produce properly (see stage_failed) is
+    not cached, and image.failed_stages records the stage's first error.
+    """
+    cached = content_cache.get(image.content_hash, stage)
+    if cached is not MISSING:
+        return cached
+    if image.path is None:
+        # The origin answered 304 but the result was evicted right after
+        raise HTTPException(status_code=503, detail="Cached result expired during revalidation, please retry")
+    
+    async def extract():
+        errors = []
+        result = await extraction_executor.run(_extract, extractor, image, errors)
+        if not errors and image.content_hash is not None:
+            content_cache.set(image.content_hash, stage, result)
+        return result, errors
+    
+    if image.content_hash is None:
+        result, errors = await extract()
+    else:
+        result, errors = await inflight.do(('stage', image.content_hash, stage), extract)
+    if errors:
+        image.failed_stages[stage] = str(errors[0])
+    return result
+
+
+async def run_stages(image: ParsedImage, extractors: dict, timings: Optional[dict] = None) -> dict:
+    """Run independent stages on the same image concurrently, via run_stage.
+    
+    extractors maps stage names to extractor functions; returns results by
+    stage name. Each stage's wall-clock time in milliseconds (near zero when
+    served from cache) is recorded in timings, if given.
+    """
+    async def timed(stage, extractor):
+        started = time.perf_counter()
+        try:
+            return await run_stage(stage, extractor, image)
+        finally:
+            if timings is not None:
+                timings[stage] = (time.perf_counter() - started) * 1000
+    
+    results = await asyncio.gather(*(timed(stage, extractor) for stage, extractor in extractors.items()))
+    return dict(zip(extractors, results))
+
+
+def response_hash(image: ParsedImage) -> Optional[str]:
+    """The content hash a response built from image's stages is cached under.
+    
+    None, so that it gets no ETag and is not cached, if any stage failed.
+    """
+    return None if image.failed_stages else image.content_hash
+
+
+@contextmanager
+def timed_format():
+    """Observe building a response from stage results as the 'format' stage.
+    
+    Handlers format outside the coalesced extraction, once per request, so
+    concurrent requests sharing an extraction and stages served from cache
+    are each counted once.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - started, stage='format')
+
+
+def server_timing(timings: Optional[dict]) -> Optional[str]:
+    """A Server-Timing header value (shown in browser devtools) for stage timings."""
+    if not timings:
+        return None
+    return ', '.join(f"{stage};dur={ms:.1f}" for stage, ms in timings.items())
 
 
 def extract_social_links(assertion_data: dict) -> dict:
@@ -199,133 +723,29 @@ def extract_social_links(assertion_data: dict) -> dict:
     return social_links
 
 
+# Digital source type rules, compiled once (plus any from C2PA_SOURCE_TYPE_RULES)
+source_type_classifier = SourceTypeClassifier.from_file(config.SOURCE_TYPE_RULES)
+
+
 def get_digital_source_type(c2pa_data: dict) -> tuple:
     """Extract digital source type from C2PA data.
     
     Returns tuple of (source_type_code, human_readable_label).
-    Looks for digitalSourceType in IPTC assertion, then infers from actions and ingredients.
+    Uses a declared digitalSourceType (IPTC or CreativeWork assertion), else
+    infers it from the claim generator, actions and ingredients (see source_types.py).
     """
-    if not c2pa_data:
-        return None, None
-    
-    # Check claim_generator for AI tools
-    claim_generator = (c2pa_data.get('basic_info', {}).get('claim_generator') or '').lower()
-    ai_tools = ['firefly', 'dall-e', 'dalle', 'midjourney', 'stable diffusion', 
-                'generative fill', 'generative remove', 'generative']
-    if any(tool in claim_generator for tool in ai_tools):
-        return 'trainedAlgorithmicMedia', 'Generative AI'
-    
-    # Check assertions for IPTC digitalSourceType
-    for assertion in c2pa_data.get('assertions', []):
-        label = assertion.get('label') or ''
-        data = assertion.get('data', {})
-        
-        # Check for IPTC Photo Metadata assertion
-        if 'iptc' in label.lower() or 'photo-metadata' in label.lower():
-            source_type = data.get('digitalSourceType')
-            if source_type:
-                friendly = DIGITAL_SOURCE_TYPE_LABELS.get(source_type, source_type)
-                return source_type, friendly
-        
-        # Check CreativeWork for additional metadata
-        if 'CreativeWork' in label:
-            # Some implementations put it here
-            source_type = data.get('digitalSourceType')
-            if source_type:
-                friendly = DIGITAL_SOURCE_TYPE_LABELS.get(source_type, source_type)
-                return source_type, friendly
-        
-        # Check c2pa.actions for AI operations
-        if 'actions' in label.lower():
-            actions_list = data.get('actions', [])
-            for action in actions_list:
-                action_name = (action.get('action') or '').lower()
-                software_agent = (action.get('softwareAgent') or '').lower()
-                parameters = action.get('parameters', {}) or {}
-                
-                # Check action name for AI keywords
-                if 'generative' in action_name or 'ai' in action_name:
-                    return 'trainedAlgorithmicMedia', 'Generative AI'
-                
-                # Check software agent for known AI tools
-                if any(tool in software_agent for tool in ai_tools):
-                    return 'trainedAlgorithmicMedia', 'Generative AI'
-                
-                # Check parameters for AI operations
-                for key, value in parameters.items():
-                    key_lower = (key or '').lower()
-                    value_lower = str(value or '').lower()
-                    
-                    # Check for AI-related parameter keys or values
-                    if any(kw in key_lower for kw in ['firefly', 'generative', 'ai', 'text_to_image']):
-                        return 'trainedAlgorithmicMedia', 'Generative AI'
-                    if any(kw in value_lower for kw in ['text_to_image', 'generative', 'firefly']):
-                        return 'trainedAlgorithmicMedia', 'Generative AI'
-    
-    # Check actions for AI-related software and operations (legacy format)
-    actions = c2pa_data.get('actions', [])
-    for action in actions:
-        action_name = (action.get('action') or '').lower()
-        software_agent = (action.get('softwareAgent') or '').lower()
-        parameters = action.get('parameters', {}) or {}
-        
-        # Check action name for AI keywords
-        if 'generative' in action_name or 'ai' in action_name:
-            return 'trainedAlgorithmicMedia', 'Generative AI'
-        
-        # Check software agent for known AI tools
-        if any(tool in software_agent for tool in ai_tools):
-            return 'trainedAlgorithmicMedia', 'Generative AI'
-        
-        # Check parameters for AI operations
-        for key, value in parameters.items():
-            key_lower = (key or '').lower()
-            value_lower = str(value or '').lower()
-            
-            # Check for AI-related parameter keys or values
-            if any(kw in key_lower for kw in ['firefly', 'generative', 'ai', 'text_to_image']):
-                return 'trainedAlgorithmicMedia', 'Generative AI'
-            if any(kw in value_lower for kw in ['text_to_image', 'generative', 'firefly']):
-                return 'trainedAlgorithmicMedia', 'Generative AI'
-    
-    # Infer from ingredient format
-    ingredients = c2pa_data.get('ingredients', [])
-    if ingredients:
-        for ingredient in ingredients:
-            fmt = (ingredient.get('format') or '').lower()
-            title = (ingredient.get('title') or '').lower()
-            
-            # Raw camera formats
-            if 'dng' in fmt or 'raw' in fmt or title.endswith('.dng') or title.endswith('.raw'):
-                return 'digitalCapture', 'Digital Camera (RAW)'
-            
-            # Standard image formats from camera
-            if 'jpeg' in fmt or 'jpg' in fmt or 'tiff' in fmt:
-                return 'digitalCapture', 'Digital Camera'
-    
-    # Default: if we have C2PA data with actions but no AI detected, assume digital capture
-    if c2pa_data.get('actions') or c2pa_data.get('ingredients'):
-        return 'digitalCapture', 'Digital Camera'
-    
-    return None, None
+    return source_type_classifier.classify(c2pa_data)
 
 
-def extract_c2pa_data(image_path: str):
-    """Extract C2PA manifest data from an image."""
+@STAGE_SECONDS.time(stage='c2pa')
+def extract_c2pa_data(image):
+    """Extract C2PA manifest data from an image (path or ParsedImage)."""
     try:
-        reader = c2pa.Reader(image_path)
-        manifest_json = reader.json()
-        
-        if not manifest_json:
-            return None
-            
-        data = json.loads(manifest_json)
-        active_label = data.get('active_manifest')
+        with _parsed(image) as parsed:
+            manifest = parsed.active_manifest
         
-        if not active_label or active_label not in data.get('manifests', {}):
+        if manifest is None:
             return None
-            
-        manifest = data['manifests'][active_label]
         
         result = {
             'basic_info': {
@@ -363,7 +783,8 @@ def extract_c2pa_data(image_path: str):
                     })
             
             elif label == 'stds.schema-org.CreativeWork':
-                result['author_info'] = assertion_data
+                # Copy so the shared parsed manifest isn't mutated
+                result['author_info'] = dict(assertion_data)
                 # Extract and add social links to author_info
                 result['author_info']['social_links'] = extract_social_links(assertion_data)
         
@@ -385,12 +806,16 @@ def extract_c2pa_data(image_path: str):
         
         return result
         
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"Error extracting C2PA data: {e}")
+        logger.warning('Error extracting C2PA data: %s', e)
+        stage_failed(e)
         return None
 
 
-def extract_c2pa_minimal(image_path: str):
+@STAGE_SECONDS.time(stage='c2pa_minimal')
+def extract_c2pa_minimal(image):
     """Extract only essential C2PA data for quick verification.
     
     Optimized version that extracts only what's needed for the mini API:
@@ -400,23 +825,17 @@ def extract_c2pa_minimal(image_path: str):
     - actions (for AI detection)
     - basic_info (for claim_generator AI detection)
     
-    This avoids extracting full assertions that aren't used by the mini endpoint.
+    Only these are decoded from the manifest store JSON (see
+    ParsedImage.minimal_manifest), and only the assertions
+    get_digital_source_type reads are kept.
     """
     try:
-        reader = c2pa.Reader(image_path)
-        manifest_json = reader.json()
-        
-        if not manifest_json:
-            return None
+        with _parsed(image) as parsed:
+            manifest = parsed.minimal_manifest
         
-        data = json.loads(manifest_json)
-        active_label = data.get('active_manifest')
-        
-        if not active_label or active_label not in data.get('manifests', {}):
+        if manifest is None:
             return None
         
-        manifest = data['manifests'][active_label]
-        
         # Extract ONLY what mini API needs
         result = {
             'signature_info': manifest.get('signature_info', {}),
@@ -467,8 +886,11 @@ def extract_c2pa_minimal(image_path: str):
         
         return result
         
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"Error extracting minimal C2PA data: {e}")
+        logger.warning('Error extracting minimal C2PA data: %s', e)
+        stage_failed(e)
         return None
 
 
@@ -533,7 +955,7 @@ def format_datetime_full(dt_string: str, include_timezone: bool = False) -> str:
             return dt.strftime('%b %d, %Y at %I:%M %p')
         
     except Exception as e:
-        print(f"Error formatting datetime: {e}")
+        logger.debug('Error formatting datetime: %s', e)
         return dt_string
     
     return dt_string
@@ -579,9 +1001,7 @@ def extract_gps_from_exif(exif_data: dict) -> dict:
                 gps_info['longitude_decimal'] = lon_decimal
         
     except Exception as e:
-        print(f"Error extracting GPS: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception('Error extracting GPS: %s', e)
     
     return gps_info
 
@@ -606,14 +1026,15 @@ def convert_exif_value(value):
     return value
 
 
-def extract_iptc_data(image_path: str) -> dict:
-    """Extract IPTC metadata from an image."""
+@STAGE_SECONDS.time(stage='iptc')
+def extract_iptc_data(image) -> dict:
+    """Extract IPTC metadata from an image (path or ParsedImage)."""
     try:
-        from PIL import Image
         from PIL import IptcImagePlugin
         
-        img = Image.open(image_path)
-        iptc = IptcImagePlugin.getiptcinfo(img)
+        with _parsed(image) as parsed:
+            img = parsed.image
+            iptc = IptcImagePlugin.getiptcinfo(img) if img is not None else None
         
         if not iptc:
             return {}
@@ -656,79 +1077,86 @@ def extract_iptc_data(image_path: str) -> dict:
         return result
         
     except Exception as e:
-        print(f"Error extracting IPTC data: {e}")
+        logger.warning('Error extracting IPTC data: %s', e)
+        stage_failed(e)
         return {}
 
 
-def extract_exif_metadata(image_path: str):
-    """Extract EXIF metadata from an image."""
+@STAGE_SECONDS.time(stage='exif')
+def extract_exif_metadata(image):
+    """Extract EXIF metadata from an image (path or ParsedImage)."""
     try:
-        img = Image.open(image_path)
-        exif_data = img._getexif() or {}
-        
-        result = {
-            'filename': Path(image_path).name,
-            'format': img.format,
-            'width': img.width,
-            'height': img.height,
-            'file_size_bytes': Path(image_path).stat().st_size,
-        }
-        
-        result['file_size_mb'] = round(result['file_size_bytes'] / (1024 * 1024), 2)
-        
-        # Map common EXIF tags
-        exif_tag_map = {
-            271: 'Make',
-            272: 'Model',
-            282: 'XResolution',
-            283: 'YResolution',
-            305: 'Software',
-            306: 'DateTime',
-            315: 'Artist',
-            33432: 'Copyright',
-            36867: 'DateTimeOriginal',
-            36868: 'DateTimeDigitized',
-            37378: 'ApertureValue',
-            37383: 'MeteringMode',
-            37385: 'Flash',
-            37386: 'FocalLength',
-            40961: 'ColorSpace',
-            41495: 'SensingMethod',
-            41986: 'ExposureMode',
-            41987: 'WhiteBalance',
-            34855: 'ISOSpeedRatings',
-            33437: 'FNumber',
-            33434: 'ExposureTime',
-            42036: 'LensModel',
-        }
-        
-        exif_processed = {}
-        for tag_id, tag_name in exif_tag_map.items():
-            if tag_id in exif_data:
-                value = exif_data[tag_id]
-                # Convert to JSON-serializable format
-                exif_processed[tag_name] = convert_exif_value(value)
-        
-        result['exif'] = exif_processed
-        
-        # Extract GPS data
-        result['gps'] = extract_gps_from_exif(exif_data)
-        
-        # Extract ICC color profile name
-        result['color_profile'] = None
-        if 'icc_profile' in img.info:
-            try:
-                from PIL import ImageCms
-                icc_profile = io.BytesIO(img.info['icc_profile'])
-                profile = ImageCms.ImageCmsProfile(icc_profile)
-                result['color_profile'] = ImageCms.getProfileDescription(profile)
-            except Exception as e:
-                print(f"Error extracting ICC profile: {e}")
-        
-        return result
-        
+        with _parsed(image) as parsed:
+            img = parsed.image
+            if img is None:
+                return None
+            image_path = parsed.path
+            exif_data = img._getexif() or {}
+            
+            result = {
+                'filename': Path(image_path).name,
+                'format': img.format,
+                'width': img.width,
+                'height': img.height,
+                'file_size_bytes': parsed.file_size,
+            }
+            
+            result['file_size_mb'] = round(result['file_size_bytes'] / (1024 * 1024), 2) if result['file_size_bytes'] is not None else None
+            
+            # Map common EXIF tags
+            exif_tag_map = {
+                271: 'Make',
+                272: 'Model',
+                282: 'XResolution',
+                283: 'YResolution',
+                305: 'Software',
+                306: 'DateTime',
+                315: 'Artist',
+                33432: 'Copyright',
+                36867: 'DateTimeOriginal',
+                36868: 'DateTimeDigitized',
+                37378: 'ApertureValue',
+                37383: 'MeteringMode',
+                37385: 'Flash',
+                37386: 'FocalLength',
+                40961: 'ColorSpace',
+                41495: 'SensingMethod',
+                41986: 'ExposureMode',
+                41987: 'WhiteBalance',
+                34855: 'ISOSpeedRatings',
+                33437: 'FNumber',
+                33434: 'ExposureTime',
+                42036: 'LensModel',
+            }
+            
+            exif_processed = {}
+            for tag_id, tag_name in exif_tag_map.items():
+                if tag_id in exif_data:
+                    value = exif_data[tag_id]
+                    # Convert to JSON-serializable format
+                    exif_processed[tag_name] = convert_exif_value(value)
+            
+            result['exif'] = exif_processed
+            
+            # Extract GPS data
+            result['gps'] = extract_gps_from_exif(exif_data)
+            
+            # Extract ICC color profile name
+            result['color_profile'] = None
+            if 'icc_profile' in img.info:
+                try:
+                    from PIL import ImageCms
+                    icc_profile = io.BytesIO(img.info['icc_profile'])
+                    profile = ImageCms.ImageCmsProfile(icc_profile)
+                    result['color_profile'] = ImageCms.getProfileDescription(profile)
+                except Exception as e:
+                    logger.warning('Error extracting ICC profile: %s', e)
+            
+            return result
+            
     except Exception as e:
-        print(f"Error extracting EXIF data: {e}")
+        logger.warning('Error extracting EXIF data: %s', e)
+        stage_failed(e)
         return None
 
 
@@ -850,6 +1278,17 @@ def format_provenance_for_web(c2pa_data):
     return provenance
 
 
+def format_gps_for_web(exif_data) -> dict:
+    """Decimal GPS coordinates as strings, or {} if the image has none."""
+    gps_data = exif_data.get('gps', {}) if exif_data else {}
+    if 'latitude_decimal' in gps_data and 'longitude_decimal' in gps_data:
+        return {
+            'latitude': str(gps_data['latitude_decimal']),
+            'longitude': str(gps_data['longitude_decimal'])
+        }
+    return {}
+
+
 def format_photography_metadata(exif_data):
     """Format EXIF data for photography metadata section."""
     if not exif_data:
@@ -943,106 +1382,258 @@ def format_photography_metadata(exif_data):
     }
 
 
-def extract_thumbnails_from_image(image_path: str):
-    """Extract C2PA thumbnails from image using proper c2pa API."""
+@STAGE_SECONDS.time(stage='thumbnails')
+def extract_thumbnails_from_image(image):
+    """Extract C2PA thumbnails from image (path or ParsedImage) using proper c2pa API.
+    
+    Returns {'claim_thumbnail': {'format': media_type, 'data': bytes}, ...};
+    see thumbnails_for_response for how they are sent to clients.
+    """
     try:
-        reader = c2pa.Reader(image_path)
-        manifest_json = reader.json()
-        
-        if not manifest_json:
-            return {}
-        
-        data = json.loads(manifest_json)
-        active_label = data.get('active_manifest')
-        
-        if not active_label or active_label not in data.get('manifests', {}):
-            return {}
-        
-        manifest = data['manifests'][active_label]
-        thumbnails = {}
-        
-        # Extract claim thumbnail (main manifest thumbnail)
-        if 'thumbnail' in manifest and isinstance(manifest['thumbnail'], dict):
-            if 'identifier' in manifest['thumbnail']:
-                try:
-                    output_stream = io.BytesIO()
-                    reader.resource_to_stream(manifest['thumbnail']['identifier'], output_stream)
-                    output_stream.seek(0)
-                    thumb_data = output_stream.read()
-                    thumbnails['claim_thumbnail'] = base64.b64encode(thumb_data).decode('utf-8')
-                except Exception as e:
-                    print(f"Error extracting claim thumbnail: {e}")
-        
-        # Extract ingredient thumbnail (original source image thumbnail)
-        if 'ingredients' in manifest and len(manifest['ingredients']) > 0:
-            ingredient = manifest['ingredients'][0]
-            if 'thumbnail' in ingredient and isinstance(ingredient['thumbnail'], dict):
-                if 'identifier' in ingredient['thumbnail']:
+        with _parsed(image) as parsed:
+            manifest = parsed.active_manifest
+            if manifest is None:
+                return {}
+            thumbnails = {}
+            
+            # Extract claim thumbnail (main manifest thumbnail)
+            if 'thumbnail' in manifest and isinstance(manifest['thumbnail'], dict):
+                if 'identifier' in manifest['thumbnail']:
                     try:
-                        output_stream = io.BytesIO()
-                        reader.resource_to_stream(ingredient['thumbnail']['identifier'], output_stream)
-                        output_stream.seek(0)
-                        thumb_data = output_stream.read()
-                        thumbnails['ingredient_thumbnail'] = base64.b64encode(thumb_data).decode('utf-8')
+                        thumb_data = parsed.resource(manifest['thumbnail']['identifier'])
+                        thumbnails['claim_thumbnail'] = {
+                            'format': manifest['thumbnail'].get('format') or 'image/jpeg',
+                            'data': thumb_data,
+                        }
                     except Exception as e:
-                        print(f"Error extracting ingredient thumbnail: {e}")
-        
-        return thumbnails
+                        logger.warning('Error extracting claim thumbnail: %s', e)
+                        stage_failed(e)
+            
+            # Extract ingredient thumbnail (original source image thumbnail)
+            if 'ingredients' in manifest and len(manifest['ingredients']) > 0:
+                ingredient = manifest['ingredients'][0]
+                if 'thumbnail' in ingredient and isinstance(ingredient['thumbnail'], dict):
+                    if 'identifier' in ingredient['thumbnail']:
+                        try:
+                            thumb_data = parsed.resource(ingredient['thumbnail']['identifier'])
+                            thumbnails['ingredient_thumbnail'] = {
+                                'format': ingredient['thumbnail'].get('format') or 'image/jpeg',
+                                'data': thumb_data,
+                            }
+                        except Exception as e:
+                            logger.warning('Error extracting ingredient thumbnail: %s', e)
+                            stage_failed(e)
+            
+            return thumbnails
         
+    except HTTPException:
+        raise
+    except ManifestUnreadable as e:
+        stage_failed(e)
+        return {}
+    except Exception as e:
+        logger.exception('Error extracting thumbnails: %s', e)
+        stage_failed(e)
+        return {}
+
+
+@STAGE_SECONDS.time(stage='provenance')
+def extract_provenance_graph(image):
+    """The provenance DAG of every manifest in the image's store (see provenance.py).
+    
+    Built config.PROVENANCE_MAX_DEPTH links deep; requests for less are
+    served from it with provenance.limit_depth.
+    """
+    try:
+        with _parsed(image) as parsed:
+            return provenance.build_graph(parsed.manifest_store, config.PROVENANCE_MAX_DEPTH)
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"Error extracting thumbnails: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.warning('Error building provenance graph: %s', e)
+        stage_failed(e)
+        return None
+
+
+def untrusted_image_headers(media_type: str) -> tuple:
+    """(media type, headers) to serve image bytes whose type isn't ours to trust.
+    
+    Thumbnail formats are whatever the manifest's signer declared and uploads
+    are whatever the client sent, so only IMAGE_MEDIA_TYPES are served as
+    such (inline); anything else goes out as an application/octet-stream
+    attachment. Browsers are told not to sniff the type or run anything in it.
+    """
+    headers = {
+        'X-Content-Type-Options': 'nosniff',
+        'Content-Security-Policy': "default-src 'none'",
+    }
+    if media_type in IMAGE_MEDIA_TYPES.values():
+        headers['Content-Disposition'] = 'inline'
+        return media_type, headers
+    headers['Content-Disposition'] = 'attachment'
+    return 'application/octet-stream', headers
+
+
+def thumbnail_url(content_hash: str, kind: str, uri: Optional[str] = None) -> str:
+    """Path of a thumbnail served by /api/thumbnail (kind is 'claim' or 'ingredient').
+    
+    With the URI of the image, the thumbnail can be extracted from it again
+    after it has left the result cache.
+    """
+    url = f"{app.root_path}/api/thumbnail/{content_hash}/{kind}"
+    return f"{url}?{urlencode({'uri': uri})}" if uri else url
+
+
+def thumbnails_for_response(thumbnails: dict, content_hash: Optional[str], inline: bool = False,
+                            uri: Optional[str] = None) -> dict:
+    """The 'thumbnails' field of a response for extract_thumbnails_from_image output.
+    
+    Each thumbnail is a URL to /api/thumbnail (see thumbnail_url), which
+    browsers and CDNs can cache on its own, or with inline (or when the image
+    has no content hash) its base64-encoded bytes, as earlier versions of the
+    API returned.
+    """
+    if not thumbnails:
         return {}
+    if inline or not content_hash:
+        return {key: base64.b64encode(thumbnail['data']).decode('utf-8')
+                for key, thumbnail in thumbnails.items()}
+    return {key: thumbnail_url(content_hash, key.removesuffix('_thumbnail'), uri)
+            for key in thumbnails}
+
+
+def api_etag(endpoint: str, content_hash: Optional[str]) -> Optional[str]:
+    """Strong ETag for an endpoint's result for the given image bytes.
+    
+    Results are a pure function of the URI (which is part of the URL the ETag
+    belongs to), the image bytes and the extraction code, so the ETag only
+    changes when the image or EXTRACTION_VERSION does.
+    """
+    if not content_hash:
+        return None
+    digest = hashlib.sha256(f"{endpoint}:{content_hash}:{EXTRACTION_VERSION}".encode())
+    return f'"{digest.hexdigest()[:32]}"'
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header names etag (weak comparison, as RFC 9110 asks)."""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(',')]
+    return '*' in candidates or any(tag.removeprefix('W/') == etag for tag in candidates)
+
+
+def api_cache_headers(etag: Optional[str], timings: Optional[dict] = None) -> dict:
+    """ETag, Cache-Control and Server-Timing headers for an API result.
+    
+    Results without an ETag (e.g. an 'Unverified' answer caused by an error)
+    are marked no-cache.
+    """
+    if etag:
+        headers = {
+            'ETag': etag,
+            'Cache-Control': (f"public, max-age={config.API_CACHE_MAX_AGE}, "
+                              f"stale-while-revalidate={config.API_CACHE_STALE_WHILE_REVALIDATE}"),
+        }
+    else:
+        headers = {'Cache-Control': 'no-cache'}
+    if server_timing(timings):
+        headers['Server-Timing'] = server_timing(timings)
+    return headers
+
+
+def cacheable_response(request: Optional[Request], response: Optional[Response],
+                       result, etag: Optional[str], timings: Optional[dict] = None):
+    """Add api_cache_headers to an API result.
+    
+    Returns an empty 304 response instead of result when the client's
+    If-None-Match already names etag. request and response are None when a
+    handler is called directly rather than by FastAPI.
+    """
+    headers = api_cache_headers(etag, timings)
+    if etag and request is not None and _etag_matches(request.headers.get('If-None-Match'), etag):
+        return Response(status_code=304, headers=headers)
+    if response is not None:
+        response.headers.update(headers)
+    return result
+
+
+def conditional_request(request: Optional[Request], endpoint: str) -> Optional[tuple]:
+    """(endpoint, If-None-Match) of a conditional request, for raise_if_not_modified."""
+    if_none_match = request.headers.get('If-None-Match') if request is not None else None
+    return (endpoint, if_none_match) if if_none_match else None
+
+
+def raise_if_not_modified(conditional: Optional[tuple], content_hash: Optional[str]):
+    """Answer a conditional request with 304 once the image's hash is known.
+    
+    An endpoint's ETag depends only on the image bytes (see api_etag), so a
+    client whose If-None-Match names it is answered before any stage runs,
+    even when the result cache no longer holds the image's results.
+    """
+    if conditional is None:
+        return
+    endpoint, if_none_match = conditional
+    etag = api_etag(endpoint, content_hash)
+    if etag and _etag_matches(if_none_match, etag):
+        raise HTTPException(status_code=304, headers=api_cache_headers(etag))
 
 
 @app.get("/api/exif_metadata")
-async def get_exif_metadata(uri: str = Query(..., description="Image file path or URL")):
+async def get_exif_metadata(uri: str = Query(..., description="Image file path or URL"),
+                            request: Request = None, response: Response = None):
     """Get EXIF, IPTC, and GPS metadata for an image (no C2PA/provenance data)."""
+    conditional = conditional_request(request, 'exif_metadata')
+    results, content_hash, timings = await inflight.do(
+        ('exif_metadata', uri, conditional), lambda: _exif_metadata_response(uri, conditional))
+    with timed_format():
+        # Use original filename from URI for display
+        display_name = Path(uri).name
+        # Note: We don't include base64 image data here because:
+        # 1. The client already has the image URI and can display it directly
+        # 2. Base64 encoding bloats the response by 10-100x (MB vs KB for metadata)
+        # 3. This endpoint is for lightweight metadata extraction only
+        # The /api/upload endpoint includes image_data since uploaded files have no URI
+        result = {display_name: exif_metadata_entry(display_name, results['exif'], results['iptc'])}
+    return cacheable_response(request, response, result, api_etag('exif_metadata', content_hash), timings)
+
+
+def exif_metadata_entry(display_name: str, exif_data: Optional[dict], iptc_data) -> dict:
+    """An image's entry in /api/exif_metadata and /api/upload responses."""
+    return {
+        'filename': display_name,
+        'format': exif_data.get('format', 'JPEG') if exif_data else 'JPEG',
+        'width': exif_data.get('width') if exif_data else None,
+        'height': exif_data.get('height') if exif_data else None,
+        'file_size_bytes': exif_data.get('file_size_bytes') if exif_data else None,
+        'file_size_mb': exif_data.get('file_size_mb') if exif_data else None,
+        # Format for web viewer
+        'photography': format_photography_metadata(exif_data),
+        'exif': exif_data.get('exif', {}) if exif_data else {},
+        'gps': format_gps_for_web(exif_data),
+        'iptc': iptc_data,
+    }
+
+
+async def _exif_metadata_response(uri: str, conditional: Optional[tuple] = None):
+    """Download the image and run the /api/exif_metadata stages.
+    
+    Returns (stage results, content_hash, stage timings).
+    """
     try:
-        with ImagePathContext(uri) as image_path:
+        # EXIF, IPTC and ICC data all live in the header segments, so large
+        # remote images needn't be downloaded (or local ones hashed) in full
+        source = ImagePathContext(uri, header_only=bool(config.HEADER_ONLY_FETCH),
+                                  stages=('exif', 'iptc'))
+        async with source as image_path, ParsedImage(image_path, source.content_hash, source.file_size) as image:
+            raise_if_not_modified(conditional, source.content_hash)
             # Extract only EXIF/IPTC metadata (no C2PA - that's expensive)
-            exif_data = extract_exif_metadata(image_path)
-            iptc_data = extract_iptc_data(image_path)
-            
-            # Format for web viewer
-            photography = format_photography_metadata(exif_data)
-            
-            # Use original filename from URI for display
-            display_name = Path(uri).name
-            
-            # Get GPS data and format it
-            gps_data = exif_data.get('gps', {}) if exif_data else {}
-            formatted_gps = {}
-            
-            if 'latitude_decimal' in gps_data and 'longitude_decimal' in gps_data:
-                formatted_gps = {
-                    'latitude': str(gps_data['latitude_decimal']),
-                    'longitude': str(gps_data['longitude_decimal'])
-                }
-            
-            # Note: We don't include base64 image data here because:
-            # 1. The client already has the image URI and can display it directly
-            # 2. Base64 encoding bloats the response by 10-100x (MB vs KB for metadata)
-            # 3. This endpoint is for lightweight metadata extraction only
-            # The /api/upload endpoint includes image_data since uploaded files have no URI
-                
-            response = {
-                display_name: {
-                    'filename': display_name,
-                    'format': exif_data.get('format', 'JPEG') if exif_data else 'JPEG',
-                    'width': exif_data.get('width') if exif_data else None,
-                    'height': exif_data.get('height') if exif_data else None,
-                    'file_size_bytes': exif_data.get('file_size_bytes') if exif_data else None,
-                    'file_size_mb': exif_data.get('file_size_mb') if exif_data else None,
-                    'photography': photography,
-                    'exif': exif_data.get('exif', {}) if exif_data else {},
-                    'gps': formatted_gps,
-                    'iptc': iptc_data,
-                }
-            }
-            
-            return response
+            timings = {}
+            results = await run_stages(image, {
+                'exif': extract_exif_metadata,
+                'iptc': extract_iptc_data,
+            }, timings)
+            return results, response_hash(image), timings
         
     except HTTPException:
         raise
@@ -1051,26 +1642,93 @@ async def get_exif_metadata(uri: str = Query(..., description="Image file path o
 
 
 @app.get("/api/c2pa_metadata")
-async def get_c2pa_metadata(uri: str = Query(..., description="Image file path or URL")):
-    """Get C2PA metadata, provenance information, and embedded thumbnails."""
-    try:
-        with ImagePathContext(uri) as image_path:
-            c2pa_data = extract_c2pa_data(image_path)
-            provenance = format_provenance_for_web(c2pa_data) if c2pa_data else []
-            
-            # Extract C2PA thumbnails (claim_thumbnail and ingredient_thumbnail)
-            thumbnails = extract_thumbnails_from_image(image_path)
-            
+async def get_c2pa_metadata(uri: str = Query(..., description="Image file path or URL"),
+                            inline_thumbnails: bool = False,
+                            request: Request = None, response: Response = None):
+    """Get C2PA metadata, provenance information, and embedded thumbnails.
+    
+    Thumbnails are returned as /api/thumbnail URLs, or as base64 strings with
+    inline_thumbnails=true.
+    """
+    endpoint = 'c2pa_metadata:inline' if inline_thumbnails else 'c2pa_metadata'
+    conditional = conditional_request(request, endpoint)
+    results, content_hash, timings = await inflight.do(
+        ('c2pa_metadata', uri, conditional), lambda: _c2pa_metadata_response(uri, conditional))
+    with timed_format():
+        c2pa_data = results['c2pa']
+        result = {
+            'provenance': format_provenance_for_web(c2pa_data) if c2pa_data else [],
+            'c2pa_data': c2pa_data,
+            'author_info': c2pa_data.get('author_info') if c2pa_data else None,
+            'thumbnails': thumbnails_for_response(results['thumbnails'], content_hash, inline_thumbnails, uri),
             # Extract digital_source_type for easy frontend access
-            digital_source_type = c2pa_data.get('digital_source_type') if c2pa_data else None
-            
-            return {
-                'provenance': provenance,
-                'c2pa_data': c2pa_data,
-                'author_info': c2pa_data.get('author_info') if c2pa_data else None,
-                'thumbnails': thumbnails,
-                'digital_source_type': digital_source_type
-            }
+            'digital_source_type': c2pa_data.get('digital_source_type') if c2pa_data else None,
+        }
+    return cacheable_response(request, response, result, api_etag(endpoint, content_hash), timings)
+
+
+@app.get("/api/thumbnail/{content_hash}/{kind}")
+async def get_thumbnail(content_hash: str, kind: str, uri: Optional[str] = None, request: Request = None):
+    """Serve a C2PA thumbnail ('claim' or 'ingredient') of an image as raw bytes.
+    
+    URLs come from the 'thumbnails' of /api/metadata, /api/c2pa_metadata and
+    /api/upload responses. They are content-addressed, so they are cached as
+    immutable. A thumbnail that has left the result cache is extracted again
+    (see _reextract_thumbnails), so the URLs outlive it.
+    """
+    if kind not in ('claim', 'ingredient'):
+        raise HTTPException(status_code=404, detail="Thumbnail not found")
+    etag = api_etag(f'thumbnail:{kind}', content_hash)
+    headers = {'ETag': etag, 'Cache-Control': 'public, max-age=31536000, immutable'}
+    if request is not None and _etag_matches(request.headers.get('If-None-Match'), etag):
+        return Response(status_code=304, headers=headers)
+    
+    thumbnails = content_cache.get(content_hash, 'thumbnails')
+    if thumbnails is MISSING:
+        thumbnails = await inflight.do(('thumbnails', content_hash, uri),
+                                       lambda: _reextract_thumbnails(content_hash, uri))
+    thumbnail = thumbnails.get(f'{kind}_thumbnail') if thumbnails else None
+    if thumbnail is None:
+        raise HTTPException(status_code=404, detail="Thumbnail not found")
+    media_type, safety_headers = untrusted_image_headers(thumbnail['format'])
+    return Response(content=thumbnail['data'], media_type=media_type, headers={**headers, **safety_headers})
+
+
+async def _reextract_thumbnails(content_hash: str, uri: Optional[str]) -> Optional[dict]:
+    """Extract the thumbnails of the image with content_hash again.
+    
+    From its upload while upload_store still holds it, or else from uri if
+    that still has the same bytes. None when neither has the image.
+    """
+    path = upload_store.get(content_hash)
+    if path is not None:
+        with ParsedImage(str(path), content_hash) as image:
+            return await run_stage('thumbnails', extract_thumbnails_from_image, image)
+    if uri:
+        source = ImagePathContext(uri, stages=('thumbnails',))
+        async with source as image_path, ParsedImage(image_path, source.content_hash) as image:
+            if source.content_hash == content_hash:
+                return await run_stage('thumbnails', extract_thumbnails_from_image, image)
+    return None
+
+
+async def _c2pa_metadata_response(uri: str, conditional: Optional[tuple] = None):
+    """Download the image and run the /api/c2pa_metadata stages.
+    
+    Returns (stage results, content_hash, stage timings).
+    """
+    try:
+        source = ImagePathContext(uri, stages=('c2pa', 'thumbnails'))
+        async with source as image_path, ParsedImage(image_path, source.content_hash) as image:
+            raise_if_not_modified(conditional, source.content_hash)
+            # Manifest data and C2PA thumbnails (claim_thumbnail and
+            # ingredient_thumbnail) are extracted side by side
+            timings = {}
+            results = await run_stages(image, {
+                'c2pa': extract_c2pa_data,
+                'thumbnails': extract_thumbnails_from_image,
+            }, timings)
+            return results, response_hash(image), timings
         
     except HTTPException:
         raise
@@ -1078,9 +1736,273 @@ async def get_c2pa_metadata(uri: str = Query(..., description="Image file path o
         raise HTTPException(status_code=500, detail=str(e))
 
 
-# Cache for mini API responses (5 minute TTL)
-_mini_cache = {}
-_CACHE_TTL = 300  # 5 minutes in seconds
+@app.get("/api/provenance_graph")
+async def get_provenance_graph(uri: str = Query(..., description="Image file path or URL"),
+                               max_depth: Optional[int] = Query(
+                                   None, ge=0, le=config.PROVENANCE_MAX_DEPTH,
+                                   description="Most ingredient links to follow from the active manifest"),
+                               request: Request = None, response: Response = None):
+    """Get the full edit history of an image as a DAG of its C2PA manifests.
+    
+    Starting at the active manifest, every ingredient with credentials of
+    its own is followed to its manifest, up to max_depth links (default and
+    at most config.PROVENANCE_MAX_DEPTH). Each node has its actions, signer
+    and thumbnail resource; each edge is an ingredient. The graph is null for
+    images without credentials.
+    """
+    max_depth = config.PROVENANCE_MAX_DEPTH if max_depth is None else max_depth
+    conditional = conditional_request(request, f'provenance_graph:{max_depth}')
+    graph, content_hash, timings = await inflight.do(
+        ('provenance_graph', uri, conditional), lambda: _provenance_graph_response(uri, conditional))
+    with timed_format():
+        result = {'graph': provenance.limit_depth(graph, max_depth)}
+    return cacheable_response(request, response, result, api_etag(f'provenance_graph:{max_depth}', content_hash),
+                              timings)
+
+
+async def _provenance_graph_response(uri: str, conditional: Optional[tuple] = None):
+    """Download the image and build its provenance graph, to the full depth.
+    
+    Returns (graph, content_hash, stage timings).
+    """
+    try:
+        source = ImagePathContext(uri, stages=('provenance',))
+        async with source as image_path, ParsedImage(image_path, source.content_hash) as image:
+            raise_if_not_modified(conditional, source.content_hash)
+            timings = {}
+            results = await run_stages(image, {'provenance': extract_provenance_graph}, timings)
+            return results['provenance'], response_hash(image), timings
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# Fields /api/metadata can return, and the extraction stage each comes from
+METADATA_FIELDS = ('exif', 'iptc', 'gps', 'c2pa', 'provenance', 'thumbnails', 'photography')
+_FIELD_STAGES = {
+    'exif': 'exif',
+    'gps': 'exif',
+    'photography': 'exif',
+    'iptc': 'iptc',
+    'c2pa': 'c2pa',
+    'provenance': 'c2pa',
+    'thumbnails': 'thumbnails',
+}
+
+
+def parse_metadata_fields(fields: Optional[str]) -> tuple:
+    """The METADATA_FIELDS named in a comma-separated fields= value (all if empty)."""
+    requested = {field.strip().lower() for field in (fields or '').split(',') if field.strip()}
+    if not requested:
+        return METADATA_FIELDS
+    unknown = requested - set(METADATA_FIELDS)
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown fields: {', '.join(sorted(unknown))} (valid: {', '.join(METADATA_FIELDS)})",
+        )
+    return tuple(field for field in METADATA_FIELDS if field in requested)
+
+
+def _metadata_extractors(fields: tuple) -> dict:
+    """Extractors for the stages needed to compute fields, by stage name."""
+    extractors = {
+        'c2pa': extract_c2pa_data,
+        'exif': extract_exif_metadata,
+        'iptc': extract_iptc_data,
+        'thumbnails': extract_thumbnails_from_image,
+    }
+    stages = {_FIELD_STAGES[field] for field in fields}
+    return {stage: extractor for stage, extractor in extractors.items() if stage in stages}
+
+
+def metadata_sections(stage: str, data, fields: tuple, content_hash: str,
+                      inline_thumbnails: bool = False, uri: Optional[str] = None) -> dict:
+    """The /api/metadata response keys computed from one stage's result."""
+    sections = {}
+    if stage == 'exif':
+        exif_data = data or {}
+        sections.update({
+            'format': exif_data.get('format', 'JPEG'),
+            'width': exif_data.get('width'),
+            'height': exif_data.get('height'),
+            'file_size_bytes': exif_data.get('file_size_bytes'),
+            'file_size_mb': exif_data.get('file_size_mb'),
+        })
+        if 'photography' in fields:
+            sections['photography'] = format_photography_metadata(data)
+        if 'exif' in fields:
+            sections['exif'] = exif_data.get('exif', {})
+        if 'gps' in fields:
+            sections['gps'] = format_gps_for_web(data)
+    elif stage == 'iptc':
+        sections['iptc'] = data
+    elif stage == 'c2pa':
+        if 'c2pa' in fields:
+            sections['c2pa_data'] = data
+        if 'provenance' in fields:
+            sections['provenance'] = format_provenance_for_web(data) if data else []
+        sections['author_info'] = data.get('author_info') if data else None
+        sections['digital_source_type'] = data.get('digital_source_type') if data else None
+    elif stage == 'thumbnails':
+        sections['thumbnails'] = thumbnails_for_response(data, content_hash, inline_thumbnails, uri)
+    return sections
+
+
+def _metadata_source(uri: str, extractors: dict) -> ImagePathContext:
+    # EXIF and IPTC only need the header segments; C2PA verification and
+    # thumbnails need the whole image
+    header_only = bool(config.HEADER_ONLY_FETCH) and set(extractors) <= {'exif', 'iptc'}
+    return ImagePathContext(uri, header_only=header_only, stages=tuple(extractors))
+
+
+@app.get("/api/metadata")
+async def get_metadata(uri: str = Query(..., description="Image file path or URL"),
+                       fields: Optional[str] = None, inline_thumbnails: bool = False,
+                       stream: bool = False, request: Request = None, response: Response = None):
+    """Get any combination of EXIF, IPTC, GPS, C2PA and thumbnail data in one request.
+    
+    fields is a comma-separated selection of METADATA_FIELDS (default: all).
+    The image is downloaded once and only the stages the fields need are run,
+    concurrently. With stream=true the result is sent as NDJSON, one partial
+    object per stage as it completes; merging the lines gives the full result.
+    """
+    selected = parse_metadata_fields(fields)
+    variant = ','.join(selected) + (':inline' if inline_thumbnails else '')
+    if stream:
+        return await _stream_metadata(uri, selected, inline_thumbnails)
+    
+    conditional = conditional_request(request, f'metadata:{variant}')
+    results, content_hash, timings = await inflight.do(
+        ('metadata', uri, variant, conditional),
+        lambda: _metadata_response(uri, selected, conditional))
+    with timed_format():
+        result = {'filename': Path(uri).name}
+        for stage, data in results.items():
+            result.update(metadata_sections(stage, data, selected, content_hash, inline_thumbnails, uri))
+    return cacheable_response(request, response, result, api_etag(f'metadata:{variant}', content_hash), timings)
+
+
+async def _metadata_response(uri: str, fields: tuple, conditional: Optional[tuple] = None):
+    """Download the image and run the stages the /api/metadata fields need.
+    
+    Returns (stage results, content_hash, stage timings).
+    """
+    try:
+        extractors = _metadata_extractors(fields)
+        source = _metadata_source(uri, extractors)
+        async with source as image_path, ParsedImage(image_path, source.content_hash, source.file_size) as image:
+            raise_if_not_modified(conditional, source.content_hash)
+            timings = {}
+            results = await run_stages(image, extractors, timings)
+            return results, response_hash(image), timings
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+async def _stream_metadata(uri: str, fields: tuple, inline_thumbnails: bool):
+    """Download the image, then stream /api/metadata sections as stages complete.
+    
+    Download errors are still reported with an HTTP status. A stage that fails
+    after streaming has begun is reported with a {"section": stage, "error": ...}
+    line (after its stand-in sections, if it produced any), and the other
+    stages carry on. Whether every stage succeeds is only known once the
+    status and headers are sent, so streamed responses are never cached.
+    
+    The downloaded image is released once the response ends, however it ends:
+    the body may never be iterated if the client goes away first.
+    """
+    extractors = _metadata_extractors(fields)
+    source = _metadata_source(uri, extractors)
+    image_path = await source.__aenter__()
+    try:
+        image = ParsedImage(image_path, source.content_hash, source.file_size)
+    except BaseException:
+        source.__exit__(None, None, None)
+        raise
+    pending = set()
+    released = False
+    
+    async def release():
+        nonlocal released
+        # Stages already running keep the image open until they finish
+        # (their results are cached for the next request)
+        if pending:
+            await asyncio.wait(pending)
+        if not released:
+            released = True
+            image.close()
+            source.__exit__(None, None, None)
+    
+    def line(part: dict) -> str:
+        return json.dumps(jsonable_encoder(part)) + '\n'
+    
+    async def sections():
+        nonlocal pending
+        tasks = {asyncio.ensure_future(run_stage(stage, extractor, image)): stage
+                 for stage, extractor in extractors.items()}
+        for task in tasks:
+            # Retrieve errors of stages that end after the client went away
+            task.add_done_callback(lambda task: task.cancelled() or task.exception())
+        pending = set(tasks)
+        try:
+            yield line({'filename': Path(uri).name})
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    stage = tasks[task]
+                    try:
+                        data = task.result()
+                    except HTTPException as e:
+                        yield line({'section': stage, 'error': e.detail})
+                        continue
+                    except Exception as e:
+                        yield line({'section': stage, 'error': str(e)})
+                        continue
+                    content_hash = None if stage in image.failed_stages else source.content_hash
+                    yield line(metadata_sections(stage, data, fields, content_hash, inline_thumbnails, uri))
+                    if stage in image.failed_stages:
+                        yield line({'section': stage, 'error': image.failed_stages[stage]})
+        finally:
+            await release()
+    
+    return ReleasingStreamingResponse(sections(), release, media_type='application/x-ndjson',
+                                      headers={'Cache-Control': 'no-store'})
+
+
+class ReleasingStreamingResponse(StreamingResponse):
+    """A StreamingResponse that awaits release() once it has been sent or abandoned.
+    
+    Unlike a BackgroundTask, release also runs when sending fails part-way
+    (the client disconnected), including before the body iterator has started.
+    """
+    def __init__(self, content, release, **kwargs):
+        super().__init__(content, **kwargs)
+        self.release = release
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await self.release()
+
+
+# Cache for mini API responses (5 minute TTL), bounded by entry count and size
+_CACHE_TTL = config.MINI_CACHE_TTL
+_mini_cache = TieredCache(
+    LRUCache(
+        max_entries=_worker_share(config.MINI_CACHE_MAX_ENTRIES),
+        max_bytes=_worker_share(config.MINI_CACHE_MAX_BYTES),
+        ttl=_CACHE_TTL,
+    ),
+    disk_cache,
+    namespace=f'mini:v{EXTRACTION_VERSION}',
+)
 
 
 def _get_cache_key(uri: str) -> str:
@@ -1089,28 +2011,84 @@ def _get_cache_key(uri: str) -> str:
 
 
 def _get_cached_mini_response(uri: str):
-    """Get cached response if available and not expired."""
-    cache_key = _get_cache_key(uri)
-    if cache_key in _mini_cache:
-        cached_data, timestamp = _mini_cache[cache_key]
-        if time.time() - timestamp < _CACHE_TTL:
-            print(f"Cache hit for {uri}")
-            return cached_data
-        else:
-            # Expired cache entry
-            del _mini_cache[cache_key]
-    return None
+    """Get the cached (response, content_hash) if available and not expired."""
+    cached_data = _mini_cache.get(_get_cache_key(uri), None)
+    if cached_data is not None:
+        logger.debug('Mini cache hit', extra={'uri': uri})
+    return cached_data
+
+
+def _set_cached_mini_response(uri: str, response: dict, content_hash: str):
+    """Cache a mini API response, with the hash of the image it describes."""
+    _mini_cache.set(_get_cache_key(uri), (response, content_hash))
+    logger.debug('Cached mini response', extra={'uri': uri})
+
+
+def _unverified_mini_response(uri: str) -> dict:
+    """Mini response for images without (readable) C2PA credentials."""
+    return {
+        'creator': None,
+        'issued_by': None,
+        'issued_on': None,
+        'status': 'Unverified',
+        'digital_source_type': None,
+        'more': f'https://apps.thecontrarian.in/c2pa/?uri={uri}'
+    }
+
+
+def build_mini_response(uri: str, c2pa_data: Optional[dict]) -> dict:
+    """Build the /api/c2pa_mini response from extract_c2pa_minimal output."""
+    if not c2pa_data:
+        return _unverified_mini_response(uri)
+    
+    # Extract creator from author_info
+    author_info = c2pa_data.get('author_info', {})
+    creator = None
+    if 'author' in author_info:
+        authors = author_info['author']
+        if isinstance(authors, list) and len(authors) > 0:
+            creator = authors[0].get('name')
+        elif isinstance(authors, dict):
+            creator = authors.get('name')
+    
+    # Extract signature info
+    sig_info = c2pa_data.get('signature_info', {})
+    issued_by = sig_info.get('issuer')
+    issued_on = format_datetime_full(sig_info.get('time'), include_timezone=True) if sig_info.get('time') else None
+    
+    # Determine verification status
+    status = 'Authenticity Verified' if c2pa_data else 'Unverified'
+    
+    # Get digital source type
+    digital_source = c2pa_data.get('digital_source_type', {})
+    
+    return {
+        'creator': creator,
+        'issued_by': issued_by,
+        'issued_on': issued_on,
+        'status': status,
+        'digital_source_type': digital_source.get('label') if digital_source else None,
+        'more': f'https://apps.thecontrarian.in/c2pa/?uri={uri}'
+    }
 
 
-def _set_cached_mini_response(uri: str, response: dict):
-    """Cache a mini API response."""
-    cache_key = _get_cache_key(uri)
-    _mini_cache[cache_key] = (response, time.time())
-    print(f"Cached response for {uri}")
+async def resolve_c2pa_mini(uri: str, conditional: Optional[tuple] = None):
+    """Mini response for a URI: from cache, a concurrent request, or a fresh extraction.
+    
+    Returns (response, content_hash); content_hash is None for responses that
+    are not cached (errors). See raise_if_not_modified for conditional.
+    """
+    # Check cache first
+    cached = _get_cached_mini_response(uri)
+    if cached:
+        return cached
+    
+    return await inflight.do(('c2pa_mini', uri, conditional), lambda: _c2pa_mini_response(uri, conditional))
 
 
 @app.get("/api/c2pa_mini")
-async def get_c2pa_mini(uri: str = Query(..., description="Image file path or URL")):
+async def get_c2pa_mini(uri: str = Query(..., description="Image file path or URL"),
+                        request: Request = None, response: Response = None):
     """Get minimal C2PA credentials for quick trust verification (e.g., on hover).
     
     Returns a compact response with essential verification info:
@@ -1123,78 +2101,95 @@ async def get_c2pa_mini(uri: str = Query(..., description="Image file path or UR
     Optimizations:
     - Uses specialized minimal extraction (extracts only needed fields)
     - 5-minute response cache for repeated requests
-    - Configurable timeout for image downloads (15s for mini vs 30s for full)
+    - Concurrent requests for the same URI share one download and extraction
+    - Shorter download deadline (15s for mini vs 30s for full, see config.py)
+    - Remote JPEG/PNG images are fetched with HTTP Range requests only up to
+      the end of their header segments, where the manifest store lives
+    - ETag and Cache-Control headers let browsers and CDNs reuse results, and
+      If-None-Match is answered with 304
     """
-    # Check cache first
-    cached = _get_cached_mini_response(uri)
-    if cached:
-        return cached
+    result, content_hash = await resolve_c2pa_mini(uri, conditional_request(request, 'c2pa_mini'))
+    return cacheable_response(request, response, result, api_etag('c2pa_mini', content_hash))
+
+
+async def _c2pa_mini_response(uri: str, conditional: Optional[tuple] = None):
+    """Download the image and build (and cache) the /api/c2pa_mini response.
     
+    Returns (response, content_hash).
+    """
     try:
-        # Use shorter timeout for mini API (15s instead of 30s)
-        with ImagePathContext(uri, timeout=15) as image_path:
+        # Use shorter download deadline for mini API (15s instead of 30s), and
+        # fetch only the bytes up to the manifest store where the origin allows
+        source = ImagePathContext(uri, timeout=config.MINI_DOWNLOAD_DEADLINE,
+                                  header_only=bool(config.HEADER_ONLY_FETCH),
+                                  stages=('c2pa_minimal',))
+        async with source as image_path, ParsedImage(image_path, source.content_hash) as image:
+            raise_if_not_modified(conditional, source.content_hash)
             # Use optimized minimal extraction instead of full extraction
-            c2pa_data = extract_c2pa_minimal(image_path)
-            
-            if not c2pa_data:
-                response = {
-                    'creator': None,
-                    'issued_by': None,
-                    'issued_on': None,
-                    'status': 'Unverified',
-                    'digital_source_type': None,
-                    'more': f'https://apps.thecontrarian.in/c2pa/?uri={uri}'
-                }
-                _set_cached_mini_response(uri, response)
-                return response
-            
-            # Extract creator from author_info
-            author_info = c2pa_data.get('author_info', {})
-            creator = None
-            if 'author' in author_info:
-                authors = author_info['author']
-                if isinstance(authors, list) and len(authors) > 0:
-                    creator = authors[0].get('name')
-                elif isinstance(authors, dict):
-                    creator = authors.get('name')
-            
-            # Extract signature info
-            sig_info = c2pa_data.get('signature_info', {})
-            issued_by = sig_info.get('issuer')
-            issued_on = format_datetime_full(sig_info.get('time'), include_timezone=True) if sig_info.get('time') else None
-            
-            # Determine verification status
-            status = 'Authenticity Verified' if c2pa_data else 'Unverified'
-            
-            # Get digital source type
-            digital_source = c2pa_data.get('digital_source_type', {})
-            
-            response = {
-                'creator': creator,
-                'issued_by': issued_by,
-                'issued_on': issued_on,
-                'status': status,
-                'digital_source_type': digital_source.get('label') if digital_source else None,
-                'more': f'https://apps.thecontrarian.in/c2pa/?uri={uri}'
-            }
+            c2pa_data = await run_stage('c2pa_minimal', extract_c2pa_minimal, image)
+            # Cached responses are formatted once, here
+            with timed_format():
+                response = build_mini_response(uri, c2pa_data)
+            if image.failed_stages:
+                # Unverified because the manifest couldn't be read: don't cache
+                return response, None
             
             # Cache the response
-            _set_cached_mini_response(uri, response)
-            return response
+            _set_cached_mini_response(uri, response, source.content_hash)
+            return response, source.content_hash
         
     except HTTPException:
         raise
     except Exception as e:
         # Return unverified status on error (don't cache errors)
-        print(f"Error in c2pa_mini: {e}")
-        return {
-            'creator': None,
-            'issued_by': None,
-            'issued_on': None,
-            'status': 'Unverified',
-            'digital_source_type': None,
-            'more': f'https://apps.thecontrarian.in/c2pa/?uri={uri}'
-        }
+        logger.warning('Error in c2pa_mini: %s', e, extra={'uri': uri})
+        return _unverified_mini_response(uri), None
+
+
+@app.post("/api/c2pa_mini/batch")
+async def get_c2pa_mini_batch(uris: List[str] = Body(..., embed=True, description="Image file paths or URLs")):
+    """Get minimal C2PA credentials for many images at once (e.g., a gallery page).
+    
+    Images are fetched and verified concurrently, at most
+    C2PA_MINI_BATCH_CONCURRENCY at a time per batch, with cached results
+    answered immediately. Results are streamed back as NDJSON, one line per
+    image in completion order, each carrying its 'index' and 'uri' alongside
+    the usual /api/c2pa_mini fields (plus 'error' if that image failed).
+    """
+    if not uris:
+        raise HTTPException(status_code=400, detail="No URIs given")
+    if len(uris) > config.MINI_BATCH_MAX_URIS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch too large: {len(uris)} URIs, limit is {config.MINI_BATCH_MAX_URIS}",
+        )
+    
+    semaphore = asyncio.Semaphore(config.MINI_BATCH_CONCURRENCY)
+    
+    async def resolve(index: int, uri: str) -> dict:
+        try:
+            cached = _get_cached_mini_response(uri)
+            if not cached:
+                async with semaphore:
+                    cached = await resolve_c2pa_mini(uri)
+            response, _ = cached
+            item = dict(response)
+        except HTTPException as e:
+            item = _unverified_mini_response(uri)
+            item['error'] = e.detail
+        return {'index': index, 'uri': uri, **item}
+    
+    async def stream():
+        tasks = [asyncio.ensure_future(resolve(i, uri)) for i, uri in enumerate(uris)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield json.dumps(await next_done) + '\n'
+        finally:
+            # Client went away: stop work nobody will read
+            for task in tasks:
+                task.cancel()
+    
+    return StreamingResponse(stream(), media_type='application/x-ndjson')
 
 
 @app.get("/")
@@ -1231,85 +2226,250 @@ async def serve_logo():
     raise HTTPException(status_code=404, detail="Logo not found")
 
 
+def _image_data_url(path: str, exif_data: Optional[dict]) -> str:
+    """A base64 data URL of the image file at path."""
+    with open(path, 'rb') as f:
+        image_data = base64.b64encode(f.read()).decode('utf-8')
+    return f"data:image/{(exif_data or {}).get('format', 'jpeg').lower()};base64,{image_data}"
+
+
 @app.post("/api/upload")
-async def upload_image(file: UploadFile = File(...)):
-    """Upload an image file and return metadata."""
+async def upload_image(file: UploadFile = File(...), inline_thumbnails: bool = False,
+                       inline_image: bool = False, http_response: Response = None):
+    """Upload an image file and return metadata.
+    
+    The upload is streamed to disk (at most C2PA_UPLOAD_MAX_BYTES) and the
+    original is returned as 'image_url', a short-lived /api/original URL, or
+    with inline_image=true as a base64 data URL in 'image_data'. Thumbnails
+    are returned as /api/thumbnail URLs, or as base64 strings with
+    inline_thumbnails=true. Per-stage timings are sent in a Server-Timing
+    header.
+    """
+    temp_file_path = None
     try:
-        # Save uploaded file to temporary file
-        with tempfile.NamedTemporaryFile(delete=False, suffix=Path(file.filename).suffix) as temp_file:
-            temp_file.write(await file.read())
-            temp_file_path = temp_file.name
-        
-        # Extract metadata
-        c2pa_data = extract_c2pa_data(temp_file_path)
-        exif_data = extract_exif_metadata(temp_file_path)
-        iptc_data = extract_iptc_data(temp_file_path)
+        # Stream the upload to a temporary file, hashing it on the way
+        try:
+            temp_file_path, content_hash = await extraction_executor.run(
+                save_stream, file.file, safe_suffix(file.filename),
+                config.UPLOAD_MAX_BYTES, config.DOWNLOAD_CHUNK_SIZE)
+        except UploadTooLarge as e:
+            raise HTTPException(status_code=413, detail=str(e))
+        
+        # Extract metadata concurrently, sharing one parse of the manifest
+        # and container and reusing results for bytes we have already seen
+        image = ParsedImage(temp_file_path, content_hash)
+        timings = {}
+        try:
+            results = await run_stages(image, {
+                'c2pa': extract_c2pa_data,
+                'exif': extract_exif_metadata,
+                'iptc': extract_iptc_data,
+                'thumbnails': extract_thumbnails_from_image,
+            }, timings)
+        finally:
+            image.close()
+        c2pa_data, exif_data = results['c2pa'], results['exif']
+        iptc_data, thumbnails = results['iptc'], results['thumbnails']
+        logger.info('Upload processed', extra={'content_hash': content_hash, 'stage_ms': timings, 'sampled': True})
+        if http_response is not None:
+            http_response.headers['Server-Timing'] = server_timing(timings)
         
-        # Format for web viewer
-        photography = format_photography_metadata(exif_data)
+        # Create a data URL for the main image
+        image_data = _image_data_url(temp_file_path, exif_data) if inline_image else None
+        
+        # The store keeps the original for /api/original, and to extract its
+        # thumbnails again once they leave the result cache
+        stored = await extraction_executor.run(upload_store.add, temp_file_path, content_hash)
+        if stored:
+            # The store now owns the file
+            temp_file_path = None
+        elif not inline_image:
+            # Too large for the store: send the original back inline instead
+            image_data = _image_data_url(temp_file_path, exif_data)
         
         # Use original filename for display
         display_name = file.filename or 'unknown.jpg'
+        with timed_format():
+            entry = exif_metadata_entry(display_name, exif_data, iptc_data)
+            
+            # Include thumbnails (inline when the store can't keep the upload:
+            # their URLs couldn't be served for long)
+            entry['thumbnails'] = thumbnails_for_response(thumbnails, response_hash(image),
+                                                          inline_thumbnails or not stored)
+            
+            # Include C2PA provenance data
+            entry['provenance'] = format_provenance_for_web(c2pa_data) if c2pa_data else []
+            
+            # Include digital source type
+            entry['digital_source_type'] = c2pa_data.get('digital_source_type') if c2pa_data else None
+            
+            # Include author info
+            if c2pa_data:
+                entry['author_info'] = c2pa_data.get('author_info', {})
         
-        # Get GPS data and format it
-        gps_data = exif_data.get('gps', {}) if exif_data else {}
-        formatted_gps = {}
-        
-        if 'latitude_decimal' in gps_data and 'longitude_decimal' in gps_data:
-            formatted_gps = {
-                'latitude': str(gps_data['latitude_decimal']),
-                'longitude': str(gps_data['longitude_decimal'])
-            }
-        
-        response = {
-            display_name: {
-                'filename': display_name,
-                'format': exif_data.get('format', 'JPEG') if exif_data else 'JPEG',
-                'width': exif_data.get('width') if exif_data else None,
-                'height': exif_data.get('height') if exif_data else None,
-                'file_size_bytes': exif_data.get('file_size_bytes') if exif_data else None,
-                'file_size_mb': exif_data.get('file_size_mb') if exif_data else None,
-                'photography': photography,
-                'exif': exif_data.get('exif', {}) if exif_data else {},
-                'gps': formatted_gps,
-                'iptc': iptc_data,
-            }
-        }
-        
-        # Extract thumbnails
-        thumbnails = extract_thumbnails_from_image(temp_file_path)
-        response[display_name]['thumbnails'] = thumbnails
-        
-        # Include C2PA provenance data
-        provenance = format_provenance_for_web(c2pa_data) if c2pa_data else []
-        response[display_name]['provenance'] = provenance
-        
-        # Include digital source type
-        digital_source_type = c2pa_data.get('digital_source_type') if c2pa_data else None
-        response[display_name]['digital_source_type'] = digital_source_type
-        
-        # Include author info
-        if c2pa_data:
-            response[display_name]['author_info'] = c2pa_data.get('author_info', {})
-        
-        # Create a data URL for the main image
-        with open(temp_file_path, 'rb') as f:
-            image_data = base64.b64encode(f.read()).decode('utf-8')
-            response[display_name]['image_data'] = f"data:image/{exif_data.get('format', 'jpeg').lower()};base64,{image_data}"
-        
-        # Clean up temporary file
-        try:
-            Path(temp_file_path).unlink(missing_ok=True)
-        except Exception as e:
-            print(f"Error cleaning up temporary file: {e}")
+        if image_data:
+            entry['image_data'] = image_data
+        else:
+            entry['image_url'] = f"{app.root_path}/api/original/{content_hash}"
+        response = {display_name: entry}
         
         return response
         
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"Error processing uploaded image: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception('Error processing uploaded image: %s', e)
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        # Clean up temporary file
+        if temp_file_path:
+            try:
+                Path(temp_file_path).unlink(missing_ok=True)
+            except Exception as e:
+                logger.warning('Error cleaning up temporary file: %s', e)
+
+
+@app.get("/api/original/{content_hash}")
+async def get_original(content_hash: str):
+    """Serve an image uploaded through /api/upload within the last C2PA_UPLOAD_TTL seconds."""
+    path = upload_store.get(content_hash)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Upload not found or expired")
+    media_type, headers = untrusted_image_headers(upload_store.media_type(path))
+    return FileResponse(path, media_type=media_type,
+                        headers={'Cache-Control': f'private, max-age={config.UPLOAD_TTL}', **headers})
+
+
+def _route_path(scope) -> str:
+    """The path template of the route a request will be served by, for metric labels."""
+    for route in app.router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+    return 'unmatched'
+
+
+class MetricsMiddleware:
+    """Count, time and track every HTTP request by route.
+    
+    Plain ASGI rather than @app.middleware, so streamed responses are timed
+    to their last byte.
+    """
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+        endpoint = _route_path(scope)
+        status = 500
+        
+        async def send_with_status(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+        
+        started = time.perf_counter()
+        REQUESTS_IN_FLIGHT.inc(endpoint=endpoint)
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            REQUESTS_IN_FLIGHT.dec(endpoint=endpoint)
+            REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint=endpoint)
+            REQUESTS.inc(endpoint=endpoint, method=scope['method'], status=status)
+
+
+# Room for the multipart boundary and part headers around an uploaded file
+_UPLOAD_FORM_OVERHEAD = 64 * 1024
+
+
+class UploadLimitMiddleware:
+    """Refuse /api/upload bodies larger than C2PA_UPLOAD_MAX_BYTES as they arrive.
+    
+    FastAPI spools the whole multipart body to a temporary file before
+    upload_image runs, so the handler's own check only applies once it has
+    all been received. A Content-Length over the limit is answered with 413
+    before any of the body is read; otherwise the body is counted as it
+    comes in.
+    """
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope['method'] != 'POST' or _route_path(scope) != '/api/upload':
+            return await self.app(scope, receive, send)
+        limit = config.UPLOAD_MAX_BYTES + _UPLOAD_FORM_OVERHEAD
+        detail = f"Upload exceeds limit of {config.UPLOAD_MAX_BYTES} bytes"
+        length = dict(scope['headers']).get(b'content-length', b'')
+        if length.isdigit() and int(length) > limit:
+            response = JSONResponse({'detail': detail}, status_code=413, headers={'Connection': 'close'})
+            return await response(scope, receive, send)
+        received = 0
+        
+        async def counted_receive():
+            nonlocal received
+            message = await receive()
+            if message['type'] == 'http.request':
+                received += len(message.get('body', b''))
+                if received > limit:
+                    # FastAPI passes HTTPExceptions raised while reading the body through
+                    raise HTTPException(status_code=413, detail=detail)
+            return message
+        
+        await self.app(scope, counted_receive, send)
+
+
+app.add_middleware(UploadLimitMiddleware)
+app.add_middleware(MetricsMiddleware)
+# Outermost, so every log record of a request carries its ID
+app.add_middleware(logs.RequestIdMiddleware)
+
+
+@metrics_registry.collector
+def _component_metrics():
+    """Cache, executor and c2pa worker statistics, read at scrape time."""
+    hits = Counter('c2pa_cache_hits_total', 'Cache lookups answered, by cache and tier.', ('cache', 'tier'))
+    misses = Counter('c2pa_cache_misses_total', 'Cache lookups answered by no tier.', ('cache',))
+    hit_ratio = Gauge('c2pa_cache_hit_ratio', 'Share of cache lookups answered since start.', ('cache',))
+    entries = Gauge('c2pa_cache_entries', 'Entries held in memory.', ('cache',))
+    size = Gauge('c2pa_cache_bytes', 'Estimated size of the entries held in memory.', ('cache',))
+    for name, cache in (('mini', _mini_cache), ('content', content_cache), ('origin', origin_validators)):
+        stats = cache.stats()
+        disk_hits = stats.get('disk', {}).get('hits', 0)
+        lookups = stats['hits'] + stats['misses']
+        hits.inc(stats['hits'], cache=name, tier='memory')
+        hits.inc(disk_hits, cache=name, tier='disk')
+        misses.inc(stats['misses'] - disk_hits, cache=name)
+        hit_ratio.set(round((stats['hits'] + disk_hits) / lookups, 4) if lookups else 0.0, cache=name)
+        entries.set(stats['entries'], cache=name)
+        size.set(stats['bytes'], cache=name)
+    
+    executor = extraction_executor.stats()
+    queue_depth = Gauge('c2pa_executor_queue_depth', 'Extraction jobs waiting for a thread.')
+    queue_depth.set(executor['queued'])
+    running = Gauge('c2pa_executor_running', 'Extraction jobs running on a thread.')
+    running.set(executor['running'])
+    rejected = Counter('c2pa_executor_rejected_total', 'Jobs rejected with 503 because the executor was full.')
+    rejected.inc(executor['rejected'])
+    collected = [hits, misses, hit_ratio, entries, size, queue_depth, running, rejected]
+    
+    if c2pa_pool is not None:
+        pool = c2pa_pool.stats()
+        busy = Gauge('c2pa_workers_busy', 'c2pa worker processes running a job.')
+        busy.set(pool['busy'])
+        restarts = Counter('c2pa_worker_restarts_total', 'c2pa worker processes replaced, by reason.', ('reason',))
+        restarts.inc(pool['timeouts'], reason='timeout')
+        restarts.inc(pool['crashes'], reason='crash')
+        restarts.inc(pool['recycled'], reason='memory')
+        collected += [busy, restarts]
+    return collected
+
+
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus metrics for this worker process (text exposition format)."""
+    return Response(content=metrics_registry.render(), media_type='text/plain; version=0.0.4')
 
 
 @app.get("/{filename}")
@@ -1320,10 +2480,3 @@ async def serve_image(filename: str):
         return FileResponse(file_path)
     raise HTTPException(status_code=404, detail="File not found")
 
-
-if __name__ == "__main__":
-    import uvicorn
-    print("Starting C2PA Metadata Viewer server...")
-    print("Server running at: http://localhost:8080")
-    print("Open in browser: http://localhost:8080/?uri=IMG_20211008_211742.jpg")
-    uvicorn.run(app, host="0.0.0.0", port=8080)
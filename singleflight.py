@@ -0,0 +1,51 @@
+"""
+Request coalescing ("single-flight") for concurrent identical work.
+
+When several requests ask for the same key while a call for it is already in
+flight, they all await that one call and receive its result (or exception)
+instead of starting their own download and extraction.
+"""
+
+import asyncio
+
+
+class SingleFlight:
+    """Deduplicates concurrent async calls by key."""
+    def __init__(self):
+        self._calls = {}
+        self.started = 0
+        self.coalesced = 0
+
+    async def do(self, key, fn):
+        """Await fn() for key, sharing the call with any concurrent callers.
+
+        fn is a zero-argument coroutine function. The shared call is shielded,
+        so one caller being cancelled does not cancel it for the others.
+        """
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            self.started += 1
+            task.add_done_callback(lambda _: self._forget(key, task))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def _forget(self, key, task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # Avoid "exception was never retrieved" when every caller was cancelled
+        if not task.cancelled():
+            task.exception()
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+    def stats(self) -> dict:
+        return {
+            'in_flight': len(self._calls),
+            'started': self.started,
+            'coalesced': self.coalesced,
+        }
@@ -0,0 +1,302 @@
+"""
+Digital source type classification of C2PA data.
+
+How an image's origin is inferred is described declaratively:
+DIGITAL_SOURCE_TYPE_LABELS names the IPTC digital source types, and
+SOURCE_TYPE_RULES lists the keywords (or patterns) that identify a type in
+the claim generator, the actions and the ingredients. SourceTypeClassifier
+prepares the rules once, collects each field of every action (or
+ingredient) into one string in a single walk over the data
+extract_c2pa_data returns, and searches that string once per rule.
+Deployments can add rules and labels from a JSON file
+(C2PA_SOURCE_TYPE_RULES).
+"""
+
+import json
+import logging
+import re
+from bisect import bisect_right
+from itertools import accumulate
+from typing import NamedTuple, Optional
+
+logger = logging.getLogger('c2pa_viewer.source_types')
+
+
+# Digital Source Type mappings for human-friendly labels
+DIGITAL_SOURCE_TYPE_LABELS = {
+    'digitalCapture': 'Digital Camera',
+    'negativeFilm': 'Negative Film Scan',
+    'positiveFilm': 'Slide Film Scan',
+    'print': 'Print Scan',
+    'screenCapture': 'Screen Capture',
+    'trainedAlgorithmicMedia': 'Generative AI',
+    'algorithmicallyEnhanced': 'AI Enhanced',
+    'minorHumanEdits': 'Lightly Edited',
+    'compositeCapture': 'Composite (Camera)',
+    'compositeDigital': 'Composite (Digital)',
+    'compositeSynthetic': 'Composite (Synthetic)',
+    'compositeWithTrainedAlgorithmicMedia': 'Composite (AI + Camera)',
+    'multiFrameComputationalCapture': 'Computational Photography',
+    'virtualRecording': 'Virtual Recording',
+    'digitalArt': 'Digital Art',
+    'dataDrivenMedia': 'Data-Driven Media',
+}
+
+AI_TOOLS = ('firefly', 'dall-e', 'dalle', 'midjourney', 'stable diffusion',
+            'generative fill', 'generative remove', 'generative')
+
+# Fields a rule can match: what they belong to, and their position in it.
+# The claim generator is checked first, then the actions of each actions
+# assertion (and of the top-level 'actions' list), then each ingredient;
+# within one of these the first rule in table order that matches wins.
+# Patterns are matched one line at a time (parameter keys and values are
+# one per line).
+FIELDS = {
+    'claim_generator': ('claim_generator', 0),
+    'action': ('action', 0),
+    'software_agent': ('action', 1),
+    'parameter_key': ('action', 2),
+    'parameter_value': ('action', 3),
+    'ingredient_format': ('ingredient', 0),
+    'ingredient_title': ('ingredient', 1),
+}
+
+
+class Rule(NamedTuple):
+    """Classify as code when field contains one of keywords (or matches pattern).
+
+    Matching is case-insensitive: fields are lower-cased before matching, so
+    patterns should be written in lower case. label defaults to the code's
+    entry in DIGITAL_SOURCE_TYPE_LABELS.
+    """
+    field: str
+    code: str
+    keywords: tuple = ()
+    pattern: str = ''
+    label: Optional[str] = None
+
+
+AI = 'trainedAlgorithmicMedia'
+
+SOURCE_TYPE_RULES = (
+    Rule('claim_generator', AI, keywords=AI_TOOLS),
+    Rule('action', AI, keywords=('generative', 'ai')),
+    Rule('software_agent', AI, keywords=AI_TOOLS),
+    Rule('parameter_key', AI, keywords=('firefly', 'generative', 'ai', 'text_to_image')),
+    Rule('parameter_value', AI, keywords=('text_to_image', 'generative', 'firefly')),
+    # Raw camera formats, then standard image formats from a camera
+    Rule('ingredient_format', 'digitalCapture', keywords=('dng', 'raw'), label='Digital Camera (RAW)'),
+    Rule('ingredient_title', 'digitalCapture', pattern=r'\.(dng|raw)$', label='Digital Camera (RAW)'),
+    Rule('ingredient_format', 'digitalCapture', keywords=('jpeg', 'jpg', 'tiff')),
+)
+
+
+def _needed_keywords(keywords) -> tuple:
+    """keywords, lower-cased, less those containing another keyword.
+
+    Wherever a longer keyword is found its shorter part is found too, at the
+    same position or earlier, so leaving it out doesn't change the outcome.
+    """
+    keywords = {keyword.lower() for keyword in keywords if keyword}
+    return tuple(sorted(k for k in keywords if not any(other != k and other in k for other in keywords)))
+
+
+def _keyword_finder(keywords):
+    """The position of the first of keywords in text, or -1."""
+    keywords = _needed_keywords(keywords)
+
+    def find(text: str) -> int:
+        found = -1
+        for keyword in keywords:
+            position = text.find(keyword, 0, found if found >= 0 else len(text))
+            if position >= 0:
+                found = position
+        return found
+    return find
+
+
+def _pattern_finder(pattern: str):
+    """The position of the first match of pattern in text, or -1."""
+    search = re.compile(pattern, re.MULTILINE).search
+
+    def find(text: str) -> int:
+        match = search(text)
+        return match.start() if match else -1
+    return find
+
+
+def load_rules(path: str) -> tuple:
+    """(rules, labels) from a JSON file.
+
+    The file holds {"rules": [{"field": ..., "code": ..., "keywords": [...]
+    or "pattern": ..., "label": ...}, ...], "labels": {code: label, ...}};
+    both keys are optional.
+    """
+    with open(path) as f:
+        spec = json.load(f)
+    rules = []
+    for rule in spec.get('rules', []):
+        keywords = rule.get('keywords', ())
+        keywords = (keywords,) if isinstance(keywords, str) else tuple(keywords)
+        rules.append(Rule(rule['field'], rule['code'], keywords, rule.get('pattern', ''), rule.get('label')))
+    return tuple(rules), dict(spec.get('labels', {}))
+
+
+def declares_source_type(label: str) -> bool:
+    """Whether an assertion with this label can declare a digitalSourceType.
+
+    IPTC Photo Metadata does, and CreativeWork in some implementations.
+    """
+    label_lower = label.lower()
+    return 'iptc' in label_lower or 'photo-metadata' in label_lower or 'CreativeWork' in label
+
+
+def has_actions(label: str) -> bool:
+    """Whether an assertion with this label holds actions."""
+    return 'actions' in label.lower()
+
+
+def assertion_used(label: str) -> bool:
+    """Whether classify reads assertions with this label."""
+    return declares_source_type(label) or has_actions(label)
+
+
+class SourceTypeClassifier:
+    """Rules prepared once, evaluated in one pass over C2PA data.
+
+    Rather than trying every rule on every action, each field of all the
+    actions (or ingredients) is joined into one string, one per line, and
+    each rule searches its field's string once: a substring search per
+    keyword, which in CPython is much faster than a regex alternation of
+    them, or one search for a pattern. Where rules match, the earliest
+    action wins, then the earliest rule.
+    """
+    def __init__(self, rules=SOURCE_TYPE_RULES, labels=DIGITAL_SOURCE_TYPE_LABELS):
+        self.labels = dict(labels)
+        self._rules = {kind: [] for kind, _ in FIELDS.values()}
+        for rule in rules:
+            if rule.field not in FIELDS:
+                raise ValueError(f"Unknown source type rule field {rule.field!r}")
+            if not (any(rule.keywords) or rule.pattern):
+                raise ValueError(f"Source type rule for {rule.field!r} needs keywords or a pattern")
+            kind, index = FIELDS[rule.field]
+            find = _pattern_finder(rule.pattern) if rule.pattern else _keyword_finder(rule.keywords)
+            result = (rule.code, rule.label or self.labels.get(rule.code, rule.code))
+            self._rules[kind].append((index, find, result))
+
+    @classmethod
+    def from_file(cls, path: str = '') -> 'SourceTypeClassifier':
+        """The built-in rules, preceded by (and labels updated from) those in path.
+
+        An unreadable or invalid file is logged and ignored.
+        """
+        if not path:
+            return cls()
+        try:
+            rules, labels = load_rules(path)
+            return cls(rules + SOURCE_TYPE_RULES, {**DIGITAL_SOURCE_TYPE_LABELS, **labels})
+        except (OSError, ValueError, KeyError, TypeError, re.error) as e:
+            logger.error('Ignoring source type rules in %s: %s', path, e)
+            return cls()
+
+    def classify(self, c2pa_data: dict) -> tuple:
+        """(source_type_code, human_readable_label), or (None, None)."""
+        if not c2pa_data:
+            return None, None
+
+        claim_generator = (c2pa_data.get('basic_info') or {}).get('claim_generator')
+        if claim_generator:
+            found = self._match('claim_generator', [(str(claim_generator),)])
+            if found:
+                return found
+
+        # Actions are collected until an assertion declares the source type;
+        # those seen before it still take precedence. Actions already seen in
+        # an assertion are skipped when they reappear in the top-level list.
+        actions, seen = [], set()
+        for assertion in c2pa_data.get('assertions') or ():
+            label = assertion.get('label') or ''
+            data = assertion.get('data')
+            if not isinstance(data, dict):
+                continue
+            if declares_source_type(label):
+                source_type = data.get('digitalSourceType')
+                if source_type:
+                    return (self._match('action', actions)
+                            or (source_type, self.labels.get(source_type, source_type)))
+            if has_actions(label):
+                _action_fields(data.get('actions'), actions, seen)
+        _action_fields(c2pa_data.get('actions'), actions, seen)
+        found = self._match('action', actions)
+        if found:
+            return found
+
+        ingredients = [
+            (str(ingredient.get('format') or ''), str(ingredient.get('title') or ''))
+            for ingredient in c2pa_data.get('ingredients') or () if isinstance(ingredient, dict)
+        ]
+        found = self._match('ingredient', ingredients)
+        if found:
+            return found
+
+        # C2PA data with actions or ingredients but nothing else to go on
+        if c2pa_data.get('actions') or c2pa_data.get('ingredients'):
+            return 'digitalCapture', self.labels.get('digitalCapture', 'digitalCapture')
+        return None, None
+
+    def _match(self, kind: str, records: list) -> Optional[tuple]:
+        """The result of the first rule of kind matching the earliest record it can.
+
+        records are tuples of fields, in FIELDS order.
+        """
+        if not records:
+            return None
+        columns = ['\n'.join(column) for column in zip(*records)]
+        lowered = [column.lower() for column in columns]
+        if any(len(a) != len(b) for a, b in zip(columns, lowered)):
+            # A few characters lower-case to more than one: keep the
+            # positions of fields by lower-casing them one at a time
+            records = [tuple(field.lower() for field in fields) for fields in records]
+            lowered = ['\n'.join(column) for column in zip(*records)]
+        ends = {}
+        best = best_result = None
+        for order, (index, find, result) in enumerate(self._rules[kind]):
+            position = find(lowered[index])
+            if position < 0:
+                continue
+            if index not in ends:
+                # Offset just past each record's field (and its newline)
+                ends[index] = list(accumulate(len(field) + 1 for field in (r[index] for r in records)))
+            found = (bisect_right(ends[index], position), order)
+            if best is None or found < best:
+                best, best_result = found, result
+                if found[0] == 0:
+                    break
+        return best_result
+
+
+def _action_fields(actions, records: list, seen: set) -> None:
+    """Append the fields of each new action in actions to records.
+
+    An action counts as seen when its name, agent and parameters are the
+    same objects as those of one already added, as for the copies
+    extract_c2pa_data makes.
+    """
+    for action in actions or ():
+        if not isinstance(action, dict):
+            continue
+        name, agent, parameters = action.get('action'), action.get('softwareAgent'), action.get('parameters')
+        key = (id(name), id(agent), id(parameters))
+        if key in seen:
+            continue
+        seen.add(key)
+        if isinstance(agent, dict):
+            # C2PA 2.x: a claim generator info object rather than a string
+            agent = agent.get('name')
+        parameters = parameters if isinstance(parameters, dict) else {}
+        records.append((
+            str(name or ''),
+            str(agent or ''),
+            '\n'.join(map(str, parameters)),
+            '\n'.join([str(value or '') for value in parameters.values()]),
+        ))
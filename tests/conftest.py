@@ -0,0 +1,81 @@
+import c2pa
+import pytest
+
+import server
+from images import make_corrupt_jpeg, make_exif_jpeg, make_plain_jpeg, make_signed_jpeg
+from origin import OriginServer
+
+
+@pytest.fixture(scope='session')
+def image_dir(tmp_path_factory):
+    return tmp_path_factory.mktemp('images')
+
+
+@pytest.fixture(scope='session')
+def plain_jpeg(image_dir):
+    path = image_dir / 'plain.jpg'
+    path.write_bytes(make_plain_jpeg())
+    return str(path)
+
+
+@pytest.fixture(scope='session')
+def exif_jpeg(image_dir):
+    path = image_dir / 'exif.jpg'
+    path.write_bytes(make_exif_jpeg())
+    return str(path)
+
+
+@pytest.fixture(scope='session')
+def signed_jpeg(image_dir):
+    path = image_dir / 'signed.jpg'
+    path.write_bytes(make_signed_jpeg())
+    return str(path)
+
+
+@pytest.fixture(scope='session')
+def corrupt_jpeg(image_dir):
+    path = image_dir / 'corrupt.jpg'
+    path.write_bytes(make_corrupt_jpeg())
+    return str(path)
+
+
+@pytest.fixture
+def origin():
+    """A local HTTP origin serving test images."""
+    origin_server = OriginServer().start()
+    yield origin_server
+    origin_server.stop()
+
+
+@pytest.fixture(autouse=True)
+def fresh_caches():
+    """Every test starts with empty result caches."""
+    server.content_cache.clear()
+    server._mini_cache.clear()
+    server.origin_validators.clear()
+    yield
+
+
+@pytest.fixture
+def reader_count(monkeypatch):
+    """Count c2pa.Reader constructions and PIL Image.open calls.
+
+    c2pa runs in this process rather than in worker processes, so the count
+    includes every Reader.
+    """
+    monkeypatch.setattr(server, 'c2pa_pool', None)
+    counts = {'reader': 0, 'image_open': 0}
+    real_reader = c2pa.Reader
+    real_open = server.Image.open
+
+    def counting_reader(*args, **kwargs):
+        counts['reader'] += 1
+        return real_reader(*args, **kwargs)
+
+    def counting_open(*args, **kwargs):
+        counts['image_open'] += 1
+        return real_open(*args, **kwargs)
+
+    monkeypatch.setattr(c2pa, 'Reader', counting_reader)
+    monkeypatch.setattr(server.Image, 'open', counting_open)
+    return counts
@@ -0,0 +1,190 @@
+"""
+Generators for the test image corpus: plain JPEGs, EXIF-heavy JPEGs and
+C2PA-signed JPEGs signed with a throwaway certificate chain.
+"""
+
+import datetime
+import io
+import json
+
+import c2pa
+from PIL import Image
+
+
+def make_plain_jpeg(width: int = 64, height: int = 48, color=(40, 120, 200)) -> bytes:
+    """A JPEG with no EXIF, IPTC or C2PA data."""
+    buf = io.BytesIO()
+    Image.new('RGB', (width, height), color).save(buf, 'JPEG')
+    return buf.getvalue()
+
+
+def _iptc_app13(records: dict) -> bytes:
+    """Build a Photoshop APP13 segment holding IPTC IIM records."""
+    iim = b''
+    for (record, dataset), value in records.items():
+        values = value if isinstance(value, list) else [value]
+        for v in values:
+            data = v.encode('utf-8')
+            iim += bytes([0x1C, record, dataset]) + len(data).to_bytes(2, 'big') + data
+    if len(iim) % 2:
+        iim += b'\x00'
+    resource = b'8BIM' + (0x0404).to_bytes(2, 'big') + b'\x00\x00' + len(iim).to_bytes(4, 'big') + iim
+    payload = b'Photoshop 3.0\x00' + resource
+    return b'\xff\xed' + (len(payload) + 2).to_bytes(2, 'big') + payload
+
+
+def make_exif_jpeg(width: int = 64, height: int = 48, iptc: bool = True,
+                   gps: bool = True, icc: bool = False, source: Image.Image = None) -> bytes:
+    """A JPEG carrying camera EXIF, optional GPS, IPTC and sRGB ICC metadata.
+
+    source, if given, is the picture to save instead of a flat width x height one.
+    """
+    exif = Image.Exif()
+    exif[271] = 'FUJIFILM'
+    exif[272] = 'GFX 50S'
+    exif[305] = 'Test Suite'
+    exif[315] = 'Jane Doe'
+    exif_ifd = exif.get_ifd(0x8769)
+    exif_ifd[33437] = 8.0
+    exif_ifd[33434] = 1 / 60
+    exif_ifd[34855] = 400
+    exif_ifd[37386] = 63.0
+    exif_ifd[36867] = '2017:11:30 14:15:00'
+    exif_ifd[40961] = 1
+    exif_ifd[42036] = 'GF63mmF2.8 R WR'
+    if gps:
+        gps_ifd = exif.get_ifd(0x8825)
+        gps_ifd[1] = 'N'
+        gps_ifd[2] = (44.0, 49.0, 12.0)
+        gps_ifd[3] = 'E'
+        gps_ifd[4] = (20.0, 27.0, 36.0)
+
+    options = {}
+    if icc:
+        from PIL import ImageCms
+        options['icc_profile'] = ImageCms.ImageCmsProfile(ImageCms.createProfile('sRGB')).tobytes()
+    if source is None:
+        source = Image.new('RGB', (width, height), (90, 90, 30))
+    buf = io.BytesIO()
+    source.save(buf, 'JPEG', exif=exif, **options)
+    data = buf.getvalue()
+    if iptc:
+        segment = _iptc_app13({
+            (2, 5): 'Belgrade Street',
+            (2, 25): ['street', 'night'],
+            (2, 80): 'Jane Doe',
+            (2, 90): 'Belgrade',
+            (2, 116): '(c) Jane Doe',
+        })
+        data = data[:2] + segment + data[2:]
+    return data
+
+
+def _make_signer():
+    """Create a c2pa.Signer backed by a freshly generated CA and signing cert."""
+    from cryptography import x509
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import ec
+    from cryptography.x509.oid import ExtendedKeyUsageOID, NameOID
+
+    def name(common_name):
+        return x509.Name([
+            x509.NameAttribute(NameOID.COMMON_NAME, common_name),
+            x509.NameAttribute(NameOID.ORGANIZATION_NAME, 'Test Org'),
+        ])
+
+    def key_usage(ca):
+        return x509.KeyUsage(digital_signature=True, content_commitment=False,
+                             key_encipherment=False, data_encipherment=False,
+                             key_agreement=False, key_cert_sign=ca, crl_sign=ca,
+                             encipher_only=False, decipher_only=False)
+
+    now = datetime.datetime.now(datetime.timezone.utc)
+    ca_key = ec.generate_private_key(ec.SECP256R1())
+    ca_cert = (
+        x509.CertificateBuilder()
+        .subject_name(name('Test CA')).issuer_name(name('Test CA'))
+        .public_key(ca_key.public_key()).serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(days=1))
+        .not_valid_after(now + datetime.timedelta(days=365))
+        .add_extension(x509.BasicConstraints(ca=True, path_length=None), critical=True)
+        .add_extension(key_usage(True), critical=True)
+        .sign(ca_key, hashes.SHA256())
+    )
+    ee_key = ec.generate_private_key(ec.SECP256R1())
+    ee_cert = (
+        x509.CertificateBuilder()
+        .subject_name(name('Test Signer')).issuer_name(ca_cert.subject)
+        .public_key(ee_key.public_key()).serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(days=1))
+        .not_valid_after(now + datetime.timedelta(days=365))
+        .add_extension(x509.BasicConstraints(ca=False, path_length=None), critical=True)
+        .add_extension(key_usage(False), critical=True)
+        .add_extension(x509.ExtendedKeyUsage([ExtendedKeyUsageOID.EMAIL_PROTECTION]), critical=False)
+        .add_extension(x509.AuthorityKeyIdentifier.from_issuer_public_key(ca_key.public_key()), critical=False)
+        .add_extension(x509.SubjectKeyIdentifier.from_public_key(ee_key.public_key()), critical=False)
+        .sign(ca_key, hashes.SHA256())
+    )
+    chain = (ee_cert.public_bytes(serialization.Encoding.PEM)
+             + ca_cert.public_bytes(serialization.Encoding.PEM))
+    private_key = ee_key.private_bytes(serialization.Encoding.PEM,
+                                       serialization.PrivateFormat.PKCS8,
+                                       serialization.NoEncryption())
+    return c2pa.Signer.from_info(c2pa.C2paSignerInfo(b'es256', chain, private_key, None))
+
+
+_signer = None
+
+
+def make_signed_jpeg(source: bytes = None, author: str = 'Jane Doe',
+                     actions: list = None, ingredient: bytes = None,
+                     title: str = 'signed.jpg', thumbnail: tuple = None) -> bytes:
+    """Sign a JPEG with a C2PA manifest (actions + CreativeWork author).
+
+    If ingredient is given (itself possibly signed), it is added as the
+    parentOf ingredient so the result carries a provenance chain. thumbnail,
+    a (format, data) pair, replaces the generated claim thumbnail.
+    """
+    global _signer
+    if _signer is None:
+        _signer = _make_signer()
+
+    if actions is None:
+        actions = [{
+            'action': 'c2pa.created',
+            'digitalSourceType': 'http://cv.iptc.org/newscodes/digitalsourcetype/digitalCapture',
+        }]
+    manifest = {
+        'claim_generator_info': [{'name': 'test_suite', 'version': '1.0'}],
+        'title': title,
+        'format': 'image/jpeg',
+        'assertions': [
+            {'label': 'c2pa.actions.v2', 'data': {'actions': actions}},
+            {'label': 'stds.schema-org.CreativeWork', 'data': {
+                '@context': 'https://schema.org',
+                '@type': 'CreativeWork',
+                'author': [{'@type': 'Person', 'name': author}],
+            }},
+        ],
+    }
+    if thumbnail is not None:
+        manifest['thumbnail'] = {'format': thumbnail[0], 'identifier': 'thumbnail'}
+    builder = c2pa.Builder(json.dumps(manifest))
+    if thumbnail is not None:
+        builder.add_resource('thumbnail', io.BytesIO(thumbnail[1]))
+    if ingredient is not None:
+        builder.add_ingredient(
+            json.dumps({'title': 'parent.jpg', 'relationship': 'parentOf'}),
+            'image/jpeg', io.BytesIO(ingredient))
+    source = source if source is not None else make_exif_jpeg()
+    output = io.BytesIO()
+    builder.sign(_signer, 'image/jpeg', io.BytesIO(source), output)
+    return output.getvalue()
+
+
+def make_corrupt_jpeg() -> bytes:
+    """A signed JPEG whose manifest store is damaged, so c2pa.Reader can't read it."""
+    signed = bytearray(make_signed_jpeg())
+    start = signed.index(b'jumb') + 20
+    signed[start:start + 16] = bytes(b ^ 0xFF for b in signed[start:start + 16])
+    return bytes(signed)
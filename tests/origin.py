@@ -0,0 +1,128 @@
+"""
+A local stand-in for a remote image origin, served over HTTP/1.1 keep-alive.
+"""
+
+import hashlib
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class OriginServer:
+    """Serves registered byte blobs and records connections and requests."""
+    def __init__(self):
+        self.files = {}
+        self.delays = {}
+        # Honour 'Range: bytes=start-end' requests with 206 responses
+        self.ranges = True
+        # Most body bytes sent in one 206 response (short reads), if set
+        self.range_limit = None
+        # Send ETag / Last-Modified and answer conditional requests with 304
+        self.etags = True
+        self.last_modified = True
+        self.connections = 0
+        self.requests = []
+        # Response body bytes sent, across all requests
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+        origin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def setup(self):
+                super().setup()
+                with origin._lock:
+                    origin.connections += 1
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                with origin._lock:
+                    origin.requests.append((self.path, dict(self.headers)))
+                if self.path.startswith('/redirect/'):
+                    self.send_response(302)
+                    self.send_header('Location', '/' + self.path[len('/redirect/'):])
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                entry = origin.files.get(self.path)
+                if entry is None:
+                    self.send_response(404)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                body, content_type = entry
+                etag = f'"{hashlib.md5(body).hexdigest()}"' if origin.etags else None
+                last_modified = 'Wed, 21 Oct 2015 07:28:00 GMT' if origin.last_modified else None
+                if self._not_modified(etag, last_modified):
+                    self.send_response(304)
+                    self._send_validators(etag, last_modified)
+                    self.end_headers()
+                    return
+                match = re.fullmatch(r'bytes=(\d+)-(\d*)', self.headers.get('Range', ''))
+                if origin.ranges and match and int(match.group(1)) < len(body):
+                    start = int(match.group(1))
+                    end = min(int(match.group(2) or len(body) - 1), len(body) - 1)
+                    if origin.range_limit:
+                        end = min(end, start + origin.range_limit - 1)
+                    total = len(body)
+                    body = body[start:end + 1]
+                    self.send_response(206)
+                    self.send_header('Content-Range', f"bytes {start}-{end}/{total}")
+                else:
+                    self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self._send_validators(etag, last_modified)
+                self.end_headers()
+                with origin._lock:
+                    origin.bytes_sent += len(body)
+                delay = origin.delays.get(self.path)
+                if delay:
+                    # Trickle the body out slowly
+                    for i in range(0, len(body), 1024):
+                        self.wfile.write(body[i:i + 1024])
+                        self.wfile.flush()
+                        time.sleep(delay)
+                else:
+                    self.wfile.write(body)
+
+            def _not_modified(self, etag, last_modified):
+                if self.headers.get('If-None-Match') is not None:
+                    return etag is not None and self.headers['If-None-Match'] == etag
+                since = self.headers.get('If-Modified-Since')
+                return since is not None and since == last_modified
+
+            def _send_validators(self, etag, last_modified):
+                if etag:
+                    self.send_header('ETag', etag)
+                if last_modified:
+                    self.send_header('Last-Modified', last_modified)
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def add(self, path: str, body: bytes, content_type: str = 'image/jpeg',
+            delay: float = None) -> str:
+        """Serve body at path and return its full URL."""
+        self.files[path] = (body, content_type)
+        if delay:
+            self.delays[path] = delay
+        return self.base_url + path
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
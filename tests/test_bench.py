@@ -0,0 +1,31 @@
+import json
+
+import bench_server
+import server
+from isolation import ProcessPool
+
+
+def test_percentile_is_nearest_rank():
+    ordered = list(range(1, 101))
+    assert bench_server.percentile(ordered, 50) == 50
+    assert bench_server.percentile(ordered, 99) == 99
+    assert bench_server.percentile([7.0], 95) == 7.0
+    assert bench_server.percentile([], 50) == 0.0
+
+
+def test_benchmark_report(monkeypatch):
+    # The app's lifespan shuts its c2pa pool down when the benchmark stops
+    monkeypatch.setattr(server, 'c2pa_pool', ProcessPool(max_workers=1))
+    report = bench_server.run_benchmark(('c2pa_mini', 'upload'), concurrency=2, requests=6,
+                                        images=1, width=64, height=48)
+
+    assert [(r['endpoint'], r['phase']) for r in report['results']] == [
+        ('/api/c2pa_mini', 'cold'), ('/api/c2pa_mini', 'warm'),
+        ('/api/upload', 'cold'), ('/api/upload', 'warm'),
+    ]
+    for result in report['results']:
+        assert result['errors'] == 0, result['status']
+        assert result['requests'] == (3 if result['phase'] == 'cold' else 6)
+        assert result['latency_ms']['p50'] <= result['latency_ms']['p99'] <= result['latency_ms']['max']
+    assert report['meta']['corpus']['c2pa']['images'] == 1
+    assert bench_server.compare(report, json.loads(json.dumps(report)))[1].split()[2:] == ['+0.0%'] * 4
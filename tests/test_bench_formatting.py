@@ -0,0 +1,24 @@
+import bench_formatting
+import server
+from bench_formatting import make_c2pa_data
+
+
+def test_cases_exercise_the_intended_paths():
+    assert server.get_digital_source_type(make_c2pa_data()) == ('digitalCapture', 'Digital Camera')
+    assert server.get_digital_source_type(make_c2pa_data(actions=50, generative=True))[0] == 'trainedAlgorithmicMedia'
+    assert server.get_digital_source_type(make_c2pa_data(actions=0, ingredients=20, raw_ingredient=True)) == (
+        'digitalCapture', 'Digital Camera (RAW)')
+    provenance = server.format_provenance_for_web(make_c2pa_data(actions=40))
+    assert sum(item['name'] == 'Action' for item in provenance) == 40
+
+
+def test_report():
+    report = bench_formatting.run_benchmarks('datetime/', min_time=0.001, repeat=2)
+
+    assert [r['case'] for r in report['results']] == [
+        'datetime/iso_local', 'datetime/iso', 'datetime/exif', 'datetime/invalid',
+    ]
+    for result in report['results']:
+        assert 0 < result['best_ns'] <= result['median_ns']
+        assert result['peak_bytes'] >= result['retained_bytes'] >= 0
+    assert bench_formatting.compare(report, report)[1].split()[1:] == ['+0.0%', '+0.0%']
@@ -0,0 +1,46 @@
+import asyncio
+import io
+
+from fastapi import UploadFile
+
+import server
+from cache import MISSING, ContentCache
+from images import make_signed_jpeg
+
+
+def test_cache_keeps_none_results_and_evicts_lru():
+    cache = ContentCache(max_entries=2)
+    cache.set('a', 'c2pa', None)
+    cache.set('b', 'c2pa', {'x': 1})
+    assert cache.get('a', 'c2pa') is None
+    cache.set('c', 'c2pa', {})
+    # 'b' was least recently used
+    assert cache.get('b', 'c2pa') is MISSING
+    assert cache.get('a', 'exif') is MISSING
+    assert cache.get(None, 'c2pa') is MISSING
+
+
+def test_same_bytes_via_different_urls_extract_once(origin, reader_count):
+    body = make_signed_jpeg()
+    first = origin.add('/one.jpg', body)
+    second = origin.add('/two.jpg', body)
+
+    a = asyncio.run(server.get_c2pa_metadata(uri=first))
+    b = asyncio.run(server.get_c2pa_metadata(uri=second))
+
+    assert a['provenance'] == b['provenance']
+    assert reader_count['reader'] == 1
+
+
+def test_upload_reuses_results_from_url(origin, reader_count):
+    body = make_signed_jpeg()
+    url = origin.add('/shared.jpg', body)
+    asyncio.run(server.get_c2pa_metadata(uri=url))
+    asyncio.run(server.get_exif_metadata(uri=url))
+
+    upload = UploadFile(io.BytesIO(body), filename='shared.jpg')
+    response = asyncio.run(server.upload_image(file=upload))
+
+    assert response['shared.jpg']['provenance']
+    assert response['shared.jpg']['photography']['camera_make'] == 'FUJIFILM'
+    assert reader_count['reader'] == 1
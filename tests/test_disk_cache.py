@@ -0,0 +1,86 @@
+import multiprocessing
+import time
+
+from cache import MISSING, DiskCache, LRUCache, TieredCache
+
+
+def _write_many(path, worker, count):
+    cache = DiskCache(path)
+    for i in range(count):
+        cache.set(f'w{worker}:{i}', {'worker': worker, 'i': i}, ttl=60)
+    cache.close()
+
+
+def test_survives_restart(tmp_path):
+    path = tmp_path / 'cache.sqlite3'
+    DiskCache(path).set('mini:abc', {'status': 'Authenticity Verified', 'iso': (400,)}, ttl=60)
+
+    reopened = DiskCache(path)
+    assert reopened.get('mini:abc') == {'status': 'Authenticity Verified', 'iso': (400,)}
+
+
+def test_expired_entries_are_not_returned(tmp_path):
+    cache = DiskCache(tmp_path / 'cache.sqlite3')
+    cache.set('old', 1, ttl=0.01)
+    cache.set('stale', 1, ttl=0.01)
+    cache.set('new', 2, ttl=60)
+    time.sleep(0.02)
+    assert cache.get('old') is MISSING
+    # 'stale' was never looked up again, so only the sweep removes it
+    assert cache.sweep() == 1
+    assert cache.stats()['entries'] == 1
+    assert cache.get('new') == 2
+
+
+def test_evicts_least_recently_accessed_over_budget(tmp_path):
+    cache = DiskCache(tmp_path / 'cache.sqlite3', max_bytes=10_000)
+    for i in range(20):
+        cache.set(f'k{i}', b'x' * 1000, ttl=60)
+    stats = cache.stats()
+    assert stats['bytes'] <= 10_000
+    assert cache.get('k19') is not MISSING
+    assert cache.get('k0') is MISSING
+
+
+def test_concurrent_writers_from_several_processes(tmp_path):
+    path = str(tmp_path / 'shared.sqlite3')
+    DiskCache(path)
+    ctx = multiprocessing.get_context('spawn')
+    workers = [ctx.Process(target=_write_many, args=(path, w, 50)) for w in range(3)]
+    for p in workers:
+        p.start()
+    for p in workers:
+        p.join(timeout=60)
+        assert p.exitcode == 0
+
+    cache = DiskCache(path)
+    assert cache.stats()['entries'] == 150
+    assert cache.get('w2:49') == {'worker': 2, 'i': 49}
+
+
+def test_tiered_cache_promotes_disk_hits_into_memory(tmp_path):
+    disk = DiskCache(tmp_path / 'cache.sqlite3')
+    TieredCache(LRUCache(), disk, namespace='mini').set('key', {'creator': 'Jane'})
+
+    # A fresh process has an empty memory tier but the same disk file
+    cold = TieredCache(LRUCache(), disk, namespace='mini')
+    assert cold.get('key') == {'creator': 'Jane'}
+    assert 'key' in cold.memory
+    assert cold.stats()['disk']['hits'] == 1
+    # Namespaces keep caches sharing a file apart
+    assert TieredCache(LRUCache(), disk, namespace='content').get('key') is MISSING
+
+
+def test_running_total_tracks_every_write(tmp_path):
+    cache = DiskCache(tmp_path / 'cache.sqlite3')
+    cache.set('a', b'x' * 100, ttl=60)
+    cache.set('a', b'x' * 10, ttl=60)
+    cache.set('b', b'x' * 50, ttl=0.01)
+    cache.set('mini:c', b'x' * 70, ttl=60)
+    time.sleep(0.02)
+    cache.sweep()
+    cache.delete_prefix('mini:')
+    conn = cache._conn()
+    total = conn.execute('SELECT size FROM totals').fetchone()[0]
+    assert total == conn.execute('SELECT SUM(size) FROM entries').fetchone()[0]
+    assert cache.stats() == {'entries': 1, 'bytes': total, 'max_bytes': cache.max_bytes}
@@ -0,0 +1,66 @@
+import asyncio
+import io
+
+import pytest
+from fastapi import HTTPException
+
+import server
+from downloader import ConnectionPool, Downloader, DownloadError, DownloadTooLarge
+from images import make_exif_jpeg, make_plain_jpeg
+
+
+def test_reuses_connection_per_origin(origin):
+    body = make_plain_jpeg()
+    url = origin.add('/a.jpg', body)
+    downloader = Downloader(pool=ConnectionPool())
+
+    for _ in range(5):
+        dest = io.BytesIO()
+        result = downloader.download(url, dest)
+        assert dest.getvalue() == body
+        assert result.bytes_written == len(body)
+
+    assert origin.connections == 1
+    assert downloader.pool.stats()['reused'] == 4
+
+
+def test_follows_redirects(origin):
+    body = make_plain_jpeg()
+    origin.add('/b.jpg', body)
+    dest = io.BytesIO()
+    Downloader().download(origin.base_url + '/redirect/b.jpg', dest)
+    assert dest.getvalue() == body
+
+
+def test_enforces_max_body_size(origin):
+    url = origin.add('/big.jpg', b'\xff' * 200_000)
+    dest = io.BytesIO()
+    with pytest.raises(DownloadTooLarge):
+        Downloader(chunk_size=4096).download(url, dest, max_bytes=100_000)
+    assert len(dest.getvalue()) <= 100_000
+
+
+def test_enforces_overall_deadline(origin):
+    url = origin.add('/slow.jpg', b'\xff' * 20 * 1024, delay=0.1)
+    with pytest.raises(DownloadError, match='deadline'):
+        Downloader(chunk_size=1024).download(url, io.BytesIO(), deadline=0.5)
+
+
+def test_http_errors_raise(origin):
+    with pytest.raises(DownloadError, match='404'):
+        Downloader().download(origin.base_url + '/missing.jpg', io.BytesIO())
+
+
+def test_image_path_context_streams_remote_image(origin):
+    url = origin.add('/photo', make_exif_jpeg())
+    response = asyncio.run(server.get_exif_metadata(uri=url))
+    assert response['photo']['photography']['camera_make'] == 'FUJIFILM'
+
+
+def test_image_path_context_rejects_oversized_images(origin, monkeypatch):
+    url = origin.add('/huge.jpg', b'\xff' * 50_000)
+    monkeypatch.setattr(server.http_downloader, 'max_bytes', 10_000)
+    with pytest.raises(HTTPException) as excinfo:
+        with server.ImagePathContext(url):
+            pass
+    assert excinfo.value.status_code == 413
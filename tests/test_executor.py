@@ -0,0 +1,70 @@
+import asyncio
+import threading
+
+import pytest
+
+import server
+from executor import BoundedExecutor, ExecutorSaturated
+
+
+def test_rejects_when_workers_and_queue_are_full():
+    executor = BoundedExecutor(max_workers=1, max_queue=1)
+    release = threading.Event()
+    try:
+        running = executor.submit(release.wait)
+        queued = executor.submit(lambda: 'queued')
+
+        with pytest.raises(ExecutorSaturated) as excinfo:
+            executor.submit(lambda: 'rejected')
+        assert excinfo.value.status_code == 503
+        assert 'Retry-After' in excinfo.value.headers
+        assert executor.stats()['rejected'] == 1
+
+        release.set()
+        running.result(timeout=5)
+        assert queued.result(timeout=5) == 'queued'
+        # Slots are returned once jobs finish
+        assert executor.submit(lambda: 'accepted').result(timeout=5) == 'accepted'
+    finally:
+        release.set()
+        executor.shutdown()
+
+
+def test_run_keeps_event_loop_responsive():
+    executor = BoundedExecutor(max_workers=1, max_queue=0)
+    release = threading.Event()
+
+    async def scenario():
+        blocking = asyncio.ensure_future(executor.run(release.wait, 5))
+        # The loop keeps scheduling other coroutines while the job blocks
+        await asyncio.sleep(0.01)
+        assert not blocking.done()
+        assert executor.in_flight == 1
+        release.set()
+        return await blocking
+
+    try:
+        assert asyncio.run(scenario()) is True
+    finally:
+        release.set()
+        executor.shutdown()
+
+
+def test_exif_endpoint_runs_through_executor(exif_jpeg):
+    response = asyncio.run(server.get_exif_metadata(uri=exif_jpeg))
+    metadata = response['exif.jpg']
+    assert metadata['photography']['camera_make'] == 'FUJIFILM'
+    assert metadata['iptc']['city'] == 'Belgrade'
+
+
+def test_c2pa_mini_reports_saturation(signed_jpeg, monkeypatch):
+    saturated = BoundedExecutor(max_workers=1, max_queue=0)
+    release = threading.Event()
+    saturated.submit(release.wait)
+    monkeypatch.setattr(server, 'extraction_executor', saturated)
+    try:
+        with pytest.raises(ExecutorSaturated):
+            asyncio.run(server.get_c2pa_mini(uri=signed_jpeg))
+    finally:
+        release.set()
+        saturated.shutdown()
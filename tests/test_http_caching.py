@@ -0,0 +1,107 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import config
+import server
+from images import make_exif_jpeg
+
+
+@pytest.fixture
+def client():
+    return TestClient(server.app)
+
+
+def test_results_carry_etag_and_cache_control(client, signed_jpeg):
+    for path in ('/api/c2pa_mini', '/api/exif_metadata', '/api/c2pa_metadata'):
+        response = client.get(path, params={'uri': signed_jpeg})
+        assert response.status_code == 200
+        assert response.headers['ETag'].startswith('"')
+        assert response.headers['Cache-Control'] == (
+            f"public, max-age={config.API_CACHE_MAX_AGE}, "
+            f"stale-while-revalidate={config.API_CACHE_STALE_WHILE_REVALIDATE}")
+
+
+def test_if_none_match_gets_304_without_extraction(client, signed_jpeg, monkeypatch):
+    etags = {}
+    for path in ('/api/c2pa_mini', '/api/c2pa_metadata'):
+        etags[path] = client.get(path, params={'uri': signed_jpeg}).headers['ETag']
+
+    def fail(image):
+        raise AssertionError('extraction re-run')
+
+    for name in ('extract_c2pa_minimal', 'extract_c2pa_data', 'extract_thumbnails_from_image'):
+        monkeypatch.setattr(server, name, fail)
+
+    for path, etag in etags.items():
+        response = client.get(path, params={'uri': signed_jpeg},
+                              headers={'If-None-Match': f'"stale", W/{etag}'})
+        assert response.status_code == 304
+        assert response.content == b''
+        assert response.headers['ETag'] == etag
+
+
+def test_if_none_match_gets_304_without_extraction_from_a_cold_cache(client, signed_jpeg, reader_count,
+                                                                     monkeypatch):
+    requests = [
+        ('/api/c2pa_mini', {}),
+        ('/api/exif_metadata', {}),
+        ('/api/c2pa_metadata', {}),
+        ('/api/c2pa_metadata', {'inline_thumbnails': 'true'}),
+        ('/api/provenance_graph', {'max_depth': 1}),
+        ('/api/metadata', {'fields': 'exif,provenance'}),
+    ]
+    etags = [client.get(path, params={'uri': signed_jpeg, **params}).headers['ETag']
+             for path, params in requests]
+    server.content_cache.clear()
+    server._mini_cache.clear()
+    reader_count.update(reader=0, image_open=0)
+
+    def fail(image):
+        raise AssertionError('extraction re-run')
+
+    for name in ('extract_c2pa_minimal', 'extract_c2pa_data', 'extract_thumbnails_from_image',
+                 'extract_exif_metadata', 'extract_iptc_data', 'extract_provenance_graph'):
+        monkeypatch.setattr(server, name, fail)
+
+    for (path, params), etag in zip(requests, etags):
+        response = client.get(path, params={'uri': signed_jpeg, **params}, headers={'If-None-Match': etag})
+        assert response.status_code == 304, path
+        assert response.headers['ETag'] == etag
+    assert reader_count == {'reader': 0, 'image_open': 0}
+
+    # Another variant's ETag doesn't match: that goes on to extraction
+    response = client.get('/api/c2pa_metadata', params={'uri': signed_jpeg}, headers={'If-None-Match': etags[3]})
+    assert response.status_code != 304
+
+
+def test_etag_follows_image_bytes(client, tmp_path):
+    uri = str(tmp_path / 'photo.jpg')
+    (tmp_path / 'photo.jpg').write_bytes(make_exif_jpeg())
+    first = client.get('/api/exif_metadata', params={'uri': uri}).headers['ETag']
+
+    # Same bytes, recomputed from scratch: same ETag
+    server.content_cache.clear()
+    assert client.get('/api/exif_metadata', params={'uri': uri}).headers['ETag'] == first
+
+    (tmp_path / 'photo.jpg').write_bytes(make_exif_jpeg(gps=False))
+    response = client.get('/api/exif_metadata', params={'uri': uri}, headers={'If-None-Match': first})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != first
+
+
+def test_error_results_are_not_cacheable(client, corrupt_jpeg, plain_jpeg):
+    mini = client.get('/api/c2pa_mini', params={'uri': corrupt_jpeg})
+    assert mini.json()['status'] == 'Unverified'
+    metadata = client.get('/api/c2pa_metadata', params={'uri': corrupt_jpeg})
+    assert metadata.json()['c2pa_data'] is None
+    graph = client.get('/api/provenance_graph', params={'uri': corrupt_jpeg})
+    assert graph.json() == {'graph': None}
+
+    for response in (mini, metadata, graph):
+        assert 'ETag' not in response.headers
+        assert response.headers['Cache-Control'] == 'no-cache'
+    # Nor are they cached on the server
+    assert len(server._mini_cache) == 0
+    assert len(server.content_cache) == 0
+    # An image without any manifest is a result like any other
+    assert 'ETag' in client.get('/api/c2pa_mini', params={'uri': plain_jpeg}).headers
@@ -0,0 +1,94 @@
+import asyncio
+import os
+import sys
+import time
+
+import pytest
+from fastapi import HTTPException
+
+import isolation
+import server
+from cache import MISSING
+from isolation import JobFailed, JobTimeout, ProcessPool, WorkerCrashed
+
+
+@pytest.fixture
+def pool():
+    process_pool = ProcessPool(max_workers=1, timeout=10)
+    yield process_pool
+    process_pool.shutdown()
+
+
+def test_reads_manifest_and_thumbnails_in_a_worker(pool, signed_jpeg):
+    manifest_store, resources, error = pool.run(isolation.read_c2pa, signed_jpeg)
+
+    manifest = manifest_store['manifests'][manifest_store['active_manifest']]
+    assert resources[manifest['thumbnail']['identifier']].startswith(b'\xff\xd8')
+    assert error is None
+    assert pool.run(isolation.read_c2pa, __file__) == (None, {}, None)
+
+
+def test_hung_job_is_killed_and_worker_replaced(pool):
+    pid = pool.run(os.getpid)
+    started = time.monotonic()
+    with pytest.raises(JobTimeout):
+        pool.run(time.sleep, 30, timeout=0.5)
+
+    assert time.monotonic() - started < 5
+    assert pool.run(os.getpid) not in (pid, os.getpid())
+    assert pool.stats()['timeouts'] == 1
+
+
+def test_crashed_and_failing_jobs(pool):
+    with pytest.raises(WorkerCrashed):
+        pool.run(os._exit, 3)
+    with pytest.raises(JobFailed, match='ZeroDivisionError'):
+        pool.run(divmod, 1, 0)
+    assert pool.run(divmod, 7, 2) == (3, 1)
+    assert pool.stats()['crashes'] == 1
+
+
+def test_workers_over_memory_limit_are_recycled():
+    pool = ProcessPool(max_workers=1, max_rss_bytes=1)
+    try:
+        pids = {pool.run(os.getpid) for _ in range(3)}
+        assert len(pids) == 3
+        assert pool.stats()['recycled'] == 3
+    finally:
+        pool.shutdown()
+
+
+def _allocate(size):
+    return len(bytearray(size))
+
+
+@pytest.mark.skipif(not sys.platform.startswith('linux'), reason='the heap is only capped on Linux')
+def test_job_over_memory_cap_fails_and_worker_is_replaced(monkeypatch):
+    pool = ProcessPool(max_workers=1, max_memory_bytes=128 * 1024 * 1024)
+    monkeypatch.setattr(server, 'c2pa_pool', pool)
+    try:
+        pid = pool.run(os.getpid)
+        assert pool.run(_allocate, 16 * 1024 * 1024) == 16 * 1024 * 1024
+        with pytest.raises(JobFailed, match='MemoryError'):
+            pool.run(_allocate, 512 * 1024 * 1024)
+        with pytest.raises(HTTPException) as excinfo:
+            server.run_isolated(_allocate, 512 * 1024 * 1024)
+        assert excinfo.value.status_code == 422
+        assert pool.run(os.getpid) != pid
+        assert pool.stats()['recycled'] == 2
+    finally:
+        pool.shutdown()
+
+
+def test_timed_out_manifest_is_an_error_not_a_missing_manifest(signed_jpeg, monkeypatch):
+    # Far less than it takes to start a worker
+    monkeypatch.setattr(server, 'c2pa_pool', ProcessPool(max_workers=1, timeout=0.001))
+    try:
+        with pytest.raises(HTTPException) as raised:
+            asyncio.run(server.get_c2pa_metadata(uri=signed_jpeg))
+    finally:
+        server.c2pa_pool.shutdown()
+
+    assert raised.value.status_code == 422
+    content_hash = server.hash_file(signed_jpeg)
+    assert server.content_cache.get(content_hash, 'c2pa') is MISSING
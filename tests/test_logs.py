@@ -0,0 +1,108 @@
+import asyncio
+import io
+import json
+import logging
+import os
+import queue
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+import config
+import logs
+import server
+
+
+@pytest.fixture
+def output():
+    """Log records written while the test runs, decoded from their JSON lines."""
+    stream = io.StringIO()
+    logs.configure('DEBUG', 100, stream=stream)
+
+    def records():
+        logs.flush()
+        return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+    yield records
+    logs.configure(config.LOG_LEVEL, config.LOG_SAMPLE_PERCENT)
+
+
+def test_records_are_json_lines(output):
+    logger = logging.getLogger('c2pa_viewer.test')
+    logger.info('Downloaded %s', 'image', extra={'uri': 'https://example.com/a.jpg', 'bytes': 42})
+    try:
+        1 / 0
+    except ZeroDivisionError:
+        logger.exception('Failed')
+
+    info, error = output()
+    assert info['level'] == 'info' and info['logger'] == 'c2pa_viewer.test'
+    assert info['message'] == 'Downloaded image'
+    assert info['uri'] == 'https://example.com/a.jpg' and info['bytes'] == 42
+    assert 'request_id' not in info
+    assert error['level'] == 'error'
+    assert 'ZeroDivisionError' in error['exc']
+
+
+def test_only_sampled_records_below_warning_are_dropped(output):
+    stream = io.StringIO()
+    logs.configure('INFO', 0, stream=stream)
+    logger = logging.getLogger('c2pa_viewer.test')
+    for _ in range(50):
+        logger.info('Cache hit', extra={'sampled': True})
+    logger.info('Started')
+    logger.warning('Slow download', extra={'sampled': True})
+    logs.flush()
+
+    assert [json.loads(line)['message'] for line in stream.getvalue().splitlines()] == [
+        'Started', 'Slow download',
+    ]
+
+
+def test_invalid_settings_are_logged_once_logging_is_configured():
+    # Settings are read at import, before logging is configured
+    result = subprocess.run(
+        [sys.executable, '-c', 'import config, logs; logs.configure("INFO")'],
+        cwd=Path(__file__).parent.parent, capture_output=True, text=True, timeout=60,
+        env=dict(os.environ, C2PA_MINI_CACHE_TTL='soon'),
+    )
+    [record] = [json.loads(line) for line in result.stderr.splitlines()]
+    assert record['logger'] == 'c2pa_viewer.config' and record['level'] == 'warning'
+    assert record['setting'] == 'C2PA_MINI_CACHE_TTL'
+    assert "'soon'" in record['message']
+
+
+def test_full_queue_drops_instead_of_blocking():
+    handler = logs.DroppingQueueHandler(queue.Queue(maxsize=1))
+    for n in range(3):
+        handler.handle(logging.makeLogRecord({'msg': f'record {n}'}))
+
+    assert handler.queue.qsize() == 1
+    assert handler.dropped == 2
+
+
+def test_request_id_is_echoed_and_logged(output, signed_jpeg):
+    client = TestClient(server.app)
+    given = client.get('/api/c2pa_mini', params={'uri': signed_jpeg}, headers={'X-Request-ID': 'edge-123'})
+    generated = client.get('/api/c2pa_mini', params={'uri': signed_jpeg})
+    invalid = client.get('/api/c2pa_mini', params={'uri': signed_jpeg}, headers={'X-Request-ID': 'a b\n'})
+
+    assert given.headers['X-Request-ID'] == 'edge-123'
+    assert generated.headers['X-Request-ID'] not in ('', 'edge-123')
+    assert invalid.headers['X-Request-ID'] != 'a b\n'
+    access = [r for r in output() if r['logger'] == 'c2pa_viewer.access']
+    assert [r['request_id'] for r in access] == [
+        'edge-123', generated.headers['X-Request-ID'], invalid.headers['X-Request-ID'],
+    ]
+    assert access[0]['status'] == 200 and access[0]['path'] == '/api/c2pa_mini'
+
+
+def test_request_id_reaches_executor_threads():
+    async def handler():
+        logs.request_id_var.set('req-1')
+        return await server.extraction_executor.run(logs.request_id_var.get)
+
+    assert asyncio.run(handler()) == 'req-1'
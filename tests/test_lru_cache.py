@@ -0,0 +1,86 @@
+import asyncio
+import time
+
+import server
+from cache import MISSING, LRUCache, estimate_size
+
+
+def test_evicts_least_recently_used_by_count():
+    cache = LRUCache(max_entries=2, max_bytes=1024)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1
+    cache.set('c', 3)
+    assert cache.get('b') is MISSING
+    assert cache.get('a') == 1
+    assert cache.stats()['evictions'] == 1
+
+
+def test_evicts_to_stay_within_byte_budget():
+    cache = LRUCache(max_entries=100, max_bytes=100, sizeof=len)
+    cache.set('a', 'x' * 40)
+    cache.set('b', 'x' * 40)
+    cache.set('c', 'x' * 40)
+    stats = cache.stats()
+    assert stats['bytes'] <= 100
+    assert stats['entries'] == 2
+    assert 'a' not in cache
+    # A value bigger than the whole budget is never stored
+    cache.set('huge', 'x' * 101)
+    assert 'huge' not in cache
+
+
+def test_expired_entries_are_missed_and_swept():
+    cache = LRUCache(ttl=0.05)
+    cache.set('a', 1)
+    cache.set('b', 2, ttl=60)
+    time.sleep(0.06)
+    assert cache.sweep() == 1
+    assert len(cache) == 1
+    assert cache.get('b') == 2
+    stats = cache.stats()
+    assert stats['expirations'] == 1
+    assert stats['hits'] == 1
+
+
+def test_background_sweeper_removes_unrequested_entries():
+    cache = LRUCache(ttl=0.01)
+    cache.start_sweeper(interval=0.02)
+    try:
+        for i in range(50):
+            cache.set(f'uri-{i}', {'status': 'Unverified'})
+        deadline = time.time() + 2
+        while len(cache) and time.time() < deadline:
+            time.sleep(0.02)
+        assert len(cache) == 0
+    finally:
+        cache.stop_sweeper()
+
+
+def test_hit_and_miss_counters():
+    cache = LRUCache()
+    cache.get('missing')
+    cache.set('k', {'v': 1})
+    cache.get('k')
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses']) == (1, 1)
+    assert stats['hit_ratio'] == 0.5
+
+
+def test_mini_endpoint_uses_bounded_cache(signed_jpeg):
+    hits_before = server._mini_cache.stats()['hits']
+    first = asyncio.run(server.get_c2pa_mini(uri=signed_jpeg))
+    second = asyncio.run(server.get_c2pa_mini(uri=signed_jpeg))
+    assert first == second
+    assert first['creator'] == 'Jane Doe'
+    stats = server._mini_cache.stats()
+    assert stats['entries'] == 1
+    assert stats['hits'] - hits_before == 1
+
+
+def test_estimate_size_counts_bytes_and_strings_by_length():
+    thumbnail = bytes(range(256)) * 40
+    assert estimate_size(thumbnail) == len(thumbnail)
+    # Bytes nested in a result count their length, not their repr
+    result = {'claim': {'format': 'image/jpeg', 'data': thumbnail}, 'ingredients': [None, 1.5]}
+    assert len(thumbnail) < estimate_size(result) < len(thumbnail) + 200
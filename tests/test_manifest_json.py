@@ -0,0 +1,81 @@
+import io
+import json
+
+import c2pa
+import pytest
+
+import bench_formatting
+import manifest_json
+import server
+from images import make_signed_jpeg
+from source_types import assertion_used
+
+
+def _reference(store: dict):
+    """mini_manifest's result, from the fully decoded store."""
+    manifest = store['manifests'][store['active_manifest']]
+    result = {key: manifest[key] for key in manifest_json.MINI_MANIFEST_KEYS if key in manifest}
+    result['assertions'] = [{'label': a['label'], 'data': a.get('data', {})}
+                            for a in manifest.get('assertions', []) if assertion_used(a['label'])]
+    result['ingredients'] = [{key: i[key] for key in manifest_json.MINI_INGREDIENT_KEYS if key in i}
+                             for i in manifest.get('ingredients', [])]
+    return result
+
+
+@pytest.mark.parametrize('indent', [2, None])
+def test_mini_manifest_matches_full_decode(indent):
+    store = json.loads(bench_formatting.make_manifest_store_json(manifests=4, assertions=8, ingredients=3))
+    text = json.dumps(store, indent=indent)
+
+    result = manifest_json.mini_manifest(text, assertion_used)
+    assert result == _reference(store)
+    assert [a['label'] for a in result['assertions']] == ['c2pa.actions.v2', 'stds.schema-org.CreativeWork']
+    # Reordered: active_manifest after the manifests, data before label
+    store = {'manifests': store['manifests'], 'active_manifest': 'urn:c2pa:1'}
+    for assertion in store['manifests']['urn:c2pa:1']['assertions']:
+        assertion['data'] = assertion.pop('data')
+        assertion['label'] = assertion.pop('label')
+    assert manifest_json.mini_manifest(json.dumps(store, indent=indent), assertion_used) == _reference(store)
+
+
+def test_mini_manifest_from_reader():
+    signed = make_signed_jpeg(ingredient=make_signed_jpeg(author='Someone Else'))
+    reader = c2pa.Reader('image/jpeg', io.BytesIO(signed))
+    try:
+        text = reader.json()
+    finally:
+        reader.close()
+
+    result = manifest_json.mini_manifest(text, assertion_used)
+    assert result == _reference(json.loads(text))
+    assert result['ingredients'][0]['relationship'] == 'parentOf'
+
+
+def test_skip_value():
+    text = '{"a": [1, "x]}\\"", {"b": {}}], "c": -1.5e3, "d": true}'
+    assert manifest_json.skip_value(text, 0) == len(text)
+    assert manifest_json.skip_value(text, text.index('[')) == text.index(', "c"')
+    assert manifest_json.skip_value(text, text.index('-')) == text.index(', "d"')
+    deep = '[' * 40 + ']' * 40
+    assert manifest_json.skip_value(deep, 0) == len(deep)
+
+
+def test_missing_or_malformed():
+    assert manifest_json.mini_manifest('{"manifests": {}}', assertion_used) is None
+    assert manifest_json.mini_manifest('{"active_manifest": "x", "manifests": {"y": {}}}', assertion_used) is None
+    for text in ('', '[]', '{"active_manifest": "x", "manifests": {"x": {"assertions": [}}}'):
+        with pytest.raises(ValueError):
+            manifest_json.mini_manifest(text, assertion_used)
+
+
+def test_c2pa_mini_skips_thumbnails(signed_jpeg, monkeypatch):
+    monkeypatch.setattr(server, 'c2pa_pool', None)
+    resources = []
+    real = c2pa.Reader.resource_to_stream
+    monkeypatch.setattr(c2pa.Reader, 'resource_to_stream',
+                        lambda self, *args: resources.append(args) or real(self, *args))
+
+    data = server.extract_c2pa_minimal(signed_jpeg)
+    assert data['author_info']['author'][0]['name'] == 'Jane Doe'
+    assert data['signature_info']['issuer'] == 'Test Org'
+    assert resources == []
@@ -0,0 +1,116 @@
+import asyncio
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+from starlette.requests import ClientDisconnect
+
+import server
+from images import make_signed_jpeg
+
+
+@pytest.fixture
+def client():
+    return TestClient(server.app)
+
+
+def test_combined_result_matches_separate_endpoints(client, origin):
+    url = origin.add('/photo.jpg', make_signed_jpeg())
+    combined = client.get('/api/metadata', params={'uri': url}).json()
+    downloads = len(origin.requests)
+
+    exif = client.get('/api/exif_metadata', params={'uri': url}).json()['photo.jpg']
+    c2pa_result = client.get('/api/c2pa_metadata', params={'uri': url}).json()
+
+    assert downloads == 1
+    for key in ('filename', 'width', 'height', 'photography', 'exif', 'gps', 'iptc'):
+        assert combined[key] == exif[key]
+    for key in ('provenance', 'c2pa_data', 'author_info', 'thumbnails', 'digital_source_type'):
+        assert combined[key] == c2pa_result[key]
+
+
+def test_fields_select_stages(client, signed_jpeg, monkeypatch):
+    def fail(image):
+        raise AssertionError('unrequested stage ran')
+
+    monkeypatch.setattr(server, 'extract_c2pa_data', fail)
+    monkeypatch.setattr(server, 'extract_thumbnails_from_image', fail)
+    response = client.get('/api/metadata', params={'uri': signed_jpeg, 'fields': 'gps, EXIF'})
+
+    assert response.status_code == 200
+    assert set(response.json()) == {'filename', 'format', 'width', 'height', 'file_size_bytes',
+                                    'file_size_mb', 'exif', 'gps'}
+    assert response.headers['Server-Timing'].startswith('exif;dur=')
+
+
+def test_unknown_fields_are_rejected(client, signed_jpeg):
+    response = client.get('/api/metadata', params={'uri': signed_jpeg, 'fields': 'exif,colour'})
+
+    assert response.status_code == 400
+    assert 'colour' in response.json()['detail']
+
+
+def test_streamed_sections_merge_to_full_result(client, signed_jpeg):
+    full = client.get('/api/metadata', params={'uri': signed_jpeg}).json()
+    response = client.get('/api/metadata', params={'uri': signed_jpeg, 'stream': 'true'})
+
+    assert response.headers['Content-Type'] == 'application/x-ndjson'
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert lines[0] == {'filename': 'signed.jpg'}
+    assert len(lines) == 5
+    merged = {}
+    for line in lines:
+        merged.update(line)
+    assert merged == full
+    # The status is sent before the stages finish, so there is no ETag
+    assert 'ETag' not in response.headers
+    assert response.headers['Cache-Control'] == 'no-store'
+
+
+def test_stream_reports_stage_errors_per_section(client, signed_jpeg, monkeypatch):
+    def fail(image):
+        raise RuntimeError('broken manifest')
+
+    monkeypatch.setattr(server, 'extract_c2pa_data', fail)
+    response = client.get('/api/metadata', params={'uri': signed_jpeg, 'fields': 'provenance,exif',
+                                                   'stream': 'true'})
+
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert {'section': 'c2pa', 'error': 'broken manifest'} in lines
+    assert any('exif' in line for line in lines)
+
+
+def test_stream_releases_the_download_when_the_body_never_starts(origin, tmp_path, monkeypatch):
+    url = origin.add('/photo.jpg', make_signed_jpeg())
+    scratch = tmp_path / 'scratch'
+    scratch.mkdir()
+    monkeypatch.setattr('tempfile.tempdir', str(scratch))
+
+    async def gone(message):
+        raise OSError('client went away')
+
+    async def respond():
+        response = await server._stream_metadata(url, server.METADATA_FIELDS, False)
+        assert list(scratch.iterdir())
+        with pytest.raises(ClientDisconnect):
+            await response({'type': 'http', 'asgi': {'spec_version': '2.4'}}, None, gone)
+
+    asyncio.run(respond())
+    assert list(scratch.iterdir()) == []
+
+
+def test_stream_reports_unreadable_manifest(client, corrupt_jpeg):
+    response = client.get('/api/metadata', params={'uri': corrupt_jpeg, 'stream': 'true'})
+
+    assert response.status_code == 200
+    assert 'ETag' not in response.headers
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    errors = [line for line in lines if 'error' in line]
+    assert sorted(line['section'] for line in errors) == ['c2pa', 'thumbnails']
+    merged = {}
+    for line in lines:
+        if 'error' not in line:
+            merged.update(line)
+    assert merged['provenance'] == []
+    assert 'exif' in merged and 'iptc' in merged
+    assert server.content_cache.get(server.hash_file(corrupt_jpeg), 'c2pa') is server.MISSING
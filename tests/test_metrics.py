@@ -0,0 +1,95 @@
+import re
+
+import pytest
+from fastapi.testclient import TestClient
+
+import server
+from images import make_signed_jpeg
+from metrics import Registry
+
+
+@pytest.fixture
+def client():
+    return TestClient(server.app)
+
+
+def scrape(client) -> dict:
+    """Samples of /metrics as {'name{labels}': value}."""
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.headers['Content-Type'].startswith('text/plain')
+    samples = {}
+    for line in response.text.splitlines():
+        if line and not line.startswith('#'):
+            name, value = line.rsplit(' ', 1)
+            samples[name] = float(value)
+    return samples
+
+
+def test_exposition_format():
+    registry = Registry()
+    requests = registry.counter('requests_total', 'Requests.', ('path',))
+    latency = registry.histogram('latency_seconds', 'Latency.', buckets=(0.1, 1))
+    requests.inc(path='/a"b')
+    requests.inc(2, path='/a"b')
+    latency.observe(0.05)
+    latency.observe(0.1)
+    latency.observe(3)
+
+    lines = registry.render().splitlines()
+    assert '# TYPE requests_total counter' in lines
+    assert 'requests_total{path="/a\\"b"} 3' in lines
+    assert 'latency_seconds_bucket{le="0.1"} 2' in lines
+    assert 'latency_seconds_bucket{le="1"} 2' in lines
+    assert 'latency_seconds_bucket{le="+Inf"} 3' in lines
+    assert 'latency_seconds_sum 3.15' in lines
+    assert 'latency_seconds_count 3' in lines
+    with pytest.raises(ValueError):
+        requests.inc(method='GET')
+
+
+def test_requests_stages_and_downloads_are_counted(client, origin):
+    url = origin.add('/metered.jpg', make_signed_jpeg())
+    origin_label = re.match(r'https?://[^/]+', url).group(0)
+    before = scrape(client)
+    thumbnails = client.get('/api/metadata', params={'uri': url}).json()['thumbnails']
+    client.get(thumbnails['claim_thumbnail'].removeprefix('/c2pa'))
+    after = scrape(client)
+
+    def delta(name):
+        return after.get(name, 0) - before.get(name, 0)
+
+    assert delta('c2pa_http_requests_total{endpoint="/api/metadata",method="GET",status="200"}') == 1
+    assert delta('c2pa_http_requests_total{endpoint="/api/thumbnail/{content_hash}/{kind}",method="GET",status="200"}') == 1
+    assert delta('c2pa_http_request_duration_seconds_count{endpoint="/api/metadata"}') == 1
+    for stage in ('download', 'c2pa_read', 'c2pa', 'exif', 'iptc', 'thumbnails'):
+        assert delta(f'c2pa_stage_duration_seconds_count{{stage="{stage}"}}') >= 1, stage
+    # Formatting is observed once per response, not per formatting helper
+    assert delta('c2pa_stage_duration_seconds_count{stage="format"}') == 1
+    assert delta(f'c2pa_download_bytes_total{{origin="{origin_label}"}}') == origin.bytes_sent
+    # The thumbnail was served from the content cache
+    assert delta('c2pa_cache_hits_total{cache="content",tier="memory"}') >= 1
+    assert after['c2pa_http_requests_in_flight{endpoint="/metrics"}'] == 1
+    assert 'c2pa_executor_queue_depth' in after
+
+
+def test_format_is_observed_for_cached_results(client, signed_jpeg):
+    before = scrape(client)
+    for _ in range(3):
+        client.get('/api/metadata', params={'uri': signed_jpeg})
+    after = scrape(client)
+
+    key = 'c2pa_stage_duration_seconds_count{stage="format"}'
+    assert after[key] - before.get(key, 0) == 3
+    # The stages ran once; later requests were served from the content cache
+    key = 'c2pa_stage_duration_seconds_count{stage="c2pa"}'
+    assert after[key] - before.get(key, 0) == 1
+
+
+def test_mini_cache_hit_ratio(client, signed_jpeg):
+    for _ in range(4):
+        client.get('/api/c2pa_mini', params={'uri': signed_jpeg})
+    stats = server._mini_cache.stats()
+    lookups = stats['hits'] + stats['misses']
+
+    assert scrape(client)['c2pa_cache_hit_ratio{cache="mini"}'] == round(stats['hits'] / lookups, 4)
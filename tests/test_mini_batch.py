@@ -0,0 +1,88 @@
+import asyncio
+import json
+
+import pytest
+from fastapi import HTTPException
+
+import config
+import server
+from images import make_plain_jpeg, make_signed_jpeg
+
+
+def run_batch(uris):
+    async def scenario():
+        response = await server.get_c2pa_mini_batch(uris=uris)
+        assert response.media_type == 'application/x-ndjson'
+        return [json.loads(line) async for line in response.body_iterator]
+
+    return asyncio.run(scenario())
+
+
+def test_streams_one_line_per_uri(origin, signed_jpeg):
+    plain = origin.add('/plain.jpg', make_plain_jpeg())
+    remote_signed = origin.add('/signed.jpg', make_signed_jpeg())
+    uris = [signed_jpeg, plain, remote_signed, '/does/not/exist.jpg']
+
+    results = sorted(run_batch(uris), key=lambda item: item['index'])
+
+    assert [item['uri'] for item in results] == uris
+    assert results[0]['status'] == 'Authenticity Verified'
+    assert results[0]['creator'] == 'Jane Doe'
+    assert results[1]['status'] == 'Unverified'
+    assert results[2]['status'] == 'Authenticity Verified'
+    assert results[3]['status'] == 'Unverified'
+    assert results[3]['error'] == 'Image file not found'
+
+
+def test_matches_single_endpoint_and_uses_cache(signed_jpeg):
+    single = asyncio.run(server.get_c2pa_mini(uri=signed_jpeg))
+    hits_before = server._mini_cache.stats()['hits']
+
+    [item] = run_batch([signed_jpeg])
+
+    assert {k: v for k, v in item.items() if k not in ('index', 'uri')} == single
+    assert server._mini_cache.stats()['hits'] > hits_before
+
+
+def test_slow_origin_does_not_hold_up_the_rest(origin):
+    slow = origin.add('/slow.jpg', make_signed_jpeg(), delay=0.02)
+    fast = [origin.add(f'/fast{i}.jpg', make_plain_jpeg(color=(i, i, i))) for i in range(4)]
+
+    results = run_batch([slow] + fast)
+
+    assert results[-1]['uri'] == slow
+    assert {item['uri'] for item in results[:-1]} == set(fast)
+
+
+def test_limits_concurrency_per_batch(origin, monkeypatch):
+    monkeypatch.setattr(config, 'MINI_BATCH_CONCURRENCY', 2)
+    active = {'now': 0, 'max': 0}
+    real_extract = server.extract_c2pa_minimal
+
+    def tracking_extract(image):
+        active['now'] += 1
+        active['max'] = max(active['max'], active['now'])
+        try:
+            return real_extract(image)
+        finally:
+            active['now'] -= 1
+
+    monkeypatch.setattr(server, 'extract_c2pa_minimal', tracking_extract)
+    uris = [origin.add(f'/img{i}.jpg', make_plain_jpeg(color=(i, 0, 0)), delay=0.005)
+            for i in range(8)]
+
+    results = run_batch(uris)
+
+    assert len(results) == 8
+    assert active['max'] <= 2
+
+
+def test_rejects_empty_and_oversized_batches(monkeypatch):
+    with pytest.raises(HTTPException) as excinfo:
+        asyncio.run(server.get_c2pa_mini_batch(uris=[]))
+    assert excinfo.value.status_code == 400
+
+    monkeypatch.setattr(config, 'MINI_BATCH_MAX_URIS', 2)
+    with pytest.raises(HTTPException) as excinfo:
+        asyncio.run(server.get_c2pa_mini_batch(uris=['a', 'b', 'c']))
+    assert excinfo.value.status_code == 413
@@ -0,0 +1,53 @@
+import multiprocessing
+import os
+
+import pytest
+
+
+def _worker(uri, forbid_extraction, results):
+    """Serve /api/c2pa_metadata once, as a freshly started web worker would."""
+    import asyncio
+
+    import config
+    import server
+
+    if forbid_extraction:
+        def fail(image):
+            raise AssertionError('extraction re-run')
+
+        server.extract_c2pa_data = fail
+        server.extract_thumbnails_from_image = fail
+    try:
+        response = asyncio.run(server.get_c2pa_metadata(uri=uri))
+        results.put((os.getpid(), config.DISK_CACHE_PATH, server.content_cache._cache.memory.max_bytes,
+                     response['c2pa_data']))
+    except Exception as e:
+        results.put((os.getpid(), None, None, repr(e)))
+
+
+@pytest.fixture
+def worker_env(tmp_path, monkeypatch):
+    """Environment of `python serve.py` with two web workers."""
+    monkeypatch.setenv('C2PA_WEB_WORKERS', '2')
+    monkeypatch.setenv('C2PA_PROCESS_WORKERS', '0')
+    monkeypatch.setenv('TMPDIR', str(tmp_path))
+    monkeypatch.delenv('C2PA_DISK_CACHE_PATH', raising=False)
+    return tmp_path
+
+
+def test_result_cached_by_one_worker_is_a_hit_in_another(worker_env, signed_jpeg):
+    ctx = multiprocessing.get_context('spawn')
+    results = ctx.Queue()
+    answers = []
+    for forbid_extraction in (False, True):
+        worker = ctx.Process(target=_worker, args=(signed_jpeg, forbid_extraction, results))
+        worker.start()
+        answers.append(results.get(timeout=60))
+        worker.join(timeout=10)
+
+    (first_pid, disk_path, memory_budget, first), (second_pid, _, _, second) = answers
+    assert first_pid != second_pid
+    assert disk_path == str(worker_env / 'c2pa-cache.sqlite3')
+    assert memory_budget == 16 * 1024 * 1024 // 2
+    assert isinstance(second, dict), second
+    assert second == first
@@ -0,0 +1,42 @@
+import asyncio
+import io
+
+from fastapi import UploadFile
+
+import server
+
+
+def test_c2pa_metadata_parses_manifest_once(signed_jpeg, reader_count):
+    response = asyncio.run(server.get_c2pa_metadata(uri=signed_jpeg))
+    assert response['c2pa_data']['author_info']['author'][0]['name'] == 'Jane Doe'
+    assert response['thumbnails'].get('claim_thumbnail')
+    assert reader_count['reader'] == 1
+
+
+def test_c2pa_mini_parses_manifest_once(signed_jpeg, reader_count):
+    response = asyncio.run(server.get_c2pa_mini(uri=signed_jpeg))
+    assert response['creator'] == 'Jane Doe'
+    assert reader_count['reader'] == 1
+
+
+def test_exif_metadata_opens_container_once(exif_jpeg, reader_count):
+    asyncio.run(server.get_exif_metadata(uri=exif_jpeg))
+    assert reader_count['image_open'] == 1
+    assert reader_count['reader'] == 0
+
+
+def test_upload_parses_everything_once(signed_jpeg, reader_count):
+    with open(signed_jpeg, 'rb') as f:
+        upload = UploadFile(io.BytesIO(f.read()), filename='signed.jpg')
+    response = asyncio.run(server.upload_image(file=upload))
+    metadata = response['signed.jpg']
+    assert metadata['photography']['camera_make'] == 'FUJIFILM'
+    assert metadata['provenance']
+    assert reader_count['reader'] == 1
+    assert reader_count['image_open'] == 1
+
+
+def test_extractors_still_accept_paths(signed_jpeg):
+    assert server.extract_c2pa_data(signed_jpeg)['basic_info']['title'] == 'signed.jpg'
+    assert server.extract_exif_metadata(signed_jpeg)['width'] == 64
+    assert 'claim_thumbnail' in server.extract_thumbnails_from_image(signed_jpeg)
@@ -0,0 +1,171 @@
+import asyncio
+import io
+import os
+
+import pytest
+from PIL import Image
+
+import config
+import containers
+import server
+from downloader import Downloader
+from images import make_exif_jpeg, make_plain_jpeg, make_signed_jpeg
+
+
+@pytest.fixture(scope='module')
+def large_signed_jpeg():
+    """A signed JPEG of a few megabytes, its manifest carrying a thumbnail."""
+    buf = io.BytesIO()
+    blotches = Image.frombytes('RGB', (40, 30), os.urandom(40 * 30 * 3))
+    blotches.resize((3000, 2250), Image.BICUBIC).save(buf, 'JPEG', quality=100)
+    return make_signed_jpeg(source=buf.getvalue())
+
+
+def mini(uri):
+    return asyncio.run(server.get_c2pa_mini(uri=uri))
+
+
+def test_scan_stops_at_pixel_data(large_signed_jpeg):
+    scan = containers.scan_header(large_signed_jpeg)
+    assert scan.complete
+    assert scan.segments[-1].kind == 0xDA
+    assert scan.segments[-1].end == scan.header_end
+    assert containers.has_c2pa_manifest(scan)
+    assert scan.header_end < len(large_signed_jpeg) // 10
+
+    assert not containers.has_c2pa_manifest(containers.scan_header(make_plain_jpeg()))
+    assert containers.scan_header(b'GIF89a...') is None
+
+
+def test_truncated_prefix_reports_bytes_needed(large_signed_jpeg):
+    needed = containers.manifest_bytes_needed(large_signed_jpeg[:100])
+    assert 100 < needed
+    # Growing the prefix to what was asked for always makes progress
+    prefix_len = 100
+    while needed:
+        assert needed > prefix_len
+        prefix_len = needed
+        needed = containers.manifest_bytes_needed(large_signed_jpeg[:prefix_len])
+    assert prefix_len == containers.scan_header(large_signed_jpeg).header_end
+    assert containers.header_only_image(large_signed_jpeg[:prefix_len]) is not None
+
+
+def test_header_only_png_is_well_formed():
+    buf = io.BytesIO()
+    Image.new('RGB', (32, 32), (1, 2, 3)).save(buf, 'PNG')
+    data = buf.getvalue()
+    header = containers.header_only_image(data)
+    assert header.startswith(containers.PNG_SIGNATURE)
+    assert header.endswith(containers.PNG_IEND)
+    assert b'IDAT' not in header
+
+
+def test_mini_fetches_only_the_header(origin, large_signed_jpeg, signed_jpeg):
+    url = origin.add('/large.jpg', large_signed_jpeg)
+
+    result = mini(url)
+
+    assert result['status'] == mini(signed_jpeg)['status'] == 'Authenticity Verified'
+    assert result['creator'] == 'Jane Doe'
+    assert all('Range' in headers for _, headers in origin.requests)
+    header_end = containers.scan_header(large_signed_jpeg).header_end
+    assert origin.bytes_sent <= max(config.RANGE_INITIAL_BYTES, 2 * header_end)
+    assert origin.bytes_sent < len(large_signed_jpeg) // 10
+
+
+def test_range_widens_until_header_is_covered(origin, large_signed_jpeg, monkeypatch):
+    monkeypatch.setattr(config, 'RANGE_INITIAL_BYTES', 1024)
+    url = origin.add('/large.jpg', large_signed_jpeg)
+
+    result = mini(url)
+
+    assert result['status'] == 'Authenticity Verified'
+    assert len(origin.requests) > 1
+    header_end = containers.scan_header(large_signed_jpeg).header_end
+    assert origin.bytes_sent < 2 * header_end + 1024
+
+
+def test_falls_back_to_full_download_without_range_support(origin, large_signed_jpeg):
+    origin.ranges = False
+    url = origin.add('/large.jpg', large_signed_jpeg)
+
+    assert mini(url)['status'] == 'Authenticity Verified'
+    assert len(origin.requests) == 2
+    # The first response was abandoned once it overran the range
+    assert origin.bytes_sent <= 2 * len(large_signed_jpeg)
+
+
+def test_falls_back_when_header_exceeds_range_limit(origin, large_signed_jpeg, monkeypatch):
+    monkeypatch.setattr(config, 'RANGE_INITIAL_BYTES', 1024)
+    monkeypatch.setattr(config, 'RANGE_MAX_BYTES', 4096)
+    url = origin.add('/large.jpg', large_signed_jpeg)
+
+    assert mini(url)['status'] == 'Authenticity Verified'
+    assert 'Range' not in origin.requests[-1][1]
+
+
+def test_short_range_responses_are_not_taken_for_the_whole_image(origin, signed_jpeg):
+    with open(signed_jpeg, 'rb') as f:
+        body = f.read()
+    origin.range_limit = 1000
+    url = origin.add('/short.jpg', body)
+
+    dest = io.BytesIO()
+    result, prefix = Downloader().download_prefix(url, dest, containers.manifest_bytes_needed,
+                                                  initial_bytes=4096)
+    fetched = prefix if prefix is not None else dest.getvalue()
+    assert len(fetched) > 1000
+    assert body.startswith(fetched)
+    assert mini(url)['status'] == 'Authenticity Verified'
+
+
+def test_small_and_unknown_images(origin):
+    plain = origin.add('/plain.jpg', make_plain_jpeg())
+    other = origin.add('/image.gif', b'GIF89a' + b'\x00' * 100, content_type='image/gif')
+
+    assert mini(plain)['status'] == 'Unverified'
+    assert mini(other)['status'] == 'Unverified'
+
+
+@pytest.fixture(scope='module')
+def large_exif_jpeg():
+    """A multi-megabyte JPEG with EXIF, GPS, IPTC and an ICC profile."""
+    blotches = Image.frombytes('RGB', (40, 30), os.urandom(40 * 30 * 3))
+    return make_exif_jpeg(icc=True, source=blotches.resize((3000, 2250), Image.BICUBIC))
+
+
+def exif_metadata(uri):
+    [entry] = asyncio.run(server.get_exif_metadata(uri=uri)).values()
+    return entry
+
+
+def test_exif_metadata_from_header_matches_full_read(origin, large_exif_jpeg, tmp_path, monkeypatch):
+    url = origin.add('/large.jpg', large_exif_jpeg)
+    header = exif_metadata(url)
+
+    monkeypatch.setattr(config, 'HEADER_ONLY_FETCH', 0)
+    server.content_cache.clear()
+    local = tmp_path / 'large.jpg'
+    local.write_bytes(large_exif_jpeg)
+    full = exif_metadata(str(local))
+
+    assert header == full
+    assert header['width'] == 3000
+    assert header['file_size_bytes'] == len(large_exif_jpeg)
+    assert header['iptc']['city'] == 'Belgrade'
+    assert header['gps']
+    assert header['photography']['color_profile']
+    assert origin.bytes_sent <= config.RANGE_INITIAL_BYTES < len(large_exif_jpeg) // 5
+
+
+def test_exif_metadata_of_local_file_reads_only_the_header(large_exif_jpeg, tmp_path, monkeypatch):
+    local = tmp_path / 'large.jpg'
+    local.write_bytes(large_exif_jpeg)
+
+    def hash_file(path):
+        raise AssertionError('whole file hashed')
+
+    monkeypatch.setattr(server, 'hash_file', hash_file)
+    entry = exif_metadata(str(local))
+    assert entry['exif']['Make'] == 'FUJIFILM'
+    assert entry['file_size_bytes'] == len(large_exif_jpeg)
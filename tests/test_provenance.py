@@ -0,0 +1,97 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import provenance
+import server
+from images import make_signed_jpeg
+
+
+def _manifest(*ingredients, action='c2pa.edited'):
+    return {
+        'claim_generator': 'test/1.0',
+        'signature_info': {'issuer': 'Test Org', 'time': '2025-03-02T11:19:14+00:00'},
+        'thumbnail': {'format': 'image/jpeg', 'identifier': 'self#jumbf=c2pa.thumbnail.claim'},
+        'assertions': [{'label': 'c2pa.actions.v2', 'data': {'actions': [{'action': action}]}}],
+        'ingredients': [{'title': f'{label}.jpg', 'relationship': 'componentOf', 'active_manifest': label}
+                        for label in ingredients],
+    }
+
+
+def _store():
+    # a -> b, c; b -> d; c -> d, plain; d -> e
+    manifests = {
+        'a': _manifest('b', 'c'),
+        'b': _manifest('d'),
+        'c': _manifest('d'),
+        'd': _manifest('e'),
+        'e': _manifest(action='c2pa.created'),
+    }
+    manifests['c']['ingredients'].append({'title': 'plain.png', 'format': 'image/png', 'relationship': 'componentOf'})
+    return {'active_manifest': 'a', 'manifests': manifests}
+
+
+def test_shared_manifests_appear_once():
+    graph = provenance.build_graph(_store(), max_depth=10)
+
+    assert [(node['label'], node['depth']) for node in graph['nodes']] == [
+        ('a', 0), ('b', 1), ('c', 1), ('d', 2), ('e', 3)]
+    assert [(edge['from'], edge['manifest']) for edge in graph['edges']] == [
+        ('a', 'b'), ('a', 'c'), ('b', 'd'), ('c', 'd'), ('c', None), ('d', 'e')]
+    assert graph['nodes'][4]['actions'][0]['action'] == 'c2pa.created'
+    assert graph['nodes'][0]['signer']['issuer'] == 'Test Org'
+    assert graph['nodes'][0]['thumbnail']['identifier'] == 'self#jumbf=c2pa.thumbnail.claim'
+    assert not graph['truncated']
+
+
+def test_cycles_and_missing_manifests():
+    store = {'active_manifest': 'a', 'manifests': {'a': _manifest('b', 'gone'), 'b': _manifest('a')}}
+    graph = provenance.build_graph(store, max_depth=10)
+
+    assert [node['label'] for node in graph['nodes']] == ['a', 'b']
+    assert [edge['manifest'] for edge in graph['edges']] == ['b', None, 'a']
+    assert provenance.build_graph({'manifests': {}}, 10) is None
+    assert provenance.build_graph(None, 10) is None
+
+
+@pytest.mark.parametrize('depth', [0, 1, 2, 3])
+def test_limit_depth_matches_a_shallower_build(depth):
+    full = provenance.build_graph(_store(), max_depth=10)
+    assert provenance.limit_depth(full, depth) == provenance.build_graph(_store(), max_depth=depth)
+    # e, the last manifest, is 3 links deep
+    assert provenance.build_graph(_store(), max_depth=depth)['truncated'] == (depth < 3)
+
+
+def test_long_chain_is_linear():
+    manifests = {str(n): _manifest(str(n + 1), str(n + 1)) for n in range(2000)}
+    manifests['2000'] = _manifest()
+    graph = provenance.build_graph({'active_manifest': '0', 'manifests': manifests}, max_depth=5000)
+
+    assert len(graph['nodes']) == 2001
+    assert len(graph['edges']) == 4000
+
+
+def test_endpoint(image_dir, plain_jpeg):
+    client = TestClient(server.app)
+    grandparent = make_signed_jpeg(title='grandparent.jpg', author='A')
+    parent = make_signed_jpeg(title='parent.jpg', ingredient=grandparent)
+    path = image_dir / 'chain.jpg'
+    path.write_bytes(make_signed_jpeg(title='child.jpg', ingredient=parent))
+
+    response = client.get('/api/provenance_graph', params={'uri': str(path)})
+    graph = response.json()['graph']
+    assert [node['title'] for node in graph['nodes']] == ['child.jpg', 'parent.jpg', 'grandparent.jpg']
+    assert graph['nodes'][0]['claim_generator'] == 'test_suite/1.0'
+    assert [edge['relationship'] for edge in graph['edges']] == ['parentOf', 'parentOf']
+    assert response.headers['Server-Timing'].startswith('provenance;dur=')
+
+    shallow = client.get('/api/provenance_graph', params={'uri': str(path), 'max_depth': 1})
+    assert [node['depth'] for node in shallow.json()['graph']['nodes']] == [0, 1]
+    assert shallow.json()['graph']['truncated']
+    assert shallow.headers['ETag'] != response.headers['ETag']
+    cached = client.get('/api/provenance_graph', params={'uri': str(path)},
+                        headers={'If-None-Match': response.headers['ETag']})
+    assert cached.status_code == 304
+
+    assert client.get('/api/provenance_graph', params={'uri': plain_jpeg}).json() == {'graph': None}
+    too_deep = client.get('/api/provenance_graph', params={'uri': str(path), 'max_depth': 10_000})
+    assert too_deep.status_code == 422
@@ -0,0 +1,73 @@
+import asyncio
+
+import server
+from images import make_plain_jpeg, make_signed_jpeg
+
+
+def mini(uri):
+    return asyncio.run(server.get_c2pa_mini(uri=uri))
+
+
+def c2pa_metadata(uri):
+    return asyncio.run(server.get_c2pa_metadata(uri=uri))
+
+
+def test_expired_mini_response_is_revalidated(origin):
+    url = origin.add('/signed.jpg', make_signed_jpeg())
+    first = mini(url)
+    sent = origin.bytes_sent
+
+    # The per-URI response expired; the extraction result is still cached
+    server._mini_cache.clear()
+    second = mini(url)
+
+    assert second == first
+    assert origin.requests[-1][1]['If-None-Match']
+    assert origin.bytes_sent == sent
+
+
+def test_changed_image_is_downloaded_again(origin):
+    url = origin.add('/image.jpg', make_plain_jpeg())
+    assert mini(url)['status'] == 'Unverified'
+
+    origin.add('/image.jpg', make_signed_jpeg())
+    server._mini_cache.clear()
+
+    assert mini(url)['status'] == 'Authenticity Verified'
+    assert origin.requests[-1][1].get('If-None-Match')
+
+
+def test_c2pa_metadata_revalidates_with_last_modified(origin):
+    origin.etags = False
+    url = origin.add('/signed.jpg', make_signed_jpeg())
+    first = c2pa_metadata(url)
+    sent = origin.bytes_sent
+
+    second = c2pa_metadata(url)
+
+    assert second == first
+    headers = origin.requests[-1][1]
+    assert headers['If-Modified-Since'] == 'Wed, 21 Oct 2015 07:28:00 GMT'
+    assert 'If-None-Match' not in headers
+    assert origin.bytes_sent == sent
+
+
+def test_no_conditional_request_once_results_are_gone(origin):
+    url = origin.add('/signed.jpg', make_signed_jpeg())
+    c2pa_metadata(url)
+
+    server.content_cache.clear()
+    c2pa_metadata(url)
+
+    headers = origin.requests[-1][1]
+    assert 'If-None-Match' not in headers and 'If-Modified-Since' not in headers
+
+
+def test_origin_without_validators_is_not_revalidated(origin):
+    origin.etags = origin.last_modified = False
+    url = origin.add('/signed.jpg', make_signed_jpeg())
+    c2pa_metadata(url)
+    c2pa_metadata(url)
+
+    assert len(server.origin_validators) == 0
+    assert 'If-Modified-Since' not in origin.requests[-1][1]
@@ -0,0 +1,96 @@
+import asyncio
+
+import pytest
+
+import server
+from images import make_signed_jpeg
+from singleflight import SingleFlight
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight()
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {'value': 42}
+
+    async def scenario():
+        return await asyncio.gather(*(flight.do('k', work) for _ in range(10)))
+
+    results = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert all(r == {'value': 42} for r in results)
+    assert flight.stats() == {'in_flight': 0, 'started': 1, 'coalesced': 9}
+
+
+def test_errors_reach_every_waiter():
+    flight = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError('boom')
+
+    async def scenario():
+        return await asyncio.gather(*(flight.do('k', fail) for _ in range(3)),
+                                    return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert all(isinstance(r, ValueError) for r in results)
+
+
+def test_cancelled_waiter_does_not_cancel_shared_call():
+    flight = SingleFlight()
+
+    async def work():
+        await asyncio.sleep(0.05)
+        return 'done'
+
+    async def scenario():
+        first = asyncio.ensure_future(flight.do('k', work))
+        second = asyncio.ensure_future(flight.do('k', work))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(scenario()) == 'done'
+
+
+@pytest.mark.parametrize('endpoint', ['get_c2pa_mini', 'get_c2pa_metadata', 'get_exif_metadata'])
+def test_concurrent_identical_uris_download_once(origin, reader_count, endpoint):
+    url = origin.add('/viral.jpg', make_signed_jpeg(), delay=0.001)
+    handler = getattr(server, endpoint)
+
+    async def scenario():
+        return await asyncio.gather(*(handler(uri=url) for _ in range(20)))
+
+    results = asyncio.run(scenario())
+    assert all(r == results[0] for r in results)
+    assert len(origin.requests) == 1
+    assert reader_count['reader'] <= 1
+
+
+def test_same_bytes_under_different_uris_extract_once(origin, monkeypatch):
+    body = make_signed_jpeg()
+    urls = [origin.add(f'/copy{i}.jpg', body) for i in range(5)]
+    calls = {'c2pa': 0, 'thumbnails': 0}
+
+    def counted(stage, extractor):
+        def wrapper(image):
+            calls[stage] += 1
+            return extractor(image)
+        return wrapper
+
+    monkeypatch.setattr(server, 'extract_c2pa_data', counted('c2pa', server.extract_c2pa_data))
+    monkeypatch.setattr(server, 'extract_thumbnails_from_image',
+                        counted('thumbnails', server.extract_thumbnails_from_image))
+
+    async def scenario():
+        return await asyncio.gather(*(server.get_c2pa_metadata(uri=u) for u in urls))
+
+    results = asyncio.run(scenario())
+    assert all(r['provenance'] == results[0]['provenance'] for r in results)
+    # Every URI is downloaded, but each stage runs once for the shared bytes
+    assert len(origin.requests) == 5
+    assert calls == {'c2pa': 1, 'thumbnails': 1}
@@ -0,0 +1,93 @@
+import json
+
+from source_types import DIGITAL_SOURCE_TYPE_LABELS, Rule, SourceTypeClassifier
+
+
+def _data(claim_generator='Lightroom', assertions=(), actions=(), ingredients=()):
+    return {
+        'basic_info': {'claim_generator': claim_generator},
+        'assertions': list(assertions),
+        'actions': list(actions),
+        'ingredients': list(ingredients),
+    }
+
+
+def _actions_assertion(*actions):
+    return {'label': 'c2pa.actions.v2', 'data': {'actions': list(actions)}}
+
+
+def test_builtin_rules():
+    classify = SourceTypeClassifier().classify
+
+    assert classify({}) == (None, None)
+    assert classify(_data()) == (None, None)
+    assert classify(_data(claim_generator='Adobe Firefly 3')) == ('trainedAlgorithmicMedia', 'Generative AI')
+    assert classify(_data(actions=[{'action': 'c2pa.edited', 'softwareAgent': 'Lightroom',
+                                    'parameters': {'com.adobe.type': 'TEXT_TO_IMAGE'}}]))[0] == 'trainedAlgorithmicMedia'
+    # C2PA 2.x agents are objects
+    assert classify(_data(actions=[{'action': 'c2pa.edited',
+                                    'softwareAgent': {'name': 'Midjourney'}}]))[0] == 'trainedAlgorithmicMedia'
+    assert classify(_data(ingredients=[{'format': 'image/png', 'title': 'IMG_1.DNG'}])) == (
+        'digitalCapture', 'Digital Camera (RAW)')
+    assert classify(_data(ingredients=[{'format': 'image/jpeg', 'title': 'a.jpg'}])) == (
+        'digitalCapture', 'Digital Camera')
+    assert classify(_data(actions=[{'action': 'c2pa.opened'}])) == ('digitalCapture', 'Digital Camera')
+
+
+def test_earliest_action_then_earliest_rule_wins():
+    classifier = SourceTypeClassifier((
+        Rule('parameter_value', 'compositeSynthetic', keywords=('composite',)),
+        Rule('action', 'screenCapture', keywords=('capture',)),
+    ))
+    actions = [
+        {'action': 'c2pa.opened'},
+        {'action': 'c2pa.capture', 'parameters': {'kind': 'composite'}},
+        {'action': 'c2pa.capture'},
+    ]
+    assert classifier.classify(_data(actions=actions)) == ('compositeSynthetic', 'Composite (Synthetic)')
+    assert classifier.classify(_data(actions=[actions[2], actions[1]]))[0] == 'screenCapture'
+
+
+def test_declared_type_after_assertion_actions():
+    generative = _actions_assertion({'action': 'c2pa.edited', 'softwareAgent': 'Generative Fill'})
+    declared = {'label': 'stds.iptc.photo-metadata', 'data': {'digitalSourceType': 'screenCapture'}}
+    classify = SourceTypeClassifier().classify
+
+    assert classify(_data(assertions=[declared, generative])) == ('screenCapture', 'Screen Capture')
+    assert classify(_data(assertions=[generative, declared]))[0] == 'trainedAlgorithmicMedia'
+
+
+def test_fields_lowercasing_to_longer_strings_keep_positions():
+    # 'İ' lower-cases to two characters
+    ingredients = [{'format': 'İİİİ', 'title': 'İİİİ.png'}, {'format': 'image/png', 'title': 'x.dng'}]
+    assert SourceTypeClassifier().classify(_data(ingredients=ingredients)) == (
+        'digitalCapture', 'Digital Camera (RAW)')
+
+
+def test_rules_from_file(tmp_path):
+    path = tmp_path / 'rules.json'
+    path.write_text(json.dumps({
+        'rules': [
+            {'field': 'software_agent', 'code': 'trainedAlgorithmicMedia', 'keywords': 'Imagen'},
+            {'field': 'ingredient_title', 'code': 'negativeFilm', 'pattern': r'^scan_\d+'},
+        ],
+        'labels': {'negativeFilm': 'Film'},
+    }))
+    classifier = SourceTypeClassifier.from_file(str(path))
+
+    assert classifier.classify(_data(actions=[{'action': 'c2pa.created', 'softwareAgent': 'Google Imagen'}]))[0] == (
+        'trainedAlgorithmicMedia')
+    assert classifier.classify(_data(ingredients=[{'format': 'image/jpeg', 'title': 'SCAN_0042.jpg'}])) == (
+        'negativeFilm', 'Film')
+    # Built-in rules still apply after them
+    assert classifier.classify(_data(claim_generator='DALL-E'))[0] == 'trainedAlgorithmicMedia'
+
+
+def test_invalid_rules_file_is_ignored(tmp_path):
+    path = tmp_path / 'rules.json'
+    path.write_text(json.dumps({'rules': [{'field': 'nope', 'code': 'print', 'keywords': ['x']}]}))
+
+    for bad in (str(path), str(tmp_path / 'missing.json')):
+        classifier = SourceTypeClassifier.from_file(bad)
+        assert classifier.labels == DIGITAL_SOURCE_TYPE_LABELS
+        assert classifier.classify(_data(claim_generator='Firefly'))[0] == 'trainedAlgorithmicMedia'
@@ -0,0 +1,90 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import isolation
+import server
+
+
+@pytest.fixture
+def client():
+    return TestClient(server.app)
+
+
+def test_stages_run_concurrently(exif_jpeg):
+    running = set()
+    overlapped = threading.Event()
+
+    def slow(name):
+        def extract(image):
+            running.add(name)
+            if len(running) > 1:
+                overlapped.set()
+            overlapped.wait(timeout=2)
+            return name
+        return extract
+
+    async def run():
+        image = server.ParsedImage(exif_jpeg, 'f' * 64)
+        with image:
+            timings = {}
+            results = await server.run_stages(image, {'exif': slow('exif'), 'iptc': slow('iptc')}, timings)
+        return results, timings
+
+    started = time.perf_counter()
+    results, timings = asyncio.run(run())
+
+    assert results == {'exif': 'exif', 'iptc': 'iptc'}
+    assert overlapped.is_set()
+    assert time.perf_counter() - started < 2
+    assert set(timings) == {'exif', 'iptc'}
+    assert all(ms >= 0 for ms in timings.values())
+
+
+def test_slow_c2pa_read_does_not_hold_up_image_stages(signed_jpeg, monkeypatch):
+    monkeypatch.setattr(server, 'c2pa_pool', None)
+    real_read = isolation.read_c2pa
+
+    def slow_read(path):
+        time.sleep(1)
+        return real_read(path)
+
+    monkeypatch.setattr(isolation, 'read_c2pa', slow_read)
+
+    async def run():
+        timings = {}
+        # c2pa starts first, and holds the manifest until it is verified
+        with server.ParsedImage(signed_jpeg, 'e' * 64) as image:
+            results = await server.run_stages(image, {
+                'c2pa': server.extract_c2pa_data,
+                'exif': server.extract_exif_metadata,
+                'iptc': server.extract_iptc_data,
+            }, timings)
+        return results, timings
+
+    results, timings = asyncio.run(run())
+    assert results['c2pa']['basic_info']['title'] == 'signed.jpg'
+    assert results['exif']['exif']['Make'] == 'FUJIFILM'
+    assert timings['c2pa'] >= 1000
+    assert timings['exif'] < 500 and timings['iptc'] < 500
+
+
+def test_server_timing_header(client, signed_jpeg):
+    stages = {
+        '/api/exif_metadata': {'exif', 'iptc'},
+        '/api/c2pa_metadata': {'c2pa', 'thumbnails'},
+    }
+    for path, expected in stages.items():
+        header = client.get(path, params={'uri': signed_jpeg}).headers['Server-Timing']
+        metrics = dict(metric.split(';dur=') for metric in header.split(', '))
+        assert set(metrics) == expected
+        assert all(float(ms) >= 0 for ms in metrics.values())
+
+    with open(signed_jpeg, 'rb') as f:
+        response = client.post('/api/upload', files={'file': ('signed.jpg', f, 'image/jpeg')})
+    assert {metric.split(';')[0] for metric in response.headers['Server-Timing'].split(', ')} == {
+        'c2pa', 'exif', 'iptc', 'thumbnails'}
+    assert response.json()['signed.jpg']['provenance']
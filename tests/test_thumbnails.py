@@ -0,0 +1,111 @@
+import base64
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+from fastapi.testclient import TestClient
+
+import server
+from images import make_signed_jpeg
+
+
+@pytest.fixture(scope='module')
+def edited_jpeg(image_dir):
+    """A signed JPEG with a signed parent ingredient: claim and ingredient thumbnails."""
+    path = image_dir / 'edited.jpg'
+    path.write_bytes(make_signed_jpeg(ingredient=make_signed_jpeg(), title='edited.jpg'))
+    return str(path)
+
+
+@pytest.fixture
+def client():
+    return TestClient(server.app)
+
+
+def test_metadata_links_to_thumbnail_resources(client, edited_jpeg):
+    thumbnails = client.get('/api/c2pa_metadata', params={'uri': edited_jpeg}).json()['thumbnails']
+
+    assert set(thumbnails) == {'claim_thumbnail', 'ingredient_thumbnail'}
+    for kind in ('claim', 'ingredient'):
+        url = thumbnails[f'{kind}_thumbnail']
+        path, query = urlsplit(url).path, parse_qs(urlsplit(url).query)
+        assert path.startswith('/c2pa/api/thumbnail/') and path.endswith(f'/{kind}')
+        assert query == {'uri': [edited_jpeg]}
+        response = client.get(url.removeprefix('/c2pa'))
+        assert response.status_code == 200
+        assert response.headers['Content-Type'] == 'image/jpeg'
+        assert response.headers['Cache-Control'] == 'public, max-age=31536000, immutable'
+        assert response.headers['X-Content-Type-Options'] == 'nosniff'
+        assert response.headers['Content-Disposition'] == 'inline'
+        assert response.content.startswith(b'\xff\xd8')
+
+        again = client.get(url.removeprefix('/c2pa'),
+                           headers={'If-None-Match': response.headers['ETag']})
+        assert again.status_code == 304
+
+
+def test_inline_thumbnails_flag_keeps_base64(client, edited_jpeg):
+    linked = client.get('/api/c2pa_metadata', params={'uri': edited_jpeg})
+    inline = client.get('/api/c2pa_metadata', params={'uri': edited_jpeg, 'inline_thumbnails': 'true'})
+
+    assert inline.headers['ETag'] != linked.headers['ETag']
+    url = linked.json()['thumbnails']['claim_thumbnail'].removeprefix('/c2pa')
+    data = base64.b64decode(inline.json()['thumbnails']['claim_thumbnail'])
+    assert data == client.get(url).content
+
+
+def test_unknown_thumbnails_are_404(client, edited_jpeg):
+    url = client.get('/api/c2pa_metadata', params={'uri': edited_jpeg}).json()['thumbnails']['claim_thumbnail']
+    content_hash = urlsplit(url).path.split('/')[-2]
+
+    assert client.get(f'/api/thumbnail/{content_hash}/other').status_code == 404
+    assert client.get(f'/api/thumbnail/{"0" * 64}/claim').status_code == 404
+
+
+def test_upload_returns_thumbnail_urls(client, edited_jpeg):
+    with open(edited_jpeg, 'rb') as f:
+        response = client.post('/api/upload', files={'file': ('edited.jpg', f, 'image/jpeg')})
+
+    thumbnails = response.json()['edited.jpg']['thumbnails']
+    assert client.get(thumbnails['ingredient_thumbnail'].removeprefix('/c2pa')).status_code == 200
+
+
+def test_thumbnails_outlive_the_result_cache(client, origin):
+    body = make_signed_jpeg(ingredient=make_signed_jpeg(), title='edited.jpg')
+    url = origin.add('/edited.jpg', body)
+    thumbnails = client.get('/api/c2pa_metadata', params={'uri': url}).json()['thumbnails']
+    expected = client.get(thumbnails['claim_thumbnail'].removeprefix('/c2pa')).content
+
+    server.content_cache.clear()
+    response = client.get(thumbnails['claim_thumbnail'].removeprefix('/c2pa'))
+    assert response.status_code == 200
+    assert response.content == expected
+    assert len(origin.requests) == 2
+
+    # Not once the image at the URI has changed
+    server.content_cache.clear()
+    origin.add('/edited.jpg', make_signed_jpeg(title='other.jpg'))
+    assert client.get(thumbnails['ingredient_thumbnail'].removeprefix('/c2pa')).status_code == 404
+
+
+def test_upload_thumbnails_are_extracted_again_from_the_upload(client, edited_jpeg, tmp_path, monkeypatch):
+    monkeypatch.setattr(server, 'upload_store', server.UploadStore(tmp_path / 'uploads'))
+    with open(edited_jpeg, 'rb') as f:
+        response = client.post('/api/upload', files={'file': ('edited.jpg', f, 'image/jpeg')})
+    url = response.json()['edited.jpg']['thumbnails']['claim_thumbnail'].removeprefix('/c2pa')
+
+    server.content_cache.clear()
+    assert client.get(url).status_code == 200
+
+
+def test_thumbnails_of_other_types_are_served_as_opaque_bytes(client, image_dir):
+    script = b'<script>alert(document.domain)</script>'
+    path = image_dir / 'html_thumbnail.jpg'
+    path.write_bytes(make_signed_jpeg(thumbnail=('text/html', script)))
+    url = client.get('/api/c2pa_metadata', params={'uri': str(path)}).json()['thumbnails']['claim_thumbnail']
+
+    response = client.get(url.removeprefix('/c2pa'))
+    assert response.content == script
+    assert response.headers['Content-Type'] == 'application/octet-stream'
+    assert response.headers['Content-Disposition'] == 'attachment'
+    assert response.headers['X-Content-Type-Options'] == 'nosniff'
+    assert response.headers['Content-Security-Policy'] == "default-src 'none'"
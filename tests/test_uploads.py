@@ -0,0 +1,175 @@
+import base64
+import errno
+import hashlib
+import io
+import os
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import config
+import server
+from uploads import UploadStore, UploadTooLarge, save_stream
+
+
+@pytest.fixture
+def client():
+    return TestClient(server.app)
+
+
+@pytest.fixture(autouse=True)
+def store(tmp_path, monkeypatch):
+    upload_store = UploadStore(tmp_path / 'uploads', ttl=600)
+    monkeypatch.setattr(server, 'upload_store', upload_store)
+    return upload_store
+
+
+def upload(client, path, **params):
+    with open(path, 'rb') as f:
+        return client.post('/api/upload', params=params,
+                           files={'file': ('photo.jpg', f, 'image/jpeg')})
+
+
+def test_upload_links_to_original(client, exif_jpeg):
+    entry = upload(client, exif_jpeg).json()['photo.jpg']
+
+    assert 'image_data' not in entry
+    assert entry['exif']['Make'] == 'FUJIFILM'
+    original = client.get(entry['image_url'].removeprefix('/c2pa'))
+    assert original.status_code == 200
+    assert original.headers['Content-Type'] == 'image/jpeg'
+    assert original.headers['Cache-Control'] == f'private, max-age={config.UPLOAD_TTL}'
+    with open(exif_jpeg, 'rb') as f:
+        data = f.read()
+    assert original.content == data
+    assert entry['image_url'].endswith(hashlib.sha256(data).hexdigest())
+
+
+def test_original_type_comes_from_its_bytes(client, exif_jpeg, store):
+    with open(exif_jpeg, 'rb') as f:
+        jpeg = f.read()
+    html = b'<html><script>alert(document.domain)</script></html>'
+    responses = []
+    for body in (jpeg, html):
+        entry = client.post('/api/upload', files={'file': ('a.html', body, 'text/html')}).json()['a.html']
+        responses.append(client.get(entry['image_url'].removeprefix('/c2pa')))
+    as_image, as_bytes = responses
+
+    assert as_image.content == jpeg
+    assert as_image.headers['Content-Type'] == 'image/jpeg'
+    assert as_image.headers['Content-Disposition'] == 'inline'
+    assert as_bytes.content == html
+    assert as_bytes.headers['Content-Type'] == 'application/octet-stream'
+    assert as_bytes.headers['Content-Disposition'] == 'attachment'
+    for response in responses:
+        assert response.headers['X-Content-Type-Options'] == 'nosniff'
+        assert response.headers['Content-Security-Policy'] == "default-src 'none'"
+    assert sorted(path.suffix for path in store.directory.iterdir()) == ['', '.jpg']
+
+
+def test_inline_image_keeps_data_url(client, exif_jpeg, store):
+    entry = upload(client, exif_jpeg, inline_image='true').json()['photo.jpg']
+
+    assert 'image_url' not in entry
+    prefix, encoded = entry['image_data'].split(',', 1)
+    assert prefix == 'data:image/jpeg;base64'
+    with open(exif_jpeg, 'rb') as f:
+        assert base64.b64decode(encoded) == f.read()
+    # Still kept, to extract its thumbnails again from
+    assert len(list(store.directory.iterdir())) == 1
+
+
+def test_upload_the_store_cannot_keep_is_returned_inline(client, signed_jpeg, store):
+    store.max_bytes = 100
+    entry = upload(client, signed_jpeg).json()['photo.jpg']
+
+    assert 'image_url' not in entry
+    assert entry['image_data'].startswith('data:image/jpeg;base64,')
+    # No URL to extract them again from, so the thumbnails come inline too
+    assert not entry['thumbnails']['claim_thumbnail'].startswith('/c2pa/')
+    assert list(store.directory.iterdir()) == []
+
+
+def test_oversized_upload_is_rejected(client, exif_jpeg, store, monkeypatch):
+    monkeypatch.setattr(config, 'UPLOAD_MAX_BYTES', 100)
+    response = upload(client, exif_jpeg)
+
+    assert response.status_code == 413
+    assert list(store.directory.iterdir()) == []
+
+
+def test_oversized_upload_is_refused_before_it_is_read(client, store, monkeypatch):
+    def fail(*args):
+        raise AssertionError('oversized upload was saved')
+
+    monkeypatch.setattr(config, 'UPLOAD_MAX_BYTES', 1000)
+    monkeypatch.setattr(server, 'save_stream', fail)
+    body = b'x' * (1000 + server._UPLOAD_FORM_OVERHEAD + 1)
+    declared = client.post('/api/upload', files={'file': ('photo.jpg', body, 'image/jpeg')})
+    # Without a Content-Length, the body is counted as it arrives
+    chunked = client.post('/api/upload', content=iter([body[:4096], body[4096:]]),
+                          headers={'Content-Type': 'multipart/form-data; boundary=b'})
+
+    assert declared.status_code == chunked.status_code == 413
+    assert declared.json()['detail'] == 'Upload exceeds limit of 1000 bytes'
+
+
+def test_save_stream_cleans_up_when_too_large(tmp_path, monkeypatch):
+    scratch = tmp_path / 'scratch'
+    scratch.mkdir()
+    monkeypatch.setattr('tempfile.tempdir', str(scratch))
+    with pytest.raises(UploadTooLarge):
+        save_stream(io.BytesIO(b'x' * 1000), '.jpg', max_bytes=999, chunk_size=100)
+    assert list(scratch.iterdir()) == []
+
+    path, content_hash = save_stream(io.BytesIO(b'x' * 1000), '.jpg', max_bytes=1000, chunk_size=100)
+    assert content_hash == hashlib.sha256(b'x' * 1000).hexdigest()
+    assert os.path.getsize(path) == 1000
+
+
+def test_store_expires_and_evicts(tmp_path):
+    store = UploadStore(tmp_path / 'uploads', ttl=60, max_bytes=250)
+    hashes = []
+    for i in range(3):
+        source = tmp_path / f'{i}.jpg'
+        source.write_bytes(bytes([i]) * 100)
+        content_hash = hashlib.sha256(source.read_bytes()).hexdigest()
+        assert store.add(str(source), content_hash)
+        path = store.get(content_hash)
+        # Spread modification times so eviction order is deterministic
+        os.utime(path, (time.time() - 30 + i, time.time() - 30 + i))
+        hashes.append(content_hash)
+    store.sweep()
+
+    # Over budget: the oldest file went
+    assert store.get(hashes[0]) is None
+    assert store.get(hashes[2]).read_bytes() == b'\x02' * 100
+
+    store.ttl = 10
+    assert store.get(hashes[2]) is None
+    store.sweep()
+    assert list(store.directory.iterdir()) == []
+
+
+def test_store_moves_files_across_filesystems(tmp_path, monkeypatch):
+    store = UploadStore(tmp_path / 'uploads')
+    source = tmp_path / 'upload.jpg'
+    source.write_bytes(b'x' * 100)
+    content_hash = hashlib.sha256(b'x' * 100).hexdigest()
+
+    def cross_device(src, dst):
+        raise OSError(errno.EXDEV, 'Invalid cross-device link')
+
+    monkeypatch.setattr(os, 'rename', cross_device)
+    monkeypatch.setattr(os, 'replace', cross_device)
+    assert store.add(str(source), content_hash)
+    assert store.get(content_hash).read_bytes() == b'x' * 100
+    assert not source.exists()
+
+
+def test_store_rejects_non_hash_names(tmp_path, store):
+    secret = store.directory / 'secret'
+    secret.write_bytes(b'x')
+    assert store.get('../secret') is None
+    assert store.get('*') is None
@@ -0,0 +1,178 @@
+"""
+Short-lived, content-addressed storage for uploaded originals.
+
+/api/upload streams each upload to disk and, once metadata has been
+extracted, keeps the file here under its SHA-256 so the browser can load the
+original from /api/original/{content_hash} instead of receiving it back as a
+base64 data URL. Files expire ttl seconds after their last upload and the
+directory is kept under max_bytes (oldest first). Everything is on the
+filesystem, so worker processes sharing the directory see the same uploads.
+
+A stored file is named, and served, after the image type its leading bytes
+show, never after the client's filename: anything that isn't one of
+IMAGE_MEDIA_TYPES is kept without an extension and served as opaque bytes.
+"""
+
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+
+_HASH_RE = re.compile(r'[0-9a-f]{64}')
+_SUFFIX_RE = re.compile(r'\.[A-Za-z0-9]{1,5}')
+
+# Image types served as themselves (by /api/original and /api/thumbnail), by
+# file extension
+IMAGE_MEDIA_TYPES = {
+    '.jpg': 'image/jpeg',
+    '.png': 'image/png',
+    '.webp': 'image/webp',
+    '.gif': 'image/gif',
+    '.avif': 'image/avif',
+}
+
+
+class UploadTooLarge(Exception):
+    """The upload exceeded the configured maximum size."""
+
+
+def safe_suffix(filename: Optional[str]) -> str:
+    """The file extension of an uploaded filename, if it is a plain one."""
+    suffix = Path(filename or '').suffix.lower()
+    return suffix if _SUFFIX_RE.fullmatch(suffix) else ''
+
+
+def image_suffix(path) -> str:
+    """The IMAGE_MEDIA_TYPES extension for the file's magic bytes, or ''."""
+    with open(path, 'rb') as f:
+        head = f.read(16)
+    if head.startswith(b'\xff\xd8\xff'):
+        return '.jpg'
+    if head.startswith(b'\x89PNG\r\n\x1a\n'):
+        return '.png'
+    if head.startswith((b'GIF87a', b'GIF89a')):
+        return '.gif'
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return '.webp'
+    if head[4:12] in (b'ftypavif', b'ftypavis'):
+        return '.avif'
+    return ''
+
+
+def save_stream(source, suffix: str, max_bytes: int, chunk_size: int = 64 * 1024):
+    """Copy the binary file object source to a new temporary file in chunks.
+
+    Returns (path, content_hash). Raises UploadTooLarge, leaving nothing
+    behind, once more than max_bytes have been read.
+    """
+    digest = hashlib.sha256()
+    written = 0
+    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as dest:
+        try:
+            while True:
+                chunk = source.read(chunk_size)
+                if not chunk:
+                    break
+                written += len(chunk)
+                if written > max_bytes:
+                    raise UploadTooLarge(f"Upload exceeds limit of {max_bytes} bytes")
+                digest.update(chunk)
+                dest.write(chunk)
+        except BaseException:
+            dest.close()
+            Path(dest.name).unlink(missing_ok=True)
+            raise
+    return dest.name, digest.hexdigest()
+
+
+class UploadStore:
+    """Uploaded files on disk, addressed by content hash, expiring after ttl."""
+    def __init__(self, directory: str, ttl: float = 600, max_bytes: int = 512 * 1024 * 1024):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._sweeper = None
+        self._stop_sweeper = threading.Event()
+
+    def add(self, path: str, content_hash: str) -> bool:
+        """Move the file at path into the store; False (leaving it) if it can't be kept.
+        
+        Blocking (the file may be copied if path is on another filesystem, and
+        the directory is swept): call it off the event loop.
+        """
+        size = Path(path).stat().st_size
+        if size > self.max_bytes or not _HASH_RE.fullmatch(content_hash):
+            return False
+        target = self.directory / f"{content_hash}{image_suffix(path)}"
+        shutil.move(path, target)
+        # Re-uploading the same bytes restarts the clock
+        os.utime(target)
+        self.sweep()
+        return True
+
+    def get(self, content_hash: str) -> Optional[Path]:
+        """Path of an unexpired stored file, or None."""
+        if not _HASH_RE.fullmatch(content_hash):
+            return None
+        now = time.time()
+        for path in self.directory.glob(f"{content_hash}*"):
+            try:
+                if now - path.stat().st_mtime < self.ttl:
+                    return path
+            except FileNotFoundError:
+                pass
+        return None
+
+    @staticmethod
+    def media_type(path: Path) -> str:
+        return IMAGE_MEDIA_TYPES.get(path.suffix, 'application/octet-stream')
+
+    def sweep(self) -> int:
+        """Delete expired files, then the oldest until under max_bytes."""
+        now = time.time()
+        files = []
+        removed = 0
+        for path in self.directory.iterdir():
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            if now - stat.st_mtime >= self.ttl:
+                path.unlink(missing_ok=True)
+                removed += 1
+            else:
+                files.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files, key=lambda f: f[0]):
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+            removed += 1
+        return removed
+
+    def start_sweeper(self, interval: float = 60):
+        """Sweep every interval seconds on a daemon thread."""
+        if self._sweeper is not None and self._sweeper.is_alive():
+            return
+        self._stop_sweeper.clear()
+
+        def run():
+            while not self._stop_sweeper.wait(interval):
+                self.sweep()
+
+        self._sweeper = threading.Thread(target=run, name='upload-sweeper', daemon=True)
+        self._sweeper.start()
+
+    def stop_sweeper(self):
+        self._stop_sweeper.set()
+        if self._sweeper is not None:
+            self._sweeper.join(timeout=1)
+            self._sweeper = None